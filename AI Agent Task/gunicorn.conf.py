@@ -0,0 +1,12 @@
+
+# Loaded automatically by gunicorn when started from this directory (see the Dockerfile).
+import os
+
+
+def on_starting(server):
+    # Per-worker metrics files from a previous server would otherwise be summed into this one's.
+    from part1.metrics import MULTIPROC_DIR_ENV, clear_multiprocess_dir
+
+    directory = os.getenv(MULTIPROC_DIR_ENV)
+    if directory and os.path.isdir(directory):
+        clear_multiprocess_dir(directory)
@@ -0,0 +1,213 @@
+
+import asyncio
+import json
+import os
+import time
+from collections import deque
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Deque, Dict, Iterable, Optional
+
+from part1.structured_logging import get_logger
+from part1.tools.resilience import STATUS_SATURATED, ToolUnavailable
+
+logger = get_logger(__name__)
+
+# Endpoints that run the agent and therefore go through admission control.
+ADMITTED_PATHS = ("/process_prompt", "/process_prompts", "/process_prompt/stream")
+
+
+class AdmissionRejected(Exception):
+    """A request was turned away; `status_code` is 429 (queue full) or 503 (queue deadline passed)."""
+    def __init__(self, status_code: int, detail: str, retry_after: float):
+        super().__init__(detail)
+        self.status_code = status_code
+        self.detail = detail
+        self.retry_after = retry_after
+
+
+class AdmissionController:
+    """
+    Caps the number of requests running the agent at once.
+
+    Up to `max_in_flight` requests run; up to `max_queue` more wait in FIFO order for at
+    most `queue_timeout` seconds. A request arriving to a full queue is rejected at once
+    with 429, and one whose queue deadline passes gets 503, both with Retry-After. Work
+    that would only finish after the client gave up is never started, so throughput of
+    successful requests stays flat under overload instead of collapsing.
+    `max_in_flight=0` disables the limit.
+    """
+    def __init__(self, max_in_flight: Optional[int] = None, max_queue: Optional[int] = None,
+                 queue_timeout: Optional[float] = None, retry_after: Optional[float] = None):
+        self.max_in_flight = int(os.getenv("ADMISSION_MAX_IN_FLIGHT", "64")) if max_in_flight is None else max_in_flight
+        self.max_queue = int(os.getenv("ADMISSION_MAX_QUEUE", "128")) if max_queue is None else max_queue
+        self.queue_timeout = float(os.getenv("ADMISSION_QUEUE_TIMEOUT_SECONDS", "2")) if queue_timeout is None else queue_timeout
+        self.retry_after = float(os.getenv("ADMISSION_RETRY_AFTER_SECONDS", "1")) if retry_after is None else retry_after
+        self.in_flight = 0
+        self._waiters: Deque["asyncio.Future[None]"] = deque()
+        self.admitted = 0
+        self.rejected_queue_full = 0
+        self.rejected_timeout = 0
+
+    @property
+    def enabled(self) -> bool:
+        return self.max_in_flight > 0
+
+    @property
+    def queued(self) -> int:
+        return len(self._waiters)
+
+    async def acquire(self) -> None:
+        """Waits for a slot; raises AdmissionRejected when the queue is full or the deadline passes."""
+        if not self.enabled or (self.in_flight < self.max_in_flight and not self._waiters):
+            self.in_flight += 1
+            self.admitted += 1
+            return
+        if len(self._waiters) >= self.max_queue:
+            self.rejected_queue_full += 1
+            raise AdmissionRejected(429, "Server is at capacity, please retry later.", self.retry_after)
+
+        waiter: "asyncio.Future[None]" = asyncio.get_running_loop().create_future()
+        self._waiters.append(waiter)
+        try:
+            await asyncio.wait_for(asyncio.shield(waiter), self.queue_timeout)
+        except asyncio.TimeoutError:
+            if waiter.done() and not waiter.cancelled():
+                # The slot was handed over just as the deadline passed; give it back.
+                self.release()
+            else:
+                waiter.cancel()
+            self.rejected_timeout += 1
+            raise AdmissionRejected(503, "Timed out waiting for capacity, please retry later.", self.retry_after)
+        except asyncio.CancelledError:
+            if waiter.done() and not waiter.cancelled():
+                self.release()
+            else:
+                waiter.cancel()
+            raise
+        finally:
+            try:
+                self._waiters.remove(waiter)
+            except ValueError:
+                pass
+        self.admitted += 1
+
+    def release(self) -> None:
+        """Frees a slot, handing it straight to the oldest live waiter if there is one."""
+        while self._waiters:
+            waiter = self._waiters.popleft()
+            if not waiter.done():
+                # in_flight stays the same: the slot moves to the waiter.
+                waiter.set_result(None)
+                return
+        self.in_flight -= 1
+
+    @asynccontextmanager
+    async def slot(self) -> AsyncIterator[None]:
+        await self.acquire()
+        try:
+            yield
+        finally:
+            self.release()
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "max_in_flight": self.max_in_flight,
+            "in_flight": self.in_flight,
+            "queued": self.queued,
+            "admitted": self.admitted,
+            "rejected_queue_full": self.rejected_queue_full,
+            "rejected_timeout": self.rejected_timeout,
+        }
+
+
+class AdmissionMiddleware:
+    """
+    ASGI middleware applying an AdmissionController to the agent endpoints. Rejections
+    are sent before the request body is read, so turning work away stays cheap.
+    """
+    def __init__(self, app, controller: AdmissionController, paths: Iterable[str] = ADMITTED_PATHS):
+        self.app = app
+        self.controller = controller
+        self.paths = frozenset(paths)
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not self.controller.enabled or scope.get("path") not in self.paths:
+            await self.app(scope, receive, send)
+            return
+
+        try:
+            await self.controller.acquire()
+        except AdmissionRejected as e:
+            logger.info("Request rejected by admission control: %s", e.detail, extra={"status": e.status_code})
+            body = json.dumps({"detail": e.detail}).encode("utf-8")
+            await send({
+                "type": "http.response.start",
+                "status": e.status_code,
+                "headers": [
+                    (b"content-type", b"application/json"),
+                    (b"content-length", str(len(body)).encode("latin-1")),
+                    (b"retry-after", str(max(1, round(e.retry_after))).encode("latin-1")),
+                ],
+            })
+            await send({"type": "http.response.body", "body": body})
+            return
+        try:
+            await self.app(scope, receive, send)
+        finally:
+            self.controller.release()
+
+
+class ToolSaturated(ToolUnavailable):
+    """A tool's concurrency limit stayed exhausted for longer than the wait timeout."""
+    status = STATUS_SATURATED
+
+
+class ToolLimiter:
+    """
+    Per-tool concurrency limits, shared by all requests in a worker. A tool declares its
+    limit with `max_concurrency` on the class; TOOL_MAX_CONCURRENCY sets the default for
+    tools that don't (0 = unlimited). Waiting for a slot is bounded by `wait_timeout`, so
+    requests stuck behind a saturated tool fail fast while other tools keep running.
+    """
+    def __init__(self, default_limit: Optional[int] = None, wait_timeout: Optional[float] = None):
+        self.default_limit = int(os.getenv("TOOL_MAX_CONCURRENCY", "0")) if default_limit is None else default_limit
+        self.wait_timeout = float(os.getenv("TOOL_QUEUE_TIMEOUT_SECONDS", "5")) if wait_timeout is None else wait_timeout
+        self._semaphores: Dict[str, asyncio.Semaphore] = {}
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def limit_for(self, tool: Any) -> int:
+        # Read from the class so mocks without real metadata get the default.
+        limit = getattr(type(tool), "max_concurrency", None)
+        return limit if isinstance(limit, int) and not isinstance(limit, bool) else self.default_limit
+
+    def _semaphore(self, tool_name: str, tool: Any) -> Optional[asyncio.Semaphore]:
+        limit = self.limit_for(tool)
+        if limit <= 0:
+            return None
+        loop = asyncio.get_running_loop()
+        if self._loop is not loop:
+            # Semaphores belong to one event loop.
+            self._semaphores = {}
+            self._loop = loop
+        semaphore = self._semaphores.get(tool_name)
+        if semaphore is None:
+            semaphore = self._semaphores[tool_name] = asyncio.Semaphore(limit)
+        return semaphore
+
+    @asynccontextmanager
+    async def slot(self, tool_name: str, tool: Any) -> AsyncIterator[None]:
+        semaphore = self._semaphore(tool_name, tool)
+        if semaphore is None:
+            yield
+            return
+        start = time.perf_counter()
+        try:
+            await asyncio.wait_for(semaphore.acquire(), self.wait_timeout)
+        except asyncio.TimeoutError:
+            raise ToolSaturated(
+                tool_name, f"is saturated (waited {time.perf_counter() - start:.2f}s for a free slot)"
+            ) from None
+        try:
+            yield
+        finally:
+            semaphore.release()
@@ -1,9 +1,105 @@
 
-from typing import List, Dict, Any, Optional
+import asyncio
+import hashlib
+import os
+import time
+from dataclasses import dataclass, field
+from typing import List, Dict, Any, AsyncIterator, Callable, Optional, Tuple
 
+from part1.admission import ToolLimiter
+from part1.cassette import Cassette, CassetteToolExecutor, get_default_cassette, wrap_llm
+from part1.llm import LLMClient, LLMError, create_llm_client
 from part1.models import AgentResponse, ToolUsage
-from part1.prompts import SYSTEM_PROMPT
-from part1.tools import AVAILABLE_TOOLS, TOOL_MAP 
+from part1.prompts import PromptBundle, build_prompt_bundle
+from part1.routing import ToolRouter
+from part1.structured_logging import get_logger
+from part1 import tracing
+from part1.tools.registry import ToolRegistry, default_registry
+from part1.tools.cache import ToolResultCache, is_cacheable
+from part1.tools.executor import ToolExecutor
+from part1.tools.resilience import STATUS_ERROR, STATUS_OK, ToolGuard, ToolUnavailable
+
+logger = get_logger(__name__)
+
+DEFAULT_MAX_CONCURRENT_TOOLS = int(os.getenv("AGENT_MAX_CONCURRENT_TOOLS", "4"))
+
+# Approximate size of the response text chunks emitted by stream_prompt.
+STREAM_CHUNK_CHARS = 64
+
+# Streaming event names, in the order a client sees them.
+EVENT_ROUTING = "routing"
+EVENT_TOOL_STARTED = "tool_call_started"
+EVENT_TOOL_FINISHED = "tool_call_finished"
+EVENT_RESPONSE_CHUNK = "response_chunk"
+EVENT_FINAL = "final"
+
+EventCallback = Callable[[str, Dict[str, Any]], None]
+
+# Words between two tool triggers that make the later call depend on the earlier one,
+# e.g. "run tool one then tool two".
+SEQUENCE_MARKERS = (" then ", " and then ", " after that ", " afterwards ")
+
+
+# Stages reported to AgentObserver.on_stage.
+STAGE_ROUTING = "routing"
+STAGE_TOOLS = "tools"
+STAGE_RESPONSE = "response"
+
+
+class AgentObserver:
+    """
+    Receives timing callbacks from the agent (benchmarks, metrics). Methods are no-ops;
+    override the ones you need. Callbacks run on the event loop and must not block.
+    """
+    def on_stage(self, stage: str, seconds: float) -> None:
+        pass
+
+    def on_tool_call(self, tool_name: str, seconds: float, error: Optional[BaseException]) -> None:
+        pass
+
+
+@dataclass
+class ToolCallStep:
+    """One planned tool call. `depends_on` holds indexes of earlier steps whose outputs it needs."""
+    tool_name: str
+    tool_input: Any
+    depends_on: Tuple[int, ...] = ()
+    position: int = field(default=0, compare=False)
+
+
+def with_upstream(tool_input: Any, upstream: Dict[str, Any]) -> Any:
+    """Attaches upstream tool outputs to the input of a dependent step."""
+    if not upstream:
+        return tool_input
+    if isinstance(tool_input, dict):
+        return {**tool_input, "upstream": upstream}
+    return {"input": tool_input, "upstream": upstream}
+
+
+def with_history(prompt: str, history: Optional[str]) -> str:
+    """Prefixes an LLM prompt with the conversation so far, for prompts that belong to a session."""
+    if not history:
+        return prompt
+    return f"Conversation so far:\n{history}\n\nCurrent request:\n{prompt}"
+
+
+def _elapsed_ms(start: float) -> float:
+    return round((time.perf_counter() - start) * 1000, 3)
+
+
+def chunk_text(text: str, size: int = STREAM_CHUNK_CHARS) -> List[str]:
+    """Splits text into chunks of roughly `size` characters, breaking on spaces."""
+    chunks: List[str] = []
+    start = 0
+    while start < len(text):
+        end = min(len(text), start + size)
+        if end < len(text):
+            space = text.rfind(" ", start, end)
+            if space > start:
+                end = space + 1
+        chunks.append(text[start:end])
+        start = end
+    return chunks
 
 
 class IntelligentAgent:
@@ -11,85 +107,297 @@ class IntelligentAgent:
     The core agent responsible for processing prompts, using tools,
     and generating responses based on the system prompt.
     """
-    def __init__(self, system_prompt: str = SYSTEM_PROMPT, tools: List[Any] = AVAILABLE_TOOLS):
-        self.system_prompt = system_prompt
-        self.tools = tools
-        self.tool_map = {tool.name: tool for tool in self.tools} 
-        print("WARNING: LLM client not initialized. Using simulated responses.")
-        self.llm = None 
-
-    async def process_prompt(self, user_prompt: str) -> AgentResponse:
+    def __init__(self, system_prompt: Optional[str] = None, tools: Optional[List[Any]] = None,
+                 executor: Optional[ToolExecutor] = None,
+                 max_concurrent_tools: int = DEFAULT_MAX_CONCURRENT_TOOLS,
+                 tool_cache: Optional[ToolResultCache] = None,
+                 router: Optional[ToolRouter] = None,
+                 observers: Optional[List[AgentObserver]] = None,
+                 llm: Optional[LLMClient] = None,
+                 tool_limiter: Optional[ToolLimiter] = None,
+                 tool_guard: Optional[ToolGuard] = None,
+                 registry: Optional[ToolRegistry] = None,
+                 cassette: Optional[Cassette] = None):
+        # Without explicit tools, every tool enabled in the registry (instantiated on demand).
+        self.registry = registry or default_registry
+        self.tools = tools if tools is not None else self.registry.instances()
+        # System prompt rendered from the tools' own metadata (shared between agents with the
+        # same tools); an explicit `system_prompt` overrides the text.
+        self.prompt_bundle: PromptBundle = build_prompt_bundle(self.tools)
+        self.system_prompt = system_prompt if system_prompt is not None else self.prompt_bundle.text
+        self.tool_map = {tool.name: tool for tool in self.tools}
+        # Trigger phrases of all tools compiled once into a single matcher.
+        self.router = router or ToolRouter(self.tools, fallback=self.registry)
+        self.observers: List[AgentObserver] = list(observers or [])
+        # Records or replays tool and LLM calls (see part1/cassette.py); set up by CASSETTE_MODE.
+        self.cassette = cassette if cassette is not None else get_default_cassette()
+        # Sync tools run in a bounded pool so a slow tool never blocks the event loop.
+        self.executor = executor or ToolExecutor()
+        if self.cassette is not None:
+            self.executor = CassetteToolExecutor(self.executor, self.cassette)
+        # Upper bound on tool calls running at the same time for a single prompt.
+        self.max_concurrent_tools = max(1, max_concurrent_tools)
+        # Worker-wide per-tool concurrency limits, so one saturated tool can't take every slot.
+        self.tool_limiter = tool_limiter or ToolLimiter()
+        # Per-tool deadlines and circuit breakers; a failing tool degrades the answer instead of failing it.
+        self.tool_guard = tool_guard or ToolGuard()
+        # Opt-in cache for tools that declare `cacheable = True`.
+        self.tool_cache = tool_cache
+        # Identifies the agent configuration (system prompt + tool set), e.g. for response caching.
+        self.config_hash = hashlib.sha256(
+            "\n".join([self.system_prompt, *sorted(self.tool_map)]).encode("utf-8")
+        ).hexdigest()[:16]
+        # Used for the no-tool fallback and to synthesize tool results; configured by LLM_BASE_URL.
+        self.llm = wrap_llm(llm if llm is not None else create_llm_client(), self.cassette)
+        if self.llm is None:
+            logger.warning("LLM client not initialized. Using simulated responses.")
+
+    def plan_tool_calls(self, user_prompt: str) -> List[ToolCallStep]:
+        """
+        Builds the tool-call plan for a prompt: one step per triggered tool, in prompt order.
+        A step depends on the previous one when the prompt sequences them ("... then ...").
+        """
+        steps = [
+            ToolCallStep(match.tool_name, self.router.build_input(match, user_prompt), position=match.start)
+            for match in self.router.route(user_prompt)
+        ]
+        for i in range(1, len(steps)):
+            between = f" {user_prompt[steps[i - 1].position:steps[i].position].lower()} "
+            if any(marker in between for marker in SEQUENCE_MARKERS):
+                steps[i].depends_on = (i - 1,)
+        return steps
+
+    async def execute_plan(self, steps: List[ToolCallStep], emit: Optional[EventCallback] = None) -> List[Optional[ToolUsage]]:
+        """
+        Runs the planned steps. Independent steps run concurrently (bounded by
+        max_concurrent_tools); dependent steps wait for and receive their upstream outputs.
+        Returns one entry per step in plan order, None for tools that are not available.
+        `emit`, if given, is called with tool start/finish events.
+        """
+        semaphore = asyncio.Semaphore(self.max_concurrent_tools)
+        tasks: List["asyncio.Task[Optional[ToolUsage]]"] = []
+
+        async def run_step(index: int, step: ToolCallStep) -> Optional[ToolUsage]:
+            upstream: Dict[str, Any] = {}
+            for dep in step.depends_on:
+                dep_usage = await tasks[dep]
+                if dep_usage is not None and dep_usage.status == STATUS_OK:
+                    upstream[dep_usage.tool_name] = dep_usage.tool_output
+
+            tool_instance = self.tool_map.get(step.tool_name)
+            if not tool_instance:
+                logger.error("Tool '%s' not found among the agent's tools.", step.tool_name)
+                return None
+
+            tool_input = with_upstream(step.tool_input, upstream)
+            logger.debug("Agent deciding to use %s with input '%s'", step.tool_name, tool_input)
+            if emit:
+                emit(EVENT_TOOL_STARTED, {"step": index, "tool_name": step.tool_name, "tool_input": tool_input})
+            usage = await self._call_tool(tool_instance, step.tool_name, tool_input, semaphore)
+            if emit:
+                emit(EVENT_TOOL_FINISHED, {"step": index, "tool_usage": usage.model_dump(mode="json")})
+            return usage
+
+        for index, step in enumerate(steps):
+            tasks.append(asyncio.ensure_future(run_step(index, step)))
+        try:
+            return list(await asyncio.gather(*tasks))
+        finally:
+            # If one step failed, don't leave its siblings running in the background.
+            for task in tasks:
+                if not task.done():
+                    task.cancel()
+
+    async def _call_tool(self, tool_instance: Any, tool_name: str, tool_input: Any,
+                         semaphore: asyncio.Semaphore) -> ToolUsage:
+        """Runs one tool call, going through the tool cache when the tool is cacheable."""
+        with tracing.span("tool.call", tool=tool_name) as tool_span:
+            call_start = time.perf_counter()
+            use_cache = self.tool_cache is not None and is_cacheable(tool_instance)
+            if use_cache:
+                hit, tool_output = self.tool_cache.get(tool_instance, tool_input)
+                if tool_span is not None:
+                    tool_span.set_attribute("cached", hit)
+                if hit:
+                    return ToolUsage(tool_name=tool_name, tool_input=tool_input, tool_output=tool_output, cached=True,
+                                     duration_ms=_elapsed_ms(call_start))
+
+            queued_at = time.perf_counter()
+
+            async def run() -> Any:
+                async with self.tool_limiter.slot(tool_name, tool_instance), semaphore:
+                    start = time.perf_counter()
+                    if tool_span is not None:
+                        tool_span.set_attribute("queued_ms", (start - queued_at) * 1000)
+                    try:
+                        output = await self.executor.run(tool_instance, tool_input)
+                    except (Exception, asyncio.CancelledError) as e:
+                        self._observe_tool(tool_name, start, e)
+                        raise
+                    self._observe_tool(tool_name, start, None)
+                    return output
+
+            # The deadline covers waiting for a slot as well, so it bounds the whole call.
+            try:
+                tool_output = await self.tool_guard.call(tool_name, tool_instance, run)
+            except Exception as e:
+                status = e.status if isinstance(e, ToolUnavailable) else STATUS_ERROR
+                error = e.reason if isinstance(e, ToolUnavailable) else str(e)
+                logger.warning("Tool %s unavailable (%s): %s", tool_name, status, error)
+                if tool_span is not None:
+                    tool_span.set_attribute("status", status)
+                    tool_span.set_error(e)
+                return ToolUsage(tool_name=tool_name, tool_input=tool_input, tool_output=None, status=status, error=error,
+                                 duration_ms=_elapsed_ms(call_start))
+            if use_cache:
+                self.tool_cache.put(tool_instance, tool_input, tool_output)
+            return ToolUsage(tool_name=tool_name, tool_input=tool_input, tool_output=tool_output,
+                             duration_ms=_elapsed_ms(call_start))
+
+    async def _fallback(self, user_prompt: str, history: Optional[str] = None) -> str:
+        """Answers a prompt no tool handled, with the LLM when one is configured."""
+        if self.llm:
+            try:
+                with tracing.span("llm.generate", purpose="fallback"):
+                    return await self.llm.generate(with_history(user_prompt, history), system_prompt=self.system_prompt)
+            except LLMError as e:
+                logger.warning("LLM fallback failed, using simulated response: %s", e)
+        return (f"Agent: I received your prompt: '{user_prompt}'. Unfortunately, my advanced functions via LLM are not "
+                f"currently available, and no specific tools were triggered by keywords, so this is a simulated LLM response.")
+
+    async def _synthesize(self, user_prompt: str, usages: List[ToolUsage], history: Optional[str] = None) -> str:
+        """Turns tool outputs into the final answer, with the LLM when one is configured."""
+        if self.llm:
+            results = "\n".join(f"- {usage.tool_name}: {usage.tool_output}" for usage in usages)
+            try:
+                with tracing.span("llm.generate", purpose="synthesis"):
+                    return await self.llm.generate(
+                        with_history(f"User request: {user_prompt}\n\nTool results:\n{results}\n\n"
+                                     "Answer the request using these results.", history),
+                        system_prompt=self.system_prompt,
+                    )
+            except LLMError as e:
+                logger.warning("LLM synthesis failed, returning raw tool results: %s", e)
+        return "[Synthesize final response here, possibly using LLM]"
+
+    def _observe_stage(self, stage: str, start: float) -> float:
+        """Reports a finished stage to the observers and returns the current time."""
+        now = time.perf_counter()
+        for observer in self.observers:
+            observer.on_stage(stage, now - start)
+        return now
+
+    def _observe_tool(self, tool_name: str, start: float, error: Optional[BaseException]) -> None:
+        if self.observers:
+            elapsed = time.perf_counter() - start
+            for observer in self.observers:
+                observer.on_tool_call(tool_name, elapsed, error)
+
+    async def process_prompt(self, user_prompt: str, history: Optional[str] = None) -> AgentResponse:
         """
         Processes the user's prompt. This involves reasoning, tool use,
         and response generation guided by the system prompt.
+        `history` is the earlier conversation of the prompt's session (see part1/sessions.py);
+        it is given to the LLM but doesn't affect which tools are called.
         """
-        print(f"Agent processing prompt: {user_prompt}") 
+        return await self._process(user_prompt, emit=None, history=history)
+
+    async def stream_prompt(self, user_prompt: str, history: Optional[str] = None) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Streaming variant of process_prompt. Yields events as they happen:
+        routing decision, tool call started/finished, response text chunks and
+        finally the complete AgentResponse. Each event is {"event": name, "data": {...}}.
+        """
+        queue: "asyncio.Queue[Dict[str, Any]]" = asyncio.Queue()
+
+        def emit(event: str, data: Dict[str, Any]) -> None:
+            queue.put_nowait({"event": event, "data": data})
+
+        task = asyncio.ensure_future(self._process(user_prompt, emit=emit, history=history))
+        task.add_done_callback(lambda _: queue.put_nowait(None))
+        try:
+            while True:
+                item = await queue.get()
+                if item is None:
+                    break
+                yield item
+            yield {"event": EVENT_FINAL, "data": task.result().model_dump(mode="json")}
+        finally:
+            if not task.done():
+                task.cancel()
+
+    async def _process(self, user_prompt: str, emit: Optional[EventCallback],
+                       history: Optional[str] = None) -> AgentResponse:
+        with tracing.span("agent.process", config_hash=self.config_hash):
+            return await self._run_stages(user_prompt, emit, history)
+
+    async def _run_stages(self, user_prompt: str, emit: Optional[EventCallback],
+                          history: Optional[str] = None) -> AgentResponse:
+        logger.debug("Agent processing prompt: %.200s", user_prompt)
 
 
         called_tools_info: List[ToolUsage] = []
         final_response_text = ""
         structured_output_data: Optional[Dict[str, Any]] = None
+        stage_start = time.perf_counter()
         try:
-            if "tool one" in user_prompt.lower() or "placeholder tool one" in user_prompt.lower():
-                tool_name_to_call = "PlaceholderToolOne" 
-                tool_instance = self.tool_map.get(tool_name_to_call)
-                if tool_instance:
-                    
-                    tool_input = user_prompt.replace("tool one", "").replace("placeholder tool one", "").strip()
-                    print(f"DEBUG: Agent deciding to use {tool_name_to_call} with input '{tool_input}'")
-                    
-                    tool_output = tool_instance.run(tool_input)
-                    called_tools_info.append(ToolUsage(
-                        tool_name=tool_name_to_call,
-                        tool_input=tool_input,
-                        tool_output=tool_output
-                    ))
-                    final_response_text = f"Used {tool_name_to_call}. Result: {tool_output}. Based on this: [Synthesize final response here, possibly using LLM]"
-                    
-                else:
-                    final_response_text = f"Tried to use {tool_name_to_call} but it wasn't found or initialized."
-                    print(f"ERROR: Tool '{tool_name_to_call}' not found in TOOL_MAP.")
-
-
-            elif "tool two" in user_prompt.lower() or "placeholder tool two" in user_prompt.lower():
-                tool_name_to_call = "PlaceholderToolTwo" # Use the actual name
-                tool_instance = self.tool_map.get(tool_name_to_call)
-                if tool_instance:
-                    
-                    tool_input = {"query": user_prompt} # Example input structure
-                    print(f"DEBUG: Agent deciding to use {tool_name_to_call} with input '{tool_input}'")
-                    
-                    tool_output = tool_instance.run(tool_input)
-                    called_tools_info.append(ToolUsage(
-                        tool_name=tool_name_to_call,
-                        tool_input=tool_input,
-                        tool_output=tool_output
-                    ))
-                    final_response_text = f"Used {tool_name_to_call}. Result: {tool_output}. Based on this: [Synthesize final response here, possibly using LLM]"
-                else:
-                    final_response_text = f"Tried to use {tool_name_to_call} but it wasn't found or initialized."
-                    print(f"ERROR: Tool '{tool_name_to_call}' not found in TOOL_MAP.")
+            with tracing.span("agent.routing") as routing_span:
+                steps = self.plan_tool_calls(user_prompt)
+                if routing_span is not None:
+                    routing_span.set_attribute("tools", [step.tool_name for step in steps])
+            stage_start = self._observe_stage(STAGE_ROUTING, stage_start)
+            if emit:
+                emit(EVENT_ROUTING, {"steps": [
+                    {"tool_name": step.tool_name, "depends_on": list(step.depends_on)} for step in steps
+                ]})
+            if steps:
+                with tracing.span("agent.tools", count=len(steps)):
+                    usages = await self.execute_plan(steps, emit)
+                stage_start = self._observe_stage(STAGE_TOOLS, stage_start)
+                parts = []
+                for step, usage in zip(steps, usages):
+                    if usage is None:
+                        parts.append(f"Tried to use {step.tool_name} but it wasn't found or initialized.")
+                    else:
+                        called_tools_info.append(usage)
+                        if usage.status == STATUS_OK:
+                            parts.append(f"Used {usage.tool_name}. Result: {usage.tool_output}.")
+                        else:
+                            parts.append(f"Information from {usage.tool_name} was unavailable ({usage.error}).")
+                succeeded = [usage for usage in called_tools_info if usage.status == STATUS_OK]
+                if succeeded:
+                    parts.append(f"Based on this: {await self._synthesize(user_prompt, succeeded, history)}")
+                elif called_tools_info and self.llm:
+                    # Degraded: answer from general knowledge, as the system prompt's fallback logic asks.
+                    parts.append(await self._fallback(user_prompt, history))
+                unavailable = [usage.tool_name for usage in called_tools_info if usage.status != STATUS_OK]
+                if unavailable:
+                    structured_output_data = {"degraded": True, "unavailable_tools": unavailable}
+                final_response_text = " ".join(parts)
 
             else:
-                
-                print("DEBUG: No specific tool triggered by keywords. Falling back to simulated LLM response.")
-                if self.llm:
-                    
-                     final_response_text = f"Agent (simulated LLM): Based on your request '{user_prompt}', I can provide information. [Add a generic, helpful response here]."
 
-
-                else:
-                    
-                    final_response_text = f"Agent: I received your prompt: '{user_prompt}'. My advanced functions (LLM) are not currently available, and no specific tools were triggered by keywords."
+                logger.debug("No specific tool triggered by keywords. Falling back to LLM response.")
+                final_response_text = await self._fallback(user_prompt, history)
 
 
         except Exception as e:
-            
-            print(f"ERROR in agent processing chain: {e}")
+
+            logger.exception("Error in agent processing chain: %s", e)
+            if tracing.current_span() is not None:
+                tracing.current_span().set_error(e)
             final_response_text = f"Agent: An error occurred while processing your request: {e}. Please try again."
-            
-        return AgentResponse(
-            response=final_response_text,
-            structured_data=structured_output_data, 
-            tool_calls=called_tools_info if called_tools_info else None 
-        )
\ No newline at end of file
+            called_tools_info = []
+            structured_output_data = {"error": str(e)}
+
+        with tracing.span("agent.response"):
+            if emit:
+                for chunk in chunk_text(final_response_text):
+                    emit(EVENT_RESPONSE_CHUNK, {"text": chunk})
+            agent_response = AgentResponse(
+                response=final_response_text,
+                structured_data=structured_output_data,
+                tool_calls=called_tools_info if called_tools_info else None
+            )
+        self._observe_stage(STAGE_RESPONSE, stage_start)
+        return agent_response
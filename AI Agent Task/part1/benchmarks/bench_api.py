@@ -0,0 +1,269 @@
+"""
+Load test for the /process_prompt hot path.
+
+Drives the FastAPI app in this process over an in-memory ASGI transport, or a live
+server with --url. The prompt mix uses the tool-one, tool-two and fallback prompts from
+evaluation_cases.py. Tools are wrapped with an injected delay to stand in for slow backends.
+
+Reports requests/sec, p50/p95/p99 latency and a per-stage breakdown (routing, tools,
+response assembly, and everything outside the agent: HTTP, validation and serialization).
+Results can be saved as a JSON baseline; a later run with --baseline exits 1 when
+throughput drops or p95/p99 latency grows by more than --max-regression.
+
+Usage:
+    python -m part1.benchmarks.bench_api --requests 2000 --concurrency 32 --tool-latency-ms 20
+    python -m part1.benchmarks.bench_api --save-baseline bench_baseline.json
+    python -m part1.benchmarks.bench_api --baseline bench_baseline.json --max-regression 0.15
+"""
+import argparse
+import asyncio
+import json
+import random
+import sys
+import time
+from collections import defaultdict
+from typing import Any, Dict, List, Optional
+
+import httpx
+
+from part1.agent import AgentObserver, IntelligentAgent
+from part1.evaluation.evaluation_cases import get_evaluation_cases
+from part1.evaluation.stats import percentile
+from part1.tools import AVAILABLE_TOOLS
+from part1.tools.base import BaseTool
+
+MIX_CATEGORIES = ("tool_one", "tool_two", "fallback")
+# Load shedding by admission control (see part1/admission.py), counted apart from errors.
+REJECTION_STATUS_CODES = (429, 503)
+
+
+class LatencyInjectedTool(BaseTool):
+    """Wraps a tool and sleeps before each call, like a tool waiting on a remote backend."""
+    def __init__(self, inner: BaseTool, delay_seconds: float):
+        self.inner = inner
+        self.delay_seconds = delay_seconds
+
+    @property
+    def name(self) -> str:
+        return self.inner.name
+
+    @property
+    def description(self) -> str:
+        return self.inner.description
+
+    async def arun(self, tool_input: Any) -> Any:
+        await asyncio.sleep(self.delay_seconds)
+        return self.inner.run(tool_input)
+
+
+class StageRecorder(AgentObserver):
+    """Collects stage and tool timings reported by the agent."""
+    def __init__(self):
+        self.stages: Dict[str, List[float]] = defaultdict(list)
+
+    def on_stage(self, stage: str, seconds: float) -> None:
+        self.stages[stage].append(seconds)
+
+    def on_tool_call(self, tool_name: str, seconds: float, error: Optional[BaseException]) -> None:
+        self.stages[f"tool:{tool_name}"].append(seconds)
+
+
+def prompts_by_category() -> Dict[str, List[str]]:
+    """Groups the evaluation prompts into the benchmark mix categories."""
+    groups: Dict[str, List[str]] = {category: [] for category in MIX_CATEGORIES}
+    for case in get_evaluation_cases():
+        prompt = case.get("prompt", "")
+        if len(prompt.strip()) < 2:
+            continue
+        types = {c.get("type"): c.get("value") for c in case.get("expected_outcome", {}).get("criteria", [])}
+        if types.get("tool_used") == "PlaceholderToolOne":
+            groups["tool_one"].append(prompt)
+        elif types.get("tool_used") == "PlaceholderToolTwo":
+            groups["tool_two"].append(prompt)
+        elif "no_tool_used" in types:
+            groups["fallback"].append(prompt)
+    return groups
+
+
+def parse_mix(spec: str) -> Dict[str, float]:
+    """Parses 'tool_one=1,tool_two=1,fallback=2' into weights."""
+    weights: Dict[str, float] = {}
+    for part in filter(None, (p.strip() for p in spec.split(","))):
+        key, _, value = part.partition("=")
+        if key not in MIX_CATEGORIES:
+            raise ValueError(f"Unknown mix category '{key}'. Choose from {', '.join(MIX_CATEGORIES)}.")
+        weights[key] = float(value or 1)
+    return weights
+
+
+def build_workload(total: int, weights: Dict[str, float], seed: int) -> List[str]:
+    groups = prompts_by_category()
+    categories = [c for c in weights if weights[c] > 0 and groups[c]]
+    rng = random.Random(seed)
+    picks = rng.choices(categories, weights=[weights[c] for c in categories], k=total)
+    # A per-request nonce keeps identical prompts from being served by the response cache.
+    return [f"{rng.choice(groups[c])} (#{i})" for i, c in enumerate(picks)]
+
+
+async def run_load(client: httpx.AsyncClient, prompts: List[str], concurrency: int,
+                   headers: Dict[str, str], honor_retry_after: bool = False) -> Dict[str, Any]:
+    latencies: List[float] = []
+    ok_latencies: List[float] = []
+    errors = 0
+    rejected = 0
+    queue: "asyncio.Queue[str]" = asyncio.Queue()
+    for prompt in prompts:
+        queue.put_nowait(prompt)
+
+    async def worker() -> None:
+        nonlocal errors, rejected
+        while not queue.empty():
+            prompt = queue.get_nowait()
+            start = time.perf_counter()
+            response = None
+            try:
+                response = await client.post("/process_prompt", json={"prompt": prompt}, headers=headers)
+            except httpx.HTTPError:
+                pass
+            latency = time.perf_counter() - start
+            latencies.append(latency)
+            status = response.status_code if response is not None else 0
+            if status == 200:
+                ok_latencies.append(latency)
+            elif status in REJECTION_STATUS_CODES:
+                rejected += 1
+                if honor_retry_after and not queue.empty():
+                    await asyncio.sleep(float(response.headers.get("Retry-After", "0")))
+            else:
+                errors += 1
+
+    start = time.perf_counter()
+    await asyncio.gather(*(worker() for _ in range(concurrency)))
+    wall = time.perf_counter() - start
+    return {"latencies": latencies, "ok_latencies": ok_latencies, "errors": errors, "rejected": rejected, "wall": wall}
+
+
+def summarize(load: Dict[str, Any], recorder: Optional[StageRecorder], deadline_ms: float = 0.0) -> Dict[str, Any]:
+    """
+    Goodput counts 200 responses per second, only those within `deadline_ms` when one is
+    given: under overload it should stay flat while excess requests are rejected.
+    """
+    latencies = load["latencies"]
+    ok_latencies = load.get("ok_latencies", latencies)
+    if deadline_ms:
+        ok_latencies = [latency for latency in ok_latencies if latency * 1000 <= deadline_ms]
+    summary: Dict[str, Any] = {
+        "requests": len(latencies),
+        "errors": load["errors"],
+        "rejected": load.get("rejected", 0),
+        "requests_per_sec": len(latencies) / load["wall"] if load["wall"] else 0.0,
+        "goodput_per_sec": len(ok_latencies) / load["wall"] if load["wall"] else 0.0,
+        "p50_ms": percentile(latencies, 50) * 1000,
+        "p95_ms": percentile(latencies, 95) * 1000,
+        "p99_ms": percentile(latencies, 99) * 1000,
+        "stages": {},
+    }
+    if recorder is not None and latencies:
+        agent_total = 0.0
+        for stage, values in sorted(recorder.stages.items()):
+            summary["stages"][stage] = {
+                "mean_ms": sum(values) / len(values) * 1000,
+                "p95_ms": percentile(values, 95) * 1000,
+                "count": len(values),
+            }
+            if not stage.startswith("tool:"):
+                agent_total += sum(values)
+        outside = max(0.0, sum(latencies) - agent_total) / len(latencies)
+        summary["stages"]["http+serialization"] = {"mean_ms": outside * 1000, "count": len(latencies)}
+    return summary
+
+
+def find_regressions(current: Dict[str, Any], baseline: Dict[str, Any], threshold: float) -> List[str]:
+    """Lists metrics that got worse than the baseline by more than `threshold` (a fraction)."""
+    problems = []
+    if current["requests_per_sec"] < baseline["requests_per_sec"] * (1 - threshold):
+        problems.append(f"throughput {current['requests_per_sec']:.1f} < baseline {baseline['requests_per_sec']:.1f} req/s")
+    for key in ("p95_ms", "p99_ms"):
+        if current[key] > baseline[key] * (1 + threshold):
+            problems.append(f"{key} {current[key]:.2f} > baseline {baseline[key]:.2f}")
+    return problems
+
+
+def print_report(summary: Dict[str, Any]) -> None:
+    print(f"Requests: {summary['requests']}  errors: {summary['errors']}  rejected (429/503): {summary['rejected']}")
+    print(f"Throughput: {summary['requests_per_sec']:.1f} req/s  goodput: {summary['goodput_per_sec']:.1f} req/s")
+    print(f"Latency p50/p95/p99: {summary['p50_ms']:.2f} / {summary['p95_ms']:.2f} / {summary['p99_ms']:.2f} ms")
+    if summary["stages"]:
+        print("Per-stage breakdown (mean / p95 ms):")
+        for stage, values in summary["stages"].items():
+            p95 = f"{values['p95_ms']:.3f}" if "p95_ms" in values else "-"
+            print(f"  {stage:<28} {values['mean_ms']:.3f} / {p95}")
+
+
+async def main_async(args: argparse.Namespace) -> int:
+    prompts = build_workload(args.requests, parse_mix(args.mix), args.seed)
+    headers = {} if args.use_cache else {"X-Cache-Bypass": "1"}
+    limits = httpx.Limits(max_connections=args.concurrency, max_keepalive_connections=args.concurrency)
+
+    recorder: Optional[StageRecorder] = None
+    if args.url:
+        client = httpx.AsyncClient(base_url=args.url, limits=limits, timeout=60)
+    else:
+        import part1.main as api
+        recorder = StageRecorder()
+        tools = [LatencyInjectedTool(tool, args.tool_latency_ms / 1000) for tool in AVAILABLE_TOOLS]
+        api.agent = IntelligentAgent(system_prompt=api.agent.system_prompt, tools=tools, observers=[recorder])
+        client = httpx.AsyncClient(transport=httpx.ASGITransport(app=api.app), base_url="http://bench.local", timeout=60)
+
+    async with client:
+        if args.warmup:
+            await run_load(client, prompts[:args.warmup], args.concurrency, headers)
+            if recorder is not None:
+                recorder.stages.clear()
+        load = await run_load(client, prompts, args.concurrency, headers, args.honor_retry_after)
+
+    summary = summarize(load, recorder, args.deadline_ms)
+    summary["config"] = {k: getattr(args, k) for k in ("requests", "concurrency", "mix", "tool_latency_ms", "use_cache", "url", "deadline_ms")}
+    print_report(summary)
+
+    if args.save_baseline:
+        with open(args.save_baseline, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+        print(f"Saved baseline to {args.save_baseline}")
+
+    if args.baseline:
+        with open(args.baseline, encoding="utf-8") as f:
+            baseline = json.load(f)
+        problems = find_regressions(summary, baseline, args.max_regression)
+        if problems:
+            print(f"REGRESSION (threshold {args.max_regression:.0%}):")
+            for problem in problems:
+                print(f"  {problem}")
+            return 1
+        print(f"No regression against {args.baseline} (threshold {args.max_regression:.0%}).")
+    return 0
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--mix", default="tool_one=1,tool_two=1,fallback=1", help="Weights per prompt category.")
+    parser.add_argument("--tool-latency-ms", type=float, default=10.0, help="Delay injected into every tool call.")
+    parser.add_argument("--warmup", type=int, default=50, help="Requests sent before measuring.")
+    parser.add_argument("--use-cache", action="store_true", help="Let the response cache serve repeated prompts.")
+    parser.add_argument("--url", help="Benchmark a live server instead of the in-process app (no stage breakdown).")
+    parser.add_argument("--deadline-ms", type=float, default=0.0,
+                        help="Only count successful responses faster than this towards goodput (0 = no deadline).")
+    parser.add_argument("--honor-retry-after", action="store_true",
+                        help="Clients wait for Retry-After after a 429/503 instead of sending the next request at once.")
+    parser.add_argument("--seed", type=int, default=1234)
+    parser.add_argument("--save-baseline", help="Write the results to this JSON file.")
+    parser.add_argument("--baseline", help="Compare against this JSON baseline.")
+    parser.add_argument("--max-regression", type=float, default=0.2, help="Allowed slowdown as a fraction (0.2 = 20%%).")
+    args = parser.parse_args()
+    sys.exit(asyncio.run(main_async(args)))
+
+
+if __name__ == "__main__":
+    main()
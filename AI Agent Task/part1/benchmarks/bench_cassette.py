@@ -0,0 +1,80 @@
+"""
+Evaluation-style runs of the agent with live backends versus a replayed cassette.
+
+The agent answers N distinct prompts (tool calls plus LLM synthesis/fallback against the
+local mock LLM server with a fixed latency) while recording a cassette, then answers them
+again in strict replay mode with no LLM configured at all. Also reports the cassette size
+and how long opening it takes.
+
+Usage: python -m part1.benchmarks.bench_cassette [--cases 2000] [--latency-ms 50] [--concurrency 32]
+"""
+import argparse
+import asyncio
+import os
+import tempfile
+import time
+from typing import List
+
+from part1.agent import IntelligentAgent
+from part1.benchmarks.bench_llm import start_mock_server
+from part1.cassette import MODE_RECORD, MODE_STRICT, Cassette
+from part1.llm import HttpLLMClient
+
+PROMPT_TEMPLATES = (
+    "Process the text 'sample {i}' using placeholder tool one.",
+    "Run placeholder tool two now for order {i}.",
+    "What is the capital of country number {i}?",
+)
+
+
+async def answer_all(agent: IntelligentAgent, prompts: List[str], concurrency: int) -> List[str]:
+    semaphore = asyncio.Semaphore(concurrency)
+
+    async def one(prompt: str) -> str:
+        async with semaphore:
+            return (await agent.process_prompt(prompt)).response
+
+    return list(await asyncio.gather(*(one(prompt) for prompt in prompts)))
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    prompts = [PROMPT_TEMPLATES[i % len(PROMPT_TEMPLATES)].format(i=i) for i in range(args.cases)]
+    base_url = start_mock_server(args.latency_ms, tokens_per_second=0)
+    path = os.path.join(tempfile.mkdtemp(), "bench.cassette")
+
+    recording = Cassette(path, MODE_RECORD)
+    llm = HttpLLMClient(base_url, max_connections=args.concurrency)
+    agent = IntelligentAgent(llm=llm, cassette=recording)
+    start = time.perf_counter()
+    recorded = await answer_all(agent, prompts, args.concurrency)
+    live_seconds = time.perf_counter() - start
+    await llm.aclose()
+    recording.close()
+
+    start = time.perf_counter()
+    replay = Cassette(path, MODE_STRICT)
+    open_ms = (time.perf_counter() - start) * 1000
+    agent = IntelligentAgent(llm=None, cassette=replay)
+    start = time.perf_counter()
+    replayed = await answer_all(agent, prompts, args.concurrency)
+    replay_seconds = time.perf_counter() - start
+
+    print(f"{args.cases} cases, LLM latency {args.latency_ms:.0f} ms, concurrency {args.concurrency}")
+    print(f"  live (recording)   {args.cases / live_seconds:10,.0f} cases/s  ({live_seconds:.2f} s)")
+    print(f"  strict replay      {args.cases / replay_seconds:10,.0f} cases/s  ({replay_seconds:.2f} s, "
+          f"{live_seconds / replay_seconds:.0f}x)")
+    print(f"  cassette: {len(replay)} entries, {os.path.getsize(path) / 1024:.0f} KB, opened in {open_ms:.2f} ms")
+    print(f"  misses: {replay.misses}, identical responses: {replayed == recorded}")
+    replay.close()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--cases", type=int, default=2000)
+    parser.add_argument("--latency-ms", type=float, default=50)
+    parser.add_argument("--concurrency", type=int, default=32)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,72 @@
+"""
+Throughput of response scoring for large regression sets.
+
+Builds N (case, response) pairs by cycling through the evaluation cases with responses
+that pass or fail their criteria, then scores them with evaluate_case one at a time
+(compiling the criteria on every call), with evaluate_many in one process (each case
+compiled once) and with evaluate_many across a process pool. The judged criteria get
+fixed PASS verdicts, so only the scoring is measured (judge.py covers the judging).
+
+Usage: python -m part1.benchmarks.bench_evaluation [--responses 50000] [--processes 4]
+"""
+import argparse
+import time
+from typing import Any, Dict, List, Tuple
+
+from part1.evaluation.evaluation_cases import get_evaluation_cases
+from part1.evaluation.evaluator import JUDGED_CRITERIA, PASS, Verdicts, evaluate_case, evaluate_many
+from part1.models import AgentResponse, ToolUsage
+
+
+# Filler that makes responses about as long as real LLM answers (~2 KB).
+FILLER = ("The agent considered the request, checked which tools apply and summarized what it found "
+          "for the user in a few short paragraphs. ") * 16
+
+
+def make_pairs(count: int) -> List[Tuple[Dict[str, Any], AgentResponse]]:
+    cases = [case for case in get_evaluation_cases() if case["expected_outcome"]["criteria"]]
+    tool_call = ToolUsage(tool_name="PlaceholderToolOne", tool_input="sample data",
+                          tool_output="[[Processed by ToolOne]]: sample data")
+    responses = [
+        AgentResponse(response=FILLER + "Used PlaceholderToolOne. Result: [[Processed by ToolOne]]: sample data.",
+                      tool_calls=[tool_call]),
+        AgentResponse(response=FILLER + "Agent: My advanced functions via LLM are not currently available, and no "
+                                        "specific tools were triggered by keywords. The capital of Canada is Ottawa."),
+    ]
+    return [(cases[i % len(cases)], responses[i % len(responses)]) for i in range(count)]
+
+
+def passing_verdicts() -> Verdicts:
+    return {(criterion["type"], str(criterion.get("value"))): (PASS, "benchmark")
+            for case in get_evaluation_cases() for criterion in case["expected_outcome"]["criteria"]
+            if criterion["type"] in JUDGED_CRITERIA}
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--responses", type=int, default=50000)
+    parser.add_argument("--processes", type=int, default=4)
+    args = parser.parse_args()
+
+    pairs = make_pairs(args.responses)
+    verdicts = passing_verdicts()
+    per_pair = [verdicts] * len(pairs)
+    runs = [
+        ("evaluate_case per response", lambda: [evaluate_case(case, response, verdicts) for case, response in pairs]),
+        ("evaluate_many", lambda: evaluate_many(pairs, verdicts=per_pair)),
+        (f"evaluate_many, {args.processes} processes",
+         lambda: evaluate_many(pairs, processes=args.processes, verdicts=per_pair)),
+    ]
+    print(f"{args.responses} responses")
+    baseline = None
+    for label, run in runs:
+        start = time.perf_counter()
+        results = run()
+        elapsed = time.perf_counter() - start
+        passed = sum(result.passed for result in results)
+        baseline = baseline or elapsed
+        print(f"  {label:<32} {len(results) / elapsed:12,.0f} cases/s  ({passed} passed, {baseline / elapsed:.1f}x)")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,95 @@
+"""
+Throughput of the LLM client against the local mock LLM server over real sockets.
+
+Compares the shared pooled client (one keep-alive pool per worker) with opening a new
+client per request, and reports how many TCP connections the server saw for each.
+
+Usage:
+    python -m part1.benchmarks.bench_llm --requests 500 --concurrency 32 --latency-ms 20
+"""
+import argparse
+import asyncio
+import socket
+import threading
+import time
+from typing import Any, Callable, Dict
+
+import httpx
+
+from part1.evaluation.stats import percentile
+from part1.llm import HttpLLMClient
+from part1.llm.mock_server import create_app
+
+
+def start_mock_server(latency_ms: float, tokens_per_second: float, max_concurrency: int = 0) -> str:
+    """Runs the mock LLM server on a free local port in a daemon thread and returns its URL."""
+    import uvicorn
+
+    with socket.socket() as sock:
+        sock.bind(("127.0.0.1", 0))
+        port = sock.getsockname()[1]
+    config = uvicorn.Config(create_app(latency_ms, tokens_per_second, max_concurrency=max_concurrency), host="127.0.0.1", port=port, log_level="warning")
+    server = uvicorn.Server(config)
+    threading.Thread(target=server.run, daemon=True).start()
+    while not server.started:
+        time.sleep(0.01)
+    return f"http://127.0.0.1:{port}"
+
+
+async def run(call: Callable[[str], Any], requests: int, concurrency: int) -> Dict[str, float]:
+    semaphore = asyncio.Semaphore(concurrency)
+    latencies = []
+
+    async def one(i: int) -> None:
+        async with semaphore:
+            start = time.perf_counter()
+            await call(f"benchmark prompt {i}")
+            latencies.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(one(i) for i in range(requests)))
+    wall = time.perf_counter() - start
+    return {"rps": requests / wall, "p50_ms": percentile(latencies, 50) * 1000, "p99_ms": percentile(latencies, 99) * 1000}
+
+
+async def connections_seen(base_url: str) -> int:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        return (await client.get("/stats")).json()["connections"]
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    pooled_url = start_mock_server(args.latency_ms, args.tokens_per_second)
+    fresh_url = start_mock_server(args.latency_ms, args.tokens_per_second)
+
+    pooled = HttpLLMClient(pooled_url, max_connections=args.concurrency)
+    try:
+        pooled_stats = await run(pooled.generate, args.requests, args.concurrency)
+    finally:
+        await pooled.aclose()
+
+    async def fresh_call(prompt: str) -> str:
+        client = HttpLLMClient(fresh_url)
+        try:
+            return await client.generate(prompt)
+        finally:
+            await client.aclose()
+
+    fresh_stats = await run(fresh_call, args.requests, args.concurrency)
+
+    print(f"{args.requests} requests, concurrency {args.concurrency}, server latency {args.latency_ms} ms")
+    for label, stats, url in (("pooled client", pooled_stats, pooled_url), ("client per request", fresh_stats, fresh_url)):
+        print(f"  {label:<20} {stats['rps']:8.1f} req/s  p50 {stats['p50_ms']:7.2f} ms  "
+              f"p99 {stats['p99_ms']:7.2f} ms  connections {await connections_seen(url)}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=500)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,66 @@
+"""
+Throughput of concurrent LLM calls with and without micro-batching, against the local
+mock LLM server with a fixed number of backend slots.
+
+Without batching every call holds a backend slot for its whole latency, so throughput
+is capped at slots / latency. With micro-batching, calls arriving within the window are
+sent as one batched request that uses a single slot.
+
+Usage:
+    python -m part1.benchmarks.bench_llm_batching --requests 1000 --concurrency 64 --backend-slots 4
+"""
+import argparse
+import asyncio
+
+import httpx
+
+from part1.benchmarks.bench_llm import run, start_mock_server
+from part1.llm import HttpLLMClient, MicroBatchingLLMClient
+
+
+async def server_stats(base_url: str) -> dict:
+    async with httpx.AsyncClient(base_url=base_url) as client:
+        return (await client.get("/stats")).json()
+
+
+async def main_async(args: argparse.Namespace) -> None:
+    plain_url = start_mock_server(args.latency_ms, args.tokens_per_second, args.backend_slots)
+    batched_url = start_mock_server(args.latency_ms, args.tokens_per_second, args.backend_slots)
+
+    plain = HttpLLMClient(plain_url, max_connections=args.concurrency)
+    try:
+        plain_stats = await run(plain.generate, args.requests, args.concurrency)
+    finally:
+        await plain.aclose()
+
+    batched = MicroBatchingLLMClient(HttpLLMClient(batched_url, batch_endpoint=True),
+                                     window_ms=args.window_ms, max_batch_size=args.max_batch_size)
+    try:
+        batched_stats = await run(batched.generate, args.requests, args.concurrency)
+    finally:
+        await batched.aclose()
+
+    print(f"{args.requests} calls, concurrency {args.concurrency}, backend slots {args.backend_slots}, "
+          f"latency {args.latency_ms} ms, window {args.window_ms} ms, max batch {args.max_batch_size}")
+    for label, stats, url in (("unbatched", plain_stats, plain_url), ("micro-batched", batched_stats, batched_url)):
+        backend = await server_stats(url)
+        print(f"  {label:<14} {stats['rps']:8.1f} calls/s  p50 {stats['p50_ms']:7.2f} ms  "
+              f"p99 {stats['p99_ms']:7.2f} ms  backend requests {backend['requests']}")
+    if batched.batches_sent:
+        print(f"  mean batch size {batched.calls_batched / batched.batches_sent:.1f}")
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=1000)
+    parser.add_argument("--concurrency", type=int, default=64)
+    parser.add_argument("--latency-ms", type=float, default=20.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0)
+    parser.add_argument("--backend-slots", type=int, default=4, help="Requests the mock backend serves at once.")
+    parser.add_argument("--window-ms", type=float, default=5.0)
+    parser.add_argument("--max-batch-size", type=int, default=16)
+    asyncio.run(main_async(parser.parse_args()))
+
+
+if __name__ == "__main__":
+    main()
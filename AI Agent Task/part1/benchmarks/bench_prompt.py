@@ -0,0 +1,48 @@
+"""
+Micro-benchmark for system prompt assembly.
+
+Compares, per request, re-rendering the system prompt from the tools (what a naive LLM
+integration does), looking the bundle up by tool specs (build_prompt_bundle, cached),
+and using the agent's precomputed prompt, for 2, 100 and 1000 registered tools.
+
+Usage: python -m part1.benchmarks.bench_prompt [--iterations N]
+"""
+import argparse
+import timeit
+
+from part1.agent import IntelligentAgent
+from part1.benchmarks.bench_routing import make_synthetic_tools
+from part1.prompts import SYSTEM_PROMPT_TEMPLATE, build_prompt_bundle, tool_specs
+
+USER_PROMPT = "Tell me about animals and cities."
+
+
+def render_per_request(tools) -> str:
+    descriptions = "\n".join(spec.render() for spec in tool_specs(tools))
+    return SYSTEM_PROMPT_TEMPLATE.format(tool_descriptions=descriptions)
+
+
+def messages(system_prompt: str):
+    return [{"role": "system", "content": system_prompt}, {"role": "user", "content": USER_PROMPT}]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'tools':>6} {'render us/req':>14} {'bundle lookup us/req':>21} {'precomputed us/req':>19}")
+    for count in (2, 100, 1000):
+        tools = make_synthetic_tools(count)
+        agent = IntelligentAgent(tools=tools)
+        assert render_per_request(tools) == agent.system_prompt == build_prompt_bundle(tools).text
+
+        slow_iterations = max(1, args.iterations // 10)
+        render = timeit.timeit(lambda: messages(render_per_request(tools)), number=slow_iterations) / slow_iterations
+        lookup = timeit.timeit(lambda: messages(build_prompt_bundle(tools).text), number=slow_iterations) / slow_iterations
+        precomputed = timeit.timeit(lambda: messages(agent.system_prompt), number=args.iterations) / args.iterations
+        print(f"{count:>6} {render * 1e6:>14.2f} {lookup * 1e6:>21.2f} {precomputed * 1e6:>19.3f}")
+
+
+if __name__ == "__main__":
+    main()
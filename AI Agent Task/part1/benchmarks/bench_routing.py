@@ -0,0 +1,64 @@
+"""
+Micro-benchmark for prompt routing.
+
+Compares the compiled trigger matcher (part1/routing.py) with the old approach of
+lowercasing the prompt and testing every tool's phrases one by one, for 2, 100 and
+1000 registered tools.
+
+Usage: python -m part1.benchmarks.bench_routing [--iterations N]
+"""
+import argparse
+import timeit
+from typing import List
+
+from part1.routing import ToolRouter
+from part1.tools import AVAILABLE_TOOLS
+from part1.tools.base import BaseTool
+
+PROMPTS = [
+    "Process the text 'sample data' using placeholder tool one.",
+    "Run placeholder tool two now.",
+    "Tell me about animals and cities, and give me a long and detailed answer with examples.",
+]
+
+
+def make_synthetic_tools(count: int) -> List[BaseTool]:
+    """The real tools plus synthetic ones with their own trigger phrases."""
+    tools: List[BaseTool] = list(AVAILABLE_TOOLS)
+    for i in range(count - len(tools)):
+        cls = type(f"SyntheticTool{i}", (BaseTool,), {
+            "name": f"SyntheticTool{i}",
+            "description": "Synthetic benchmark tool.",
+            "triggers": (f"synthetic tool {i}", f"lookup widget {i}"),
+        })
+        tools.append(cls())
+    return tools
+
+
+def naive_route(tools: List[BaseTool], prompt: str) -> List[str]:
+    """The per-tool substring scan the agent used before the compiled router."""
+    return [tool.name for tool in tools if any(t in prompt.lower() for t in tool.triggers)]
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--iterations", type=int, default=2000)
+    args = parser.parse_args()
+
+    print(f"{'tools':>6} {'compiled us/prompt':>20} {'naive us/prompt':>17} {'build ms':>9}")
+    for count in (2, 100, 1000):
+        tools = make_synthetic_tools(count)
+        build_ms = timeit.timeit(lambda: ToolRouter(tools), number=3) / 3 * 1000
+        router = ToolRouter(tools)
+        for prompt in PROMPTS:
+            assert [m.tool_name for m in router.route(prompt)] == naive_route(tools, prompt)
+
+        compiled = timeit.timeit(lambda: [router.route(p) for p in PROMPTS], number=args.iterations)
+        naive = timeit.timeit(lambda: [naive_route(tools, p) for p in PROMPTS], number=max(1, args.iterations // 10))
+        per_prompt = 1e6 / len(PROMPTS)
+        print(f"{count:>6} {compiled / args.iterations * per_prompt:>20.2f} "
+              f"{naive / max(1, args.iterations // 10) * per_prompt:>17.2f} {build_ms:>9.1f}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,78 @@
+"""
+Micro-benchmark for encoding AgentResponse bodies.
+
+Compares FastAPI's response_model path (validate the returned model again, run
+jsonable_encoder, then json.dumps) with part1.serialization (orjson straight from the
+model, or msgpack when installed), and the cost and size of gzip / zstd on top, for a
+small response and for one carrying a multi-MB tool output.
+
+Usage: python -m part1.benchmarks.bench_serialization [--large-mb 4] [--iterations N]
+"""
+import argparse
+import json
+import time
+from typing import Callable, List, Tuple
+
+from fastapi.encoders import jsonable_encoder
+
+from part1 import serialization
+from part1.models import AgentResponse, ToolUsage
+
+
+def make_response(output_bytes: int) -> AgentResponse:
+    """An AgentResponse whose tool output is a list of records totalling about `output_bytes` of JSON."""
+    record = {"id": 0, "name": "record", "score": 0.5, "tags": ["a", "b", "c"], "text": "lorem ipsum " * 4}
+    record_size = len(json.dumps(record))
+    records = [{**record, "id": i, "score": i / 7} for i in range(max(1, output_bytes // record_size))]
+    return AgentResponse(
+        response="Based on this: the records you asked for.",
+        tool_calls=[ToolUsage(tool_name="PlaceholderToolOne", tool_input="x", tool_output=records)],
+    )
+
+
+def fastapi_response_model(response: AgentResponse) -> bytes:
+    # What `response_model=AgentResponse` does with a returned model.
+    validated = AgentResponse.model_validate(response.model_dump())
+    return json.dumps(jsonable_encoder(validated), ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def time_per_call(fn: Callable[[], bytes], iterations: int) -> Tuple[float, int]:
+    size = len(fn())
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations * 1000, size
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--large-mb", type=float, default=4.0)
+    parser.add_argument("--iterations", type=int, default=2000, help="Iterations for the small body; the large one runs 1/500th.")
+    args = parser.parse_args()
+
+    print(f"orjson: {serialization.ORJSON_AVAILABLE}  msgpack: {serialization.MSGPACK_AVAILABLE}  "
+          f"zstd: {serialization.ZSTD_AVAILABLE}")
+    cases = (("small", make_response(200), args.iterations),
+             (f"{args.large_mb:g} MB tool output", make_response(int(args.large_mb * 1024 * 1024)), max(3, args.iterations // 500)))
+    for label, response, iterations in cases:
+        encoded = serialization.dumps_json(response)
+        candidates: List[Tuple[str, Callable[[], bytes]]] = [
+            ("response_model + json", lambda: fastapi_response_model(response)),
+            ("model_dump_json", lambda: response.model_dump_json().encode("utf-8")),
+            ("serialization.dumps_json", lambda: serialization.dumps_json(response)),
+        ]
+        if serialization.MSGPACK_AVAILABLE:
+            candidates.append(("serialization.dumps_msgpack", lambda: serialization.dumps_msgpack(response)))
+        candidates.append(("  + gzip", lambda: serialization.compress(encoded, "gzip")))
+        if serialization.ZSTD_AVAILABLE:
+            candidates.append(("  + zstd", lambda: serialization.compress(encoded, "zstd")))
+
+        print(f"\n{label} ({len(encoded):,} bytes of JSON, {iterations} iterations)")
+        print(f"  {'encoder':<30} {'ms/call':>10} {'bytes':>12}")
+        for name, fn in candidates:
+            ms, size = time_per_call(fn, iterations)
+            print(f"  {name:<30} {ms:10.3f} {size:12,}")
+
+
+if __name__ == "__main__":
+    main()
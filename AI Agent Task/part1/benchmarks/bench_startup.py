@@ -0,0 +1,82 @@
+"""
+Cold-start cost of one gunicorn worker, measured in fresh interpreters.
+
+Each run starts a new Python process (as gunicorn does for a worker without --preload)
+and times importing part1.main, the lifespan startup (parallel tool loading and
+warmup) and the first /process_prompt request. `--lazy` skips the lifespan, so tools
+are loaded by the first request instead. Use `--output` to keep the numbers and track
+them over time; a regression shows up as a slower import or startup.
+
+Usage: python -m part1.benchmarks.bench_startup [--runs 10] [--lazy] [--output startup.json]
+"""
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+from typing import Dict, List
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+WORKER_SCRIPT = r"""
+import asyncio, json, sys, time
+t0 = time.perf_counter()
+from part1.main import app
+t1 = time.perf_counter()
+import httpx
+
+async def main():
+    timings = {"import_ms": (t1 - t0) * 1000}
+    lazy = sys.argv[1] == "lazy"
+    start = time.perf_counter()
+    async with (app.router.lifespan_context(app) if not lazy else _nothing()):
+        timings["startup_ms"] = (time.perf_counter() - start) * 1000
+        transport = httpx.ASGITransport(app=app)
+        async with httpx.AsyncClient(transport=transport, base_url="http://worker") as client:
+            start = time.perf_counter()
+            response = await client.post("/process_prompt", json={"prompt": "use tool one: warm?"})
+            response.raise_for_status()
+            timings["first_request_ms"] = (time.perf_counter() - start) * 1000
+    timings["total_ms"] = (time.perf_counter() - t0) * 1000
+    timings["modules"] = len(sys.modules)
+    print(json.dumps(timings))
+
+class _nothing:
+    async def __aenter__(self): return None
+    async def __aexit__(self, *exc): return False
+
+asyncio.run(main())
+"""
+
+
+def run_worker(lazy: bool) -> Dict[str, float]:
+    env = {**os.environ, "PYTHONPATH": REPO_ROOT, "LOG_ENABLED": "false"}
+    result = subprocess.run([sys.executable, "-c", WORKER_SCRIPT, "lazy" if lazy else "eager"],
+                            cwd=REPO_ROOT, env=env, capture_output=True, text=True, check=True)
+    return json.loads(result.stdout.strip().splitlines()[-1])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--runs", type=int, default=10)
+    parser.add_argument("--lazy", action="store_true", help="Skip the lifespan; tools load on the first request.")
+    parser.add_argument("--output", help="Write the per-run timings and medians to this JSON file.")
+    args = parser.parse_args()
+
+    runs: List[Dict[str, float]] = [run_worker(args.lazy) for _ in range(args.runs)]
+    keys = ("import_ms", "startup_ms", "first_request_ms", "total_ms")
+    medians = {key: statistics.median(run[key] for run in runs) for key in keys}
+
+    print(f"{args.runs} cold worker starts ({'lazy' if args.lazy else 'eager startup + warmup'}), "
+          f"{runs[0]['modules']} modules loaded")
+    print(f"  {'':<18} {'median ms':>10} {'max ms':>10}")
+    for key in keys:
+        print(f"  {key:<18} {medians[key]:10.1f} {max(run[key] for run in runs):10.1f}")
+    if args.output:
+        with open(args.output, "w") as f:
+            json.dump({"lazy": args.lazy, "runs": runs, "median": medians}, f, indent=2)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,344 @@
+
+import bisect
+import hashlib
+import json
+import mmap
+import os
+import struct
+import threading
+import zlib
+from typing import Any, Dict, List, Optional, Tuple, Union
+
+from part1.llm import LLMClient, LLMError
+from part1.structured_logging import get_logger
+from part1.tools.resilience import NotAToolFailure
+
+logger = get_logger(__name__)
+
+# CASSETTE_MODE: "off" (default), "record" (call the backends and store every result),
+# "replay" (serve stored results, call the backends on a miss) or "strict" (serve stored
+# results, fail on a miss).
+MODE_OFF = "off"
+MODE_RECORD = "record"
+MODE_REPLAY = "replay"
+MODE_STRICT = "strict"
+CASSETTE_MODES = (MODE_OFF, MODE_RECORD, MODE_REPLAY, MODE_STRICT)
+DEFAULT_PATH = os.getenv("CASSETTE_PATH", "cassettes/agent.cassette")
+
+KIND_TOOL = 0
+KIND_LLM = 1
+
+# File layout: MAGIC, then the payloads (each distinct payload once), then the index of
+# (request key, kind, payload offset, payload length) entries sorted by key, then the
+# trailer. Replay maps the file and binary-searches the index in place, so opening a
+# cassette costs the same whatever its size.
+_MAGIC = b"AGCASS01"
+_ENTRY = struct.Struct("<32sBQI")
+_TRAILER = struct.Struct("<QQQQ8s")
+# Payloads start with a format byte: raw JSON or zlib-compressed JSON.
+_RAW = b"j"
+_ZLIB = b"z"
+_COMPRESS_MIN_BYTES = 128
+# Misses listed in stats(); the rest are only counted.
+_MAX_REPORTED_MISSES = 100
+
+
+class CassetteMiss(LookupError, NotAToolFailure):
+    """A call that strict mode found no recording for."""
+
+
+class RecordedError(NotAToolFailure):
+    """Replays an error the backend raised while recording."""
+
+
+def request_key(kind: int, *parts: Any) -> bytes:
+    """Content address of a call: SHA-256 of its kind and canonical JSON arguments."""
+    canonical = json.dumps([kind, *parts], sort_keys=True, separators=(",", ":"), ensure_ascii=False, default=repr)
+    return hashlib.sha256(canonical.encode("utf-8")).digest()
+
+
+def _encode(value: Dict[str, Any]) -> bytes:
+    raw = json.dumps(value, separators=(",", ":"), ensure_ascii=False).encode("utf-8")
+    if len(raw) >= _COMPRESS_MIN_BYTES:
+        packed = zlib.compress(raw, 6)
+        if len(packed) < len(raw):
+            return _ZLIB + packed
+    return _RAW + raw
+
+
+def _decode(payload: bytes) -> Dict[str, Any]:
+    body = payload[1:]
+    return json.loads(zlib.decompress(body) if payload[:1] == _ZLIB else body)
+
+
+class _Index:
+    """Sorted index entries of a mapped cassette, readable by position (for bisect)."""
+    def __init__(self, view: Union[mmap.mmap, bytes], offset: int, count: int):
+        self.view = view
+        self.offset = offset
+        self.count = count
+
+    def __len__(self) -> int:
+        return self.count
+
+    def __getitem__(self, position: int) -> bytes:
+        start = self.offset + position * _ENTRY.size
+        return self.view[start:start + 32]
+
+    def entry(self, position: int) -> Tuple[bytes, int, int, int]:
+        return _ENTRY.unpack_from(self.view, self.offset + position * _ENTRY.size)
+
+
+class Cassette:
+    """
+    Recorded tool and LLM results, addressed by a hash of the call.
+
+    In record mode results are kept in memory and written by `save()` into a new file
+    that replaces the old one atomically, keeping the earlier recordings that weren't
+    re-recorded; identical payloads are stored once. In replay and strict mode the file
+    is memory-mapped and looked up without loading it.
+    """
+    def __init__(self, path: str = DEFAULT_PATH, mode: str = MODE_REPLAY):
+        if mode not in CASSETTE_MODES or mode == MODE_OFF:
+            raise ValueError(f"Invalid cassette mode '{mode}'. Choose from {', '.join(CASSETTE_MODES[1:])}.")
+        self.path = path
+        self.mode = mode
+        self._lock = threading.Lock()
+        self._file = None
+        self._map: Optional[mmap.mmap] = None
+        self._index: Optional[_Index] = None
+        self.kind_counts = {KIND_TOOL: 0, KIND_LLM: 0}
+        # Recorded in this session and not saved yet: key -> (kind, payload).
+        self._new: Dict[bytes, Tuple[int, bytes]] = {}
+        self.hits = 0
+        self.misses = 0
+        self.miss_details: List[str] = []
+        self._open()
+
+    def _open(self) -> None:
+        if not os.path.exists(self.path):
+            if self.mode == MODE_STRICT:
+                logger.warning("Cassette %s does not exist; every call will be a miss.", self.path)
+            return
+        self._file = open(self.path, "rb")
+        size = os.fstat(self._file.fileno()).st_size
+        if size < len(_MAGIC) + _TRAILER.size:
+            raise ValueError(f"{self.path} is not a cassette file")
+        self._map = mmap.mmap(self._file.fileno(), 0, access=mmap.ACCESS_READ)
+        index_offset, count, tools, llm_calls, magic = _TRAILER.unpack_from(self._map, size - _TRAILER.size)
+        if self._map[:len(_MAGIC)] != _MAGIC or magic != _MAGIC:
+            raise ValueError(f"{self.path} is not a cassette file")
+        self._index = _Index(self._map, index_offset, count)
+        self.kind_counts = {KIND_TOOL: tools, KIND_LLM: llm_calls}
+
+    @property
+    def replaying(self) -> bool:
+        return self.mode in (MODE_REPLAY, MODE_STRICT)
+
+    def __len__(self) -> int:
+        saved = len(self._index) if self._index is not None else 0
+        return saved + sum(1 for key in self._new if self._saved_payload(key) is None)
+
+    def has_kind(self, kind: int) -> bool:
+        return self.kind_counts.get(kind, 0) > 0 or any(k == kind for k, _ in self._new.values())
+
+    def _saved_payload(self, key: bytes) -> Optional[bytes]:
+        index = self._index
+        if index is None:
+            return None
+        position = bisect.bisect_left(index, key)
+        if position == len(index) or index[position] != key:
+            return None
+        _, _, offset, length = index.entry(position)
+        return self._map[offset:offset + length]
+
+    def lookup(self, key: bytes) -> Optional[Dict[str, Any]]:
+        """The recorded result for a call ({"ok": value} or {"error": message}), or None."""
+        new = self._new.get(key)
+        payload = new[1] if new is not None else self._saved_payload(key)
+        if payload is None:
+            return None
+        self.hits += 1
+        return _decode(payload)
+
+    def record(self, key: bytes, kind: int, value: Dict[str, Any]) -> None:
+        try:
+            payload = _encode(value)
+        except (TypeError, ValueError) as e:
+            logger.warning("Result not recorded, it isn't JSON-serializable: %s", e)
+            return
+        with self._lock:
+            self._new[key] = (kind, payload)
+
+    def report_miss(self, description: str) -> None:
+        with self._lock:
+            self.misses += 1
+            if len(self.miss_details) < _MAX_REPORTED_MISSES:
+                self.miss_details.append(description[:200])
+
+    def save(self) -> None:
+        """Writes the cassette if anything was recorded: old and new entries, payloads deduplicated."""
+        with self._lock:
+            if not self._new:
+                return
+            entries: Dict[bytes, Tuple[int, bytes]] = {}
+            if self._index is not None:
+                for position in range(len(self._index)):
+                    key, kind, offset, length = self._index.entry(position)
+                    entries[key] = (kind, self._map[offset:offset + length])
+            entries.update(self._new)
+
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            tmp_path = f"{self.path}.{os.getpid()}.tmp"
+            offsets: Dict[bytes, Tuple[int, int]] = {}
+            index: List[bytes] = []
+            counts = {KIND_TOOL: 0, KIND_LLM: 0}
+            with open(tmp_path, "wb") as f:
+                f.write(_MAGIC)
+                for key in sorted(entries):
+                    kind, payload = entries[key]
+                    digest = hashlib.sha256(payload).digest()
+                    location = offsets.get(digest)
+                    if location is None:
+                        location = offsets[digest] = (f.tell(), len(payload))
+                        f.write(payload)
+                    index.append(_ENTRY.pack(key, kind, *location))
+                    counts[kind] = counts.get(kind, 0) + 1
+                index_offset = f.tell()
+                f.write(b"".join(index))
+                f.write(_TRAILER.pack(index_offset, len(index), counts[KIND_TOOL], counts[KIND_LLM], _MAGIC))
+            self._close_map()
+            os.replace(tmp_path, self.path)
+            self._new.clear()
+            self._open()
+            logger.info("Saved cassette %s with %d entries (%d unique payloads)", self.path, len(index), len(offsets))
+
+    def _close_map(self) -> None:
+        if self._map is not None:
+            self._map.close()
+            self._map = None
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+        self._index = None
+
+    def close(self) -> None:
+        """Saves what was recorded and unmaps the file."""
+        if self.mode == MODE_RECORD:
+            self.save()
+        self._close_map()
+
+    def stats(self) -> Dict[str, Any]:
+        return {"path": self.path, "mode": self.mode, "hits": self.hits, "misses": self.misses,
+                "recorded": len(self._new), "miss_details": list(self.miss_details)}
+
+    async def call(self, kind: int, key: bytes, description: str, backend: Optional[Any]) -> Any:
+        """
+        Runs one call through the cassette. `backend` is a zero-argument coroutine function
+        calling the real backend, or None when there is none (e.g. replay without an LLM).
+        """
+        if self.replaying:
+            recorded = self.lookup(key)
+            if recorded is not None:
+                if "error" in recorded:
+                    raise RecordedError(recorded["error"])
+                return recorded["ok"]
+            self.report_miss(description)
+            if self.mode == MODE_STRICT or backend is None:
+                raise CassetteMiss(f"No recording for {description}")
+            return await backend()
+
+        try:
+            result = await backend()
+        except Exception as e:
+            self.record(key, kind, {"error": str(e)})
+            raise
+        self.record(key, kind, {"ok": result})
+        return result
+
+
+def _describe(kind: str, name: str, value: Any) -> str:
+    return f"{kind} {name}: {value!r:.120}"
+
+
+class CassetteToolExecutor:
+    """
+    ToolExecutor wrapper that records or replays tool calls; it wraps every tool's
+    `run`/`arun`, whatever its execution mode. The key is the tool name and its input.
+    """
+    def __init__(self, inner: Any, cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    async def run(self, tool: Any, tool_input: Any) -> Any:
+        name = getattr(tool, "name", type(tool).__name__)
+        key = request_key(KIND_TOOL, name, tool_input)
+        return await self.cassette.call(KIND_TOOL, key, _describe("tool", name, tool_input),
+                                        lambda: self.inner.run(tool, tool_input))
+
+    def __getattr__(self, name: str) -> Any:
+        return getattr(self.inner, name)
+
+
+class CassetteLLMClient(LLMClient):
+    """
+    LLM client wrapper that records or replays completions, keyed by system prompt,
+    prompt and token limit. The model isn't part of the key, so replay works without an
+    inner client (and the LLM_* settings); re-record after switching models. Without an
+    inner client misses raise LLMError, so the agent falls back as if no LLM were
+    configured (strict mode raises CassetteMiss instead).
+    """
+    def __init__(self, inner: Optional[LLMClient], cassette: Cassette):
+        self.inner = inner
+        self.cassette = cassette
+
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        key = request_key(KIND_LLM, system_prompt, prompt, max_tokens)
+        backend = (lambda: self.inner.generate(prompt, system_prompt, max_tokens)) if self.inner is not None else None
+        try:
+            return await self.cassette.call(KIND_LLM, key, _describe("llm", "completion", prompt), backend)
+        except RecordedError as e:
+            raise LLMError(str(e)) from None
+        except CassetteMiss:
+            if self.cassette.mode == MODE_STRICT:
+                raise
+            raise LLMError("no recording and no LLM backend") from None
+
+    async def aclose(self) -> None:
+        if self.inner is not None:
+            await self.inner.aclose()
+
+
+def wrap_llm(llm: Optional[LLMClient], cassette: Optional[Cassette]) -> Optional[LLMClient]:
+    """The LLM client to use under `cassette`: wrapped, or left alone when there is nothing to record or replay."""
+    if cassette is None:
+        return llm
+    if llm is None and not (cassette.replaying and cassette.has_kind(KIND_LLM)):
+        return None
+    return CassetteLLMClient(llm, cassette)
+
+
+_default_cassette: Optional[Cassette] = None
+_default_configured = False
+
+
+def configure_default_cassette(path: Optional[str] = None, mode: Optional[str] = None) -> Optional[Cassette]:
+    """
+    Sets the cassette agents use unless given one; by default from CASSETTE_MODE and
+    CASSETTE_PATH. Returns None when the mode is "off".
+    """
+    global _default_cassette, _default_configured
+    mode = (os.getenv("CASSETTE_MODE", MODE_OFF) if mode is None else mode).lower()
+    if _default_cassette is not None:
+        _default_cassette.close()
+    _default_cassette = None if mode == MODE_OFF else Cassette(path or DEFAULT_PATH, mode)
+    _default_configured = True
+    return _default_cassette
+
+
+def get_default_cassette() -> Optional[Cassette]:
+    if not _default_configured:
+        configure_default_cassette()
+    return _default_cassette
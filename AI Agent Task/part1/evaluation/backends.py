@@ -0,0 +1,133 @@
+
+from typing import Any, Optional
+
+import httpx
+
+from part1.models import AgentResponse
+
+BACKEND_CHOICES = ("http", "asgi", "inprocess")
+
+
+class EvaluationBackend:
+    """
+    Where evaluation prompts are sent. Use as an async context manager, then call `process`.
+    `process` raises on failure (httpx errors for the HTTP-based backends).
+    """
+    name = "base"
+    # Whether prompts go to a separately running server, which the default rate limit protects.
+    remote = False
+
+    @property
+    def target(self) -> str:
+        """Human-readable description of what is being evaluated."""
+        return self.name
+
+    async def __aenter__(self) -> "EvaluationBackend":
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        return None
+
+    async def process(self, prompt: str) -> AgentResponse:
+        raise NotImplementedError
+
+    async def config_hash(self) -> Optional[str]:
+        """Configuration hash of the agent being evaluated, or None when it can't be told."""
+        return None
+
+
+class HttpBackend(EvaluationBackend):
+    """Calls a running API server over HTTP with one pooled client."""
+    name = "http"
+    remote = True
+
+    def __init__(self, base_url: str, concurrency: int = 4, timeout: float = 120):
+        self.base_url = base_url.rstrip("/")
+        self.concurrency = max(1, concurrency)
+        self.timeout = timeout
+        self.client: Optional[httpx.AsyncClient] = None
+
+    @property
+    def target(self) -> str:
+        return f"{self.base_url}/process_prompt"
+
+    def _make_client(self) -> httpx.AsyncClient:
+        limits = httpx.Limits(max_connections=self.concurrency, max_keepalive_connections=self.concurrency)
+        return httpx.AsyncClient(base_url=self.base_url, limits=limits, timeout=self.timeout)
+
+    async def __aenter__(self) -> "HttpBackend":
+        self.client = self._make_client()
+        return self
+
+    async def __aexit__(self, *exc_info: Any) -> None:
+        if self.client is not None:
+            await self.client.aclose()
+            self.client = None
+
+    async def process(self, prompt: str) -> AgentResponse:
+        response = await self.client.post("/process_prompt", json={"prompt": prompt})
+        response.raise_for_status()
+        return AgentResponse.model_validate(response.json())
+
+    async def config_hash(self) -> Optional[str]:
+        try:
+            response = await self.client.get("/ready")
+            return response.json().get("config_hash")
+        except (httpx.HTTPError, ValueError, AttributeError):
+            return None
+
+
+class AsgiBackend(HttpBackend):
+    """Goes through the FastAPI app in this process over an in-memory ASGI transport (no sockets)."""
+    name = "asgi"
+    remote = False
+
+    def __init__(self, app: Any = None, concurrency: int = 4, timeout: float = 120):
+        super().__init__("http://evaluation.local", concurrency, timeout)
+        self.app = app
+
+    @property
+    def target(self) -> str:
+        return "FastAPI app (in-memory ASGI transport)"
+
+    def _make_client(self) -> httpx.AsyncClient:
+        if self.app is None:
+            from part1.main import app
+            self.app = app
+        return httpx.AsyncClient(transport=httpx.ASGITransport(app=self.app), base_url=self.base_url,
+                                 timeout=self.timeout)
+
+
+class InProcessBackend(EvaluationBackend):
+    """Calls IntelligentAgent.process_prompt directly, skipping HTTP and API validation."""
+    name = "inprocess"
+
+    def __init__(self, agent: Any = None):
+        self.agent = agent
+
+    @property
+    def target(self) -> str:
+        return "IntelligentAgent (in process)"
+
+    async def __aenter__(self) -> "InProcessBackend":
+        if self.agent is None:
+            from part1.agent import IntelligentAgent
+            self.agent = IntelligentAgent()
+        return self
+
+    async def process(self, prompt: str) -> AgentResponse:
+        return await self.agent.process_prompt(prompt)
+
+    async def config_hash(self) -> Optional[str]:
+        return self.agent.config_hash
+
+
+def create_backend(name: str, base_url: str, concurrency: int = 4, timeout: float = 120) -> EvaluationBackend:
+    """Builds the backend selected on the command line."""
+    if name == "http":
+        return HttpBackend(base_url, concurrency, timeout)
+    if name == "asgi":
+        return AsgiBackend(concurrency=concurrency, timeout=timeout)
+    if name == "inprocess":
+        return InProcessBackend()
+    raise ValueError(f"Unknown evaluation backend '{name}'. Choose from {', '.join(BACKEND_CHOICES)}.")
@@ -0,0 +1,119 @@
+
+import json
+import os
+from typing import Any, Dict, IO, Iterable, Iterator, Optional, Set
+
+from part1.evaluation.evaluator import EvaluationResult
+from part1.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+
+class DatasetError(ValueError):
+    """A case file line that is not a valid evaluation case."""
+
+
+def iter_cases(path: str) -> Iterator[Dict[str, Any]]:
+    """
+    Streams evaluation cases from a JSONL/NDJSON file, one JSON object per line, in the
+    same shape as EVALUATION_TEST_CASES. Blank lines and lines starting with "#" are
+    skipped; cases without a case_id get "line_<n>", so resumed runs can recognize them.
+    Only the current line is held in memory.
+    """
+    with open(path, "r", encoding="utf-8") as f:
+        for line_number, line in enumerate(f, 1):
+            line = line.strip()
+            if not line or line.startswith("#"):
+                continue
+            try:
+                case = json.loads(line)
+            except ValueError as e:
+                raise DatasetError(f"{path}:{line_number}: invalid JSON: {e}") from None
+            if not isinstance(case, dict) or "prompt" not in case:
+                raise DatasetError(f"{path}:{line_number}: a case must be an object with a 'prompt'")
+            case.setdefault("case_id", f"line_{line_number}")
+            yield case
+
+
+def completed_case_ids(path: str) -> Set[str]:
+    """
+    IDs of the cases that already have a result in a results file, for --resume. A line
+    cut short by a crash is ignored, so that case simply runs again.
+    """
+    done: Set[str] = set()
+    if not os.path.exists(path):
+        return done
+    # errors="replace": a crash may have cut the last line inside a multi-byte character.
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            try:
+                done.add(json.loads(line)["case_id"])
+            except (ValueError, KeyError, TypeError):
+                continue
+    return done
+
+
+def recorded_run_id(path: str) -> Optional[int]:
+    """
+    Run store ID the results in a results file were recorded under (the last one, if it
+    was written by several runs), so a resumed run can carry on recording into it.
+    """
+    run_id = None
+    if not os.path.exists(path):
+        return run_id
+    with open(path, "r", encoding="utf-8", errors="replace") as f:
+        for line in f:
+            try:
+                value = json.loads(line).get("run_id")
+            except (ValueError, AttributeError):
+                continue
+            if isinstance(value, int):
+                run_id = value
+    return run_id
+
+
+class ResultWriter:
+    """
+    Appends one JSON line per finished case to a results file and flushes it right away,
+    so a crash loses at most the cases still running. Use as a context manager.
+    """
+    def __init__(self, path: str, append: bool = False):
+        self.path = path
+        self.append = append
+        self._file: Optional[IO[str]] = None
+        self.written = 0
+
+    def __enter__(self) -> "ResultWriter":
+        needs_newline = False
+        if self.append and os.path.exists(self.path) and os.path.getsize(self.path) > 0:
+            # After a crash the last line may be incomplete, possibly mid-character; checked
+            # in binary mode so that can't fail to decode. Start on a fresh line.
+            with open(self.path, "rb") as f:
+                f.seek(-1, os.SEEK_END)
+                needs_newline = f.read(1) != b"\n"
+        self._file = open(self.path, "a" if self.append else "w", encoding="utf-8")
+        if needs_newline:
+            self._file.write("\n")
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        if self._file is not None:
+            self._file.close()
+            self._file = None
+
+    def write(self, result: EvaluationResult, **extra: Any) -> None:
+        record = {"case_id": result.case_id, "prompt": result.prompt, "passed": result.passed,
+                  **extra, "details": result.details}
+        self._file.write(json.dumps(record, default=str) + "\n")
+        self._file.flush()
+        self.written += 1
+
+
+def write_cases(cases: Iterable[Dict[str, Any]], path: str) -> int:
+    """Writes cases as JSONL (e.g. to turn EVALUATION_TEST_CASES into a dataset file)."""
+    count = 0
+    with open(path, "w", encoding="utf-8") as f:
+        for case in cases:
+            f.write(json.dumps(case) + "\n")
+            count += 1
+    return count
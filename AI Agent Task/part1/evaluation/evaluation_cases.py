@@ -10,7 +10,7 @@ EVALUATION_TEST_CASES = [
                 {"type": "response_contains", "value": "Ottawa"},
                 {"type": "no_tool_used", "value": True},
                 
-                {"type": "adheres_to_tone", "value": "helpful", "status": "TODO: Implement LLM-as-judge or rule"},
+                {"type": "adheres_to_tone", "value": "helpful"},
             ]
         },
         "notes": "Simple factual query. Tests LLM general knowledge fallback (currently simulated)."
@@ -26,7 +26,7 @@ EVALUATION_TEST_CASES = [
                 
                 {"type": "response_contains", "value": "Used PlaceholderToolOne. Result: [[Processed by ToolOne]]: sample data"}, 
                 
-                {"type": "adheres_to_constraints", "value": "concise", "status": "TODO: Implement LLM-as-judge or rule"},
+                {"type": "adheres_to_constraints", "value": "concise"},
             ]
         },
         "notes": "Tests tool routing and usage."
@@ -54,7 +54,7 @@ EVALUATION_TEST_CASES = [
                 {"type": "response_contains_keywords", "value": ["LLM are not currently available", "no specific tools were triggered"]},
                 {"type": "no_tool_used", "value": True},
 
-                {"type": "adheres_to_tone", "value": "polite", "status": "TODO: Implement LLM-as-judge"},
+                {"type": "adheres_to_tone", "value": "polite"},
             ]
         },
         "notes": "Tests fallback logic and constraint adherence (forbidden topics)."
@@ -69,7 +69,7 @@ EVALUATION_TEST_CASES = [
                 {"type": "response_contains_keywords", "value": ["LLM are not currently available", "no specific tools were triggered"]},
                 {"type": "no_tool_used", "value": True},
                  
-                {"type": "response_quality", "value": "relevant and general", "status": "TODO: Implement LLM-as-judge"},
+                {"type": "response_quality", "value": "relevant and general"},
             ]
         },
         "notes": "Tests handling of ambiguous or multi-topic prompts."
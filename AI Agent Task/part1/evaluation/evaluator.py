@@ -1,7 +1,11 @@
 
-from typing import Dict, Any, List, Optional
+from concurrent.futures import ProcessPoolExecutor
+from typing import Dict, Any, Iterable, List, Mapping, Optional, Sequence, Tuple
 
 from part1.models import AgentResponse, ToolUsage
+from part1.structured_logging import get_logger
+
+logger = get_logger(__name__)
 
 class EvaluationResult:
     """Represents the result of a single test case evaluation."""
@@ -24,99 +28,239 @@ class EvaluationResult:
         return f"Case ID: {self.case_id}\nPrompt: {self.prompt}\nStatus: {status}\nDetails:\n  {detail_str}\n"
 
 
-def evaluate_case(test_case: Dict[str, Any], agent_response: AgentResponse) -> EvaluationResult:
+# Result statuses of a criterion check.
+PASS = "PASS"
+FAIL = "FAIL"
+ERROR = "ERROR"
+
+# Criteria only a judge can score (see judge.py), and the verdicts given to `evaluate`:
+# {(criterion type, expectation): (status, reason)}.
+JUDGED_CRITERIA = ("adheres_to_tone", "adheres_to_constraints", "response_quality")
+Verdicts = Mapping[Tuple[str, str], Tuple[str, str]]
+
+
+class ResponseView:
+    """
+    What the checkers need from one AgentResponse, derived once and shared by all of a
+    case's criteria: the lowercased text (computed on first use), the tool calls
+    indexed by tool name and the judge's verdicts for the response.
+    """
+    __slots__ = ("text", "_lower", "tool_calls", "tools_by_name", "verdicts")
+
+    def __init__(self, agent_response: AgentResponse, verdicts: Optional[Verdicts] = None):
+        self.text = agent_response.response
+        self.verdicts = verdicts or {}
+        self._lower: Optional[str] = None
+        self.tool_calls: List[ToolUsage] = agent_response.tool_calls or []
+        self.tools_by_name: Dict[str, List[ToolUsage]] = {}
+        for tc in self.tool_calls:
+            self.tools_by_name.setdefault(tc.tool_name, []).append(tc)
+
+    @property
+    def lower(self) -> str:
+        if self._lower is None:
+            self._lower = self.text.lower()
+        return self._lower
+
+
+class Checker:
+    """A criterion compiled from its dict. `check` returns (status, message); FAIL and ERROR fail the case."""
+    def check(self, view: ResponseView) -> Tuple[str, Any]:
+        raise NotImplementedError
+
+
+class ResponseContains(Checker):
+    def __init__(self, value: Any):
+        self.expected = str(value)
+        self.message = f"Response contains '{self.expected}'"
+
+    def check(self, view: ResponseView) -> Tuple[str, Any]:
+        return (PASS if self.expected in view.text else FAIL), self.message
+
+
+class ResponseContainsKeywords(Checker):
+    """
+    Passes when any keyword occurs in the response, case-insensitively. Keywords are
+    lowercased once here and the response once per view. Plain substring checks are
+    used rather than one combined regex: CPython's `in` is several times faster than
+    an alternation scan for any realistic number of keywords.
+    """
+    def __init__(self, keywords: List[str]):
+        self.keywords = tuple(keyword.lower() for keyword in keywords)
+        self.message = f"Response contains any of keywords {keywords}"
+
+    def check(self, view: ResponseView) -> Tuple[str, Any]:
+        lower = view.lower
+        passed = any(keyword in lower for keyword in self.keywords)
+        return (PASS if passed else FAIL), self.message
+
+
+class ToolUsed(Checker):
+    def __init__(self, value: Any):
+        self.tool_name = str(value)
+        self.message = f"Tool '{self.tool_name}' was used"
+
+    def check(self, view: ResponseView) -> Tuple[str, Any]:
+        return (PASS if self.tool_name in view.tools_by_name else FAIL), self.message
+
+
+class NoToolUsed(Checker):
+    def check(self, view: ResponseView) -> Tuple[str, Any]:
+        if not view.tool_calls:
+            return PASS, "No tools used (Actual: None)"
+        return FAIL, f"No tools used (Actual: {[tc.tool_name for tc in view.tool_calls]})"
+
+
+class ToolInputContains(Checker):
+    def __init__(self, tool_name: Any, value: Any):
+        self.tool_name = tool_name
+        self.expected = str(value)
+
+    def check(self, view: ResponseView) -> Tuple[str, Any]:
+        matching_calls = view.tools_by_name.get(self.tool_name)
+        if not matching_calls:
+            return FAIL, f"Tool '{self.tool_name}' was not called."
+        tool_input_str = str(matching_calls[0].tool_input)
+        passed = self.expected in tool_input_str
+        return (PASS if passed else FAIL), (f"Input to '{self.tool_name}' contains '{self.expected}' "
+                                            f"(Actual input: '{tool_input_str[:100]}...') ")
+
+
+class JudgedCriterion(Checker):
+    """
+    A criterion scored by a judge (tone, constraints, quality). The verdict is looked up
+    in the view; without one (no judge configured) the criterion is an ERROR.
+    """
+    def __init__(self, crit_type: str, value: Any):
+        self.criterion = (crit_type, str(value))
+        self.message = f"{crit_type.replace('_', ' ').capitalize()}: '{value}'"
+
+    def check(self, view: ResponseView) -> Tuple[str, Any]:
+        verdict = view.verdicts.get(self.criterion)
+        if verdict is None:
+            return ERROR, f"{self.message} needs a judge, but none was used"
+        status, reason = verdict
+        return status, f"{self.message} ({reason})"
+
+
+class Unsupported(Checker):
+    """Criterion types without a checker, reported as ERROR."""
+    def __init__(self, crit_type: str):
+        self.message = f"Unknown or unimplemented criterion type '{crit_type}'"
+
+    def check(self, view: ResponseView) -> Tuple[str, Any]:
+        return ERROR, self.message
+
+
+class Broken(Checker):
+    """A criterion whose definition couldn't be compiled (e.g. keywords that aren't a list)."""
+    def __init__(self, error: Exception):
+        self.message = f"Exception during evaluation: {error}"
+
+    def check(self, view: ResponseView) -> Tuple[str, Any]:
+        return ERROR, self.message
+
+
+CHECKERS = {
+    "response_contains": lambda c: ResponseContains(c.get("value")),
+    "response_contains_keywords": lambda c: ResponseContainsKeywords(c.get("value")),
+    "tool_used": lambda c: ToolUsed(c.get("value")),
+    "no_tool_used": lambda c: NoToolUsed(),
+    "tool_input_contains": lambda c: ToolInputContains(c.get("tool_name"), c.get("value")),
+    **{crit_type: (lambda c: JudgedCriterion(c["type"], c.get("value"))) for crit_type in JUDGED_CRITERIA},
+}
+
+
+def compile_criterion(criterion: Dict[str, Any]) -> Checker:
+    crit_type = criterion.get("type", "unknown")
+    factory = CHECKERS.get(crit_type)
+    if factory is None:
+        return Unsupported(crit_type)
+    try:
+        return factory(criterion)
+    except Exception as e:
+        return Broken(e)
+
+
+class CompiledCase:
+    """A test case with its criteria compiled into checkers, ready to score any number of responses."""
+    __slots__ = ("case_id", "prompt", "checks", "judged")
+
+    def __init__(self, test_case: Dict[str, Any]):
+        self.case_id = test_case.get("case_id", "unknown")
+        self.prompt = test_case.get("prompt", "N/A")
+        criteria = test_case.get("expected_outcome", {}).get("criteria", [])
+        checkers = [compile_criterion(criterion) for criterion in criteria]
+        # (detail key, bound check method), resolved once.
+        self.checks = tuple(
+            (f"criterion_{i+1}_{criterion.get('type', 'unknown')}", checker.check)
+            for i, (criterion, checker) in enumerate(zip(criteria, checkers))
+        )
+        # (criterion type, expectation) pairs the judge has to give verdicts for.
+        self.judged = tuple(dict.fromkeys(c.criterion for c in checkers if isinstance(c, JudgedCriterion)))
+
+    def evaluate(self, agent_response: AgentResponse, verdicts: Optional[Verdicts] = None) -> EvaluationResult:
+        view = ResponseView(agent_response, verdicts)
+        details: Dict[str, Any] = {}
+        passed = True
+        for key, check in self.checks:
+            try:
+                status, message = check(view)
+            except Exception as e:
+                status, message = ERROR, f"Exception during evaluation: {e}"
+            if status != PASS:
+                passed = False
+            details[key] = {"status": status, "message": message}
+        return EvaluationResult(case_id=self.case_id, prompt=self.prompt, passed=passed, details=details)
+
+
+def evaluate_case(test_case: Dict[str, Any], agent_response: AgentResponse,
+                  verdicts: Optional[Verdicts] = None) -> EvaluationResult:
     """
     Evaluates the agent's response against the criteria defined in the test case.
+    To score many responses, use evaluate_many, which compiles each case only once.
 
     Args:
         test_case: A dictionary from evaluation_cases.py
         agent_response: The actual AgentResponse received from the API.
+        verdicts: Judge verdicts for the judged criteria (see judge.py); without them
+            those criteria are reported as ERROR.
 
     Returns:
         An EvaluationResult object.
     """
-    case_id = test_case.get("case_id", "unknown")
-    prompt = test_case.get("prompt", "N/A")
-    expected_outcome = test_case.get("expected_outcome", {})
-    criteria = expected_outcome.get("criteria", [])
-
-    evaluation_details: Dict[str, Any] = {}
-    all_criteria_passed = True
-
-    print(f"DEBUG: Evaluating case '{case_id}'...")
-
-    
-    def record_result(key, status: str, message: Any):
-         nonlocal all_criteria_passed 
-         evaluation_details[key] = {"status": status, "message": message}
-         if status == "FAIL":
-             all_criteria_passed = False
-
-    
-    for i, criterion in enumerate(criteria):
-        crit_type = criterion.get("type", "unknown")
-        crit_value = criterion.get("value")
-        crit_key_base = f"criterion_{i+1}_{crit_type}" 
-
-        try:
-            if crit_type == "response_contains":
-                expected_substring = str(crit_value)
-                passed = expected_substring in agent_response.response
-                record_result(crit_key_base, "PASS" if passed else "FAIL",
-                              f"Response contains '{expected_substring}'")
-
-            elif crit_type == "response_contains_keywords":
-                keywords: List[str] = crit_value 
-                passed = any(keyword.lower() in agent_response.response.lower() for keyword in keywords)
-                 
-                record_result(crit_key_base, "PASS" if passed else "FAIL",
-                              f"Response contains any of keywords {keywords}")
-
-            elif crit_type == "tool_used":
-                expected_tool_name = str(crit_value)
-
-                passed = any(tc.tool_name == expected_tool_name for tc in (agent_response.tool_calls or []))
-                record_result(crit_key_base, "PASS" if passed else "FAIL",
-                              f"Tool '{expected_tool_name}' was used")
-
-            elif crit_type == "no_tool_used":
-                
-                passed = not agent_response.tool_calls or len(agent_response.tool_calls) == 0
-                message = f"No tools used (Actual: {[tc.tool_name for tc in agent_response.tool_calls] if agent_response.tool_calls else 'None'})"
-                record_result(crit_key_base, "PASS" if passed else "FAIL", message)
-
-
-            elif crit_type == "tool_input_contains":
-                expected_tool_name = criterion.get("tool_name")
-                expected_substring = str(crit_value)
-               
-                matching_calls = [tc for tc in (agent_response.tool_calls or []) if tc.tool_name == expected_tool_name]
-
-                if not matching_calls:
-                    passed = False
-                    message = f"Tool '{expected_tool_name}' was not called."
-                else:
-                    
-                    tool_input_str = str(matching_calls[0].tool_input)
-                    passed = expected_substring in tool_input_str
-                    message = f"Input to '{expected_tool_name}' contains '{expected_substring}' (Actual input: '{tool_input_str[:100]}...') "
-                record_result(crit_key_base, "PASS" if passed else "FAIL", message)
-
-            
-            else:
-                passed = False
-                record_result(crit_key_base, "ERROR", f"Unknown or unimplemented criterion type '{crit_type}'")
+    logger.debug("Evaluating case '%s'...", test_case.get("case_id", "unknown"))
+    return CompiledCase(test_case).evaluate(agent_response, verdicts)
 
 
-        except Exception as e:
-            
-            record_result(crit_key_base, "ERROR", f"Exception during evaluation: {e}")
-            all_criteria_passed = False
+def _evaluate_chunk(items: Sequence[Tuple[Dict[str, Any], AgentResponse, Optional[Verdicts]]]) -> List[EvaluationResult]:
+    compiled: Dict[int, CompiledCase] = {}
+    results = []
+    for test_case, agent_response, verdicts in items:
+        case = compiled.get(id(test_case))
+        if case is None:
+            case = compiled[id(test_case)] = CompiledCase(test_case)
+        results.append(case.evaluate(agent_response, verdicts))
+    return results
 
 
-    return EvaluationResult(
-        case_id=case_id,
-        prompt=prompt,
-        passed=all_criteria_passed,
-        details=evaluation_details
-    )
\ No newline at end of file
+def evaluate_many(pairs: Iterable[Tuple[Dict[str, Any], AgentResponse]], processes: int = 0,
+                  chunk_size: int = 2000, verdicts: Optional[Sequence[Optional[Verdicts]]] = None) -> List[EvaluationResult]:
+    """
+    Scores many (test case, response) pairs in one pass, results in input order. Each
+    distinct case dict is compiled once per chunk. With `processes` > 1 the pairs are
+    split into chunks of `chunk_size` and scored in a process pool; that pays off once
+    the scoring outweighs pickling the responses (tens of thousands of pairs).
+    `verdicts`, if given, holds the judge verdicts of each pair (judge.evaluate_many_judged).
+    """
+    pairs = list(pairs)
+    items = [(test_case, agent_response, verdicts[i] if verdicts is not None else None)
+             for i, (test_case, agent_response) in enumerate(pairs)]
+    if processes <= 1 or len(items) <= chunk_size:
+        return _evaluate_chunk(items)
+    chunks = [items[i:i + chunk_size] for i in range(0, len(items), chunk_size)]
+    results: List[EvaluationResult] = []
+    with ProcessPoolExecutor(max_workers=processes) as pool:
+        for chunk_results in pool.map(_evaluate_chunk, chunks):
+            results.extend(chunk_results)
+    return results
@@ -0,0 +1,377 @@
+
+import asyncio
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import time
+from abc import ABC, abstractmethod
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from part1.evaluation.evaluator import (ERROR, FAIL, PASS, CompiledCase, EvaluationResult, Verdicts,
+                                        evaluate_many)
+from part1.llm import LLMClient, LLMError, create_llm_client
+from part1.models import AgentResponse
+from part1.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+JUDGE_CHOICES = ("local", "llm", "none")
+# Verdicts are cached in this SQLite file across runs (JUDGE_CACHE_PATH= disables the disk cache).
+DEFAULT_CACHE_PATH = os.getenv("JUDGE_CACHE_PATH", ".judge_cache.sqlite3")
+# Items per judge call, and judge calls running at once.
+DEFAULT_BATCH_SIZE = int(os.getenv("JUDGE_BATCH_SIZE", "16"))
+DEFAULT_MAX_CONCURRENCY = int(os.getenv("JUDGE_MAX_CONCURRENCY", "4"))
+# How long the first item of a batch waits for others to join it.
+DEFAULT_WINDOW_MS = 5.0
+# Longest response excerpt shown to the LLM judge.
+MAX_JUDGED_RESPONSE_CHARS = 4000
+
+
+class Verdict(NamedTuple):
+    status: str
+    reason: str
+
+
+@dataclass(frozen=True)
+class JudgeItem:
+    """One (response, criterion) pair to judge."""
+    criterion: str
+    expectation: str
+    prompt: str
+    response: str
+
+    def cache_key(self, version: str) -> str:
+        """
+        Response hash + criterion + judge version. The prompt is hashed along with the
+        response since relevance depends on it. A changed response, criterion or judge
+        gets a new key, so a re-run only judges what changed.
+        """
+        digest = hashlib.sha256(f"{self.prompt}\0{self.response}".encode("utf-8")).hexdigest()
+        return f"{version}\0{self.criterion}\0{self.expectation}\0{digest}"
+
+
+class Judge(ABC):
+    """Scores judged criteria. `version` must change whenever the verdicts could change."""
+    version = "base"
+
+    @abstractmethod
+    async def judge_batch(self, items: Sequence[JudgeItem]) -> List[Verdict]:
+        """One verdict per item, in order. ERROR verdicts are not cached."""
+        raise NotImplementedError
+
+    async def aclose(self) -> None:
+        return None
+
+
+_WORD = re.compile(r"[a-z0-9']+")
+_STOPWORDS = frozenset(
+    "a about an and are as at be but by can could do does for from give have how in is it me my of on or "
+    "please tell that the this to using was what when where which who why will with you your".split()
+)
+_RUDE_MARKERS = ("stupid", "idiot", "shut up", "dumb", "nonsense", "whatever")
+_POLITE_MARKERS = ("please", "sorry", "thank", "unfortunately", "i'm afraid", "happy to", "glad to",
+                   "i can't", "i cannot", "unable to")
+
+
+class LocalJudge(Judge):
+    """
+    Deterministic stand-in for an LLM judge, for offline runs and tests.
+    Tone passes without rude or shouted text ("polite" also needs a courteous phrase,
+    "helpful" a substantive answer); "concise"/"detailed" constraints bound the word
+    count; quality passes when the response covers most of the prompt's content words.
+    Expectations it has no rule for are an ERROR.
+    """
+    def __init__(self, concise_max_words: int = 80, detailed_min_words: int = 40, min_relevance: float = 0.5):
+        self.concise_max_words = concise_max_words
+        self.detailed_min_words = detailed_min_words
+        self.min_relevance = min_relevance
+        self.version = f"local-1/{concise_max_words}/{detailed_min_words}/{min_relevance}"
+        self._rules = {
+            "adheres_to_tone": self._tone,
+            "adheres_to_constraints": self._constraints,
+            "response_quality": self._quality,
+        }
+
+    async def judge_batch(self, items: Sequence[JudgeItem]) -> List[Verdict]:
+        return [self.judge(item) for item in items]
+
+    def judge(self, item: JudgeItem) -> Verdict:
+        rule = self._rules.get(item.criterion)
+        if rule is None:
+            return Verdict(ERROR, f"no local rule for {item.criterion}")
+        return rule(item.expectation.lower(), item)
+
+    def _tone(self, tone: str, item: JudgeItem) -> Verdict:
+        lower = item.response.lower()
+        rude = [marker for marker in _RUDE_MARKERS if marker in lower]
+        if rude:
+            return Verdict(FAIL, f"rude wording: {', '.join(rude)}")
+        letters = [c for c in item.response if c.isalpha()]
+        if "!!" in item.response or (len(letters) >= 20 and sum(c.isupper() for c in letters) > len(letters) / 2):
+            return Verdict(FAIL, "shouting")
+        if tone == "polite" and not any(marker in lower for marker in _POLITE_MARKERS):
+            return Verdict(FAIL, "no courteous phrasing")
+        if tone == "helpful" and len(_WORD.findall(lower)) < 3:
+            return Verdict(FAIL, "no substantive answer")
+        return Verdict(PASS, f"no rude or shouted wording for a {tone} tone")
+
+    def _constraints(self, constraint: str, item: JudgeItem) -> Verdict:
+        words = len(item.response.split())
+        if constraint in ("concise", "brief", "short"):
+            return Verdict(PASS if words <= self.concise_max_words else FAIL,
+                           f"{words} words, at most {self.concise_max_words} allowed")
+        if constraint in ("detailed", "thorough"):
+            return Verdict(PASS if words >= self.detailed_min_words else FAIL,
+                           f"{words} words, at least {self.detailed_min_words} needed")
+        return Verdict(ERROR, f"no local rule for the constraint '{constraint}'")
+
+    def _quality(self, quality: str, item: JudgeItem) -> Verdict:
+        if not item.response.strip():
+            return Verdict(FAIL, "empty response")
+        content = {word for word in _WORD.findall(item.prompt.lower()) if len(word) > 2 and word not in _STOPWORDS}
+        if not content:
+            return Verdict(PASS, "the prompt has no content words to cover")
+        covered = len(content & set(_WORD.findall(item.response.lower()))) / len(content)
+        return Verdict(PASS if covered >= self.min_relevance else FAIL,
+                       f"covers {covered:.0%} of the prompt's content words")
+
+
+_QUESTIONS = {
+    "adheres_to_tone": "Is the tone of the response {expectation}?",
+    "adheres_to_constraints": "Does the response satisfy the constraint: {expectation}?",
+    "response_quality": "Is the response {expectation} with respect to the user prompt?",
+}
+JUDGE_SYSTEM_PROMPT = (
+    "You evaluate an AI assistant's responses. For every numbered item, answer its question "
+    "about the response. Reply with only a JSON array with one object per item: "
+    '[{"id": <item number>, "verdict": "PASS" or "FAIL", "reason": "<one short sentence>"}]'
+)
+
+
+class LLMJudge(Judge):
+    """
+    Asks an LLM for the verdicts of a whole batch in one call. Items the reply doesn't
+    cover, and whole batches whose call fails or can't be parsed, get ERROR verdicts,
+    which aren't cached and are judged again on the next run.
+    """
+    # Bump when the prompt or the parsing changes.
+    PROMPT_VERSION = 1
+
+    def __init__(self, llm: LLMClient, version: Optional[str] = None, max_tokens: int = 1024):
+        self.llm = llm
+        self.max_tokens = max_tokens
+        self.version = version or f"llm-{self.PROMPT_VERSION}/{getattr(llm, 'model', type(llm).__name__)}"
+
+    @staticmethod
+    def build_prompt(items: Sequence[JudgeItem]) -> str:
+        parts = []
+        for number, item in enumerate(items, 1):
+            question = _QUESTIONS.get(item.criterion, "Does the response meet the criterion {expectation}?")
+            parts.append(f"Item {number}\nQuestion: {question.format(expectation=item.expectation)}\n"
+                         f"User prompt: {item.prompt}\nResponse: {item.response[:MAX_JUDGED_RESPONSE_CHARS]}")
+        return "\n\n".join(parts)
+
+    @staticmethod
+    def parse_verdicts(text: str, count: int) -> List[Verdict]:
+        verdicts = [Verdict(ERROR, "the judge gave no verdict for this item")] * count
+        start, end = text.find("["), text.rfind("]")
+        try:
+            entries = json.loads(text[start:end + 1]) if start != -1 else []
+        except ValueError:
+            entries = []
+        for entry in entries if isinstance(entries, list) else []:
+            if not isinstance(entry, dict):
+                continue
+            number, status = entry.get("id"), str(entry.get("verdict", "")).upper()
+            if isinstance(number, int) and 1 <= number <= count and status in (PASS, FAIL):
+                verdicts[number - 1] = Verdict(status, str(entry.get("reason", "")))
+        return verdicts
+
+    async def judge_batch(self, items: Sequence[JudgeItem]) -> List[Verdict]:
+        try:
+            text = await self.llm.generate(self.build_prompt(items), system_prompt=JUDGE_SYSTEM_PROMPT,
+                                           max_tokens=self.max_tokens)
+        except LLMError as e:
+            return [Verdict(ERROR, f"judge call failed: {e}")] * len(items)
+        return self.parse_verdicts(text, len(items))
+
+    async def aclose(self) -> None:
+        await self.llm.aclose()
+
+
+class VerdictCache:
+    """Verdicts by JudgeItem.cache_key, in a SQLite file (or in memory for ":memory:")."""
+    def __init__(self, path: str = DEFAULT_CACHE_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.execute(
+            "CREATE TABLE IF NOT EXISTS verdicts (key TEXT PRIMARY KEY, status TEXT NOT NULL, "
+            "reason TEXT NOT NULL, created_at REAL NOT NULL) WITHOUT ROWID"
+        )
+        self.connection.commit()
+
+    def get(self, key: str) -> Optional[Verdict]:
+        row = self.connection.execute("SELECT status, reason FROM verdicts WHERE key = ?", (key,)).fetchone()
+        return Verdict(*row) if row is not None else None
+
+    def put_many(self, verdicts: Iterable[Tuple[str, Verdict]]) -> None:
+        now = time.time()
+        with self.connection:
+            self.connection.executemany("INSERT OR REPLACE INTO verdicts VALUES (?, ?, ?, ?)",
+                                        [(key, v.status, v.reason, now) for key, v in verdicts])
+
+    def __len__(self) -> int:
+        return self.connection.execute("SELECT COUNT(*) FROM verdicts").fetchone()[0]
+
+    def close(self) -> None:
+        self.connection.close()
+
+
+class _PendingBatch:
+    __slots__ = ("items", "keys", "timer")
+
+    def __init__(self):
+        self.items: List[JudgeItem] = []
+        self.keys: List[str] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class JudgeRunner:
+    """
+    Puts a judge behind a verdict cache and batches its calls.
+
+    `judge()` answers from the cache when it can. Otherwise the item joins the open
+    batch, which is sent as one `judge_batch` call when `batch_size` items have joined or
+    `window_ms` has passed; at most `max_concurrency` calls run at once. Identical items
+    in flight share one verdict. So a re-run only pays for the responses that changed.
+    """
+    def __init__(self, judge: Judge, cache: Optional[VerdictCache] = None, batch_size: int = DEFAULT_BATCH_SIZE,
+                 max_concurrency: int = DEFAULT_MAX_CONCURRENCY, window_ms: float = DEFAULT_WINDOW_MS):
+        self.judge_impl = judge
+        self.cache = cache
+        self.batch_size = max(1, batch_size)
+        self.window = window_ms / 1000
+        self._semaphore = asyncio.Semaphore(max(1, max_concurrency))
+        self._pending: Optional[_PendingBatch] = None
+        self._futures: Dict[str, "asyncio.Future[Verdict]"] = {}
+        self._in_flight: "set[asyncio.Task[None]]" = set()
+        self.cache_hits = 0
+        self.judged = 0
+        self.batches = 0
+
+    async def judge(self, item: JudgeItem) -> Verdict:
+        key = item.cache_key(self.judge_impl.version)
+        future = self._futures.get(key)
+        if future is None:
+            cached = self.cache.get(key) if self.cache is not None else None
+            if cached is not None:
+                self.cache_hits += 1
+                return cached
+            future = self._enqueue(item, key)
+        # Shielded: one caller giving up doesn't cancel the verdict others wait for.
+        return await asyncio.shield(future)
+
+    async def judge_many(self, items: Iterable[JudgeItem]) -> List[Verdict]:
+        return list(await asyncio.gather(*(self.judge(item) for item in items)))
+
+    async def verdicts_for(self, case: CompiledCase, agent_response: AgentResponse) -> Verdicts:
+        """Verdicts for all judged criteria of a compiled case on one response."""
+        if not case.judged:
+            return {}
+        items = [JudgeItem(criterion, expectation, case.prompt, agent_response.response)
+                 for criterion, expectation in case.judged]
+        return dict(zip(case.judged, await self.judge_many(items)))
+
+    def _enqueue(self, item: JudgeItem, key: str) -> "asyncio.Future[Verdict]":
+        loop = asyncio.get_running_loop()
+        future = self._futures[key] = loop.create_future()
+        batch = self._pending
+        if batch is None:
+            batch = self._pending = _PendingBatch()
+            batch.timer = loop.call_later(self.window, self._flush)
+        batch.items.append(item)
+        batch.keys.append(key)
+        if len(batch.items) >= self.batch_size:
+            self._flush()
+        return future
+
+    def _flush(self) -> None:
+        batch, self._pending = self._pending, None
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.ensure_future(self._dispatch(batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, batch: _PendingBatch) -> None:
+        async with self._semaphore:
+            self.batches += 1
+            self.judged += len(batch.items)
+            try:
+                verdicts = await self.judge_impl.judge_batch(batch.items)
+            except Exception as e:
+                logger.warning("Judge call for %d items failed: %s", len(batch.items), e)
+                verdicts = [Verdict(ERROR, f"judge call failed: {e}")] * len(batch.items)
+        if self.cache is not None:
+            self.cache.put_many((key, verdict) for key, verdict in zip(batch.keys, verdicts) if verdict.status != ERROR)
+        for key, verdict in zip(batch.keys, verdicts):
+            future = self._futures.pop(key)
+            if not future.done():
+                future.set_result(verdict)
+
+    def stats(self) -> Dict[str, int]:
+        return {"cache_hits": self.cache_hits, "judged": self.judged, "batches": self.batches}
+
+    async def aclose(self) -> None:
+        self._flush()
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        await self.judge_impl.aclose()
+        if self.cache is not None:
+            self.cache.close()
+
+
+async def evaluate_case_judged(test_case: Dict, agent_response: AgentResponse,
+                               runner: Optional[JudgeRunner]) -> EvaluationResult:
+    """evaluate_case, with the judged criteria scored by `runner` (None leaves them ERROR)."""
+    case = CompiledCase(test_case)
+    verdicts = await runner.verdicts_for(case, agent_response) if runner is not None else None
+    return case.evaluate(agent_response, verdicts)
+
+
+async def evaluate_many_judged(pairs: Iterable[Tuple[Dict, AgentResponse]], runner: JudgeRunner,
+                               processes: int = 0, chunk_size: int = 2000) -> List[EvaluationResult]:
+    """evaluate_many, after judging every pair's judged criteria in batches."""
+    pairs = list(pairs)
+    compiled: Dict[int, CompiledCase] = {}
+    for test_case, _ in pairs:
+        if id(test_case) not in compiled:
+            compiled[id(test_case)] = CompiledCase(test_case)
+    verdicts = await asyncio.gather(
+        *(runner.verdicts_for(compiled[id(test_case)], agent_response) for test_case, agent_response in pairs)
+    )
+    return evaluate_many(pairs, processes, chunk_size, verdicts=verdicts)
+
+
+def create_judge_runner(name: str, cache_path: Optional[str] = DEFAULT_CACHE_PATH) -> Optional[JudgeRunner]:
+    """
+    The judge selected on the command line: "local" (LocalJudge), "llm" (the LLM client
+    configured by LLM_BASE_URL) or "none". Verdicts are cached in `cache_path`.
+    """
+    if name == "none":
+        return None
+    if name == "local":
+        judge: Judge = LocalJudge()
+    elif name == "llm":
+        llm = create_llm_client()
+        if llm is None:
+            raise ValueError("The LLM judge needs LLM_BASE_URL to be set.")
+        judge = LLMJudge(llm)
+    else:
+        raise ValueError(f"Unknown judge '{name}'. Choose from {', '.join(JUDGE_CHOICES)}.")
+    return JudgeRunner(judge, VerdictCache(cache_path) if cache_path else None)
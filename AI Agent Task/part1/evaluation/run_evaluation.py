@@ -1,118 +1,326 @@
 
-from typing import List
-import httpx 
+from collections import deque
+from contextlib import nullcontext
+from typing import Any, Deque, Dict, Iterable, List, Optional, Sequence, Tuple
+import httpx
 import os
 from dotenv import load_dotenv
 import time
 import asyncio
+import argparse
+import sys
+from part1.cassette import (CASSETTE_MODES, DEFAULT_PATH as DEFAULT_CASSETTE_PATH, MODE_STRICT, Cassette,
+                            configure_default_cassette)
+from part1.evaluation.backends import BACKEND_CHOICES, EvaluationBackend, create_backend
+from part1.evaluation.datasets import ResultWriter, completed_case_ids, iter_cases, recorded_run_id
 from part1.evaluation.evaluation_cases import get_evaluation_cases
-from part1.evaluation.evaluator import evaluate_case, EvaluationResult
-from part1.models import AgentResponse 
+from part1.evaluation.evaluator import EvaluationResult
+from part1.evaluation.judge import JUDGE_CHOICES, JudgeRunner, create_judge_runner, evaluate_case_judged
+from part1.evaluation.run_store import DEFAULT_DB_PATH, RunStore
+from part1.evaluation.stats import LatencyHistogram
+from part1.models import AgentResponse
 dotenv_path = os.path.join(os.path.dirname(os.path.dirname(os.path.dirname(__file__))), '.env')
 load_dotenv(dotenv_path)
 
 API_BASE_URL = os.getenv("API_BASE_URL", "http://127.0.0.1:8000")
 PROCESS_ENDPOINT = f"{API_BASE_URL}/process_prompt"
-REQUEST_DELAY_SECONDS = 0.5 
 API_TIMEOUT_SECONDS = 120
+# Cases in flight at once, and the request rate limit for a live server (requests/second,
+# 0 = unlimited). In-memory backends are unlimited unless a rate is given.
+DEFAULT_CONCURRENCY = int(os.getenv("EVAL_CONCURRENCY", "4"))
+DEFAULT_RPS = float(os.getenv("EVAL_RPS", "10"))
 
 
-async def run_all_evaluations():
-    """Runs all defined evaluation test cases against the deployed API."""
-    test_cases = get_evaluation_cases()
-    results: List[EvaluationResult] = []
-    async with httpx.AsyncClient() as client:
+class TokenBucket:
+    """Async token-bucket rate limiter: `rate` tokens per second, bursts of up to `burst`."""
+    def __init__(self, rate: float, burst: Optional[float] = None):
+        self.rate = rate
+        self.capacity = burst if burst is not None else max(1.0, rate)
+        self._tokens = self.capacity
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
 
-        print(f"Starting automated evaluation against {API_BASE_URL}...")
-        print(f"Found {len(test_cases)} test cases.")
+    async def acquire(self) -> None:
+        if self.rate <= 0:
+            return
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
 
-        for i, case in enumerate(test_cases):
-            case_id = case.get("case_id", f"case_{i+1}")
-            prompt = case["prompt"]
-            print(f"\n--- Running Case {i+1}/{len(test_cases)}: {case_id} ---")
-            print(f"Prompt: {prompt}")
 
-            agent_response = None
-            api_call_status = "FAIL"
-            api_call_details = "No API call made due to error setup."
+async def run_case(backend: EvaluationBackend, case: Dict[str, Any], index: int, total: int,
+                   bucket: TokenBucket, judge: Optional[JudgeRunner] = None) -> Tuple[EvaluationResult, float, Optional[AgentResponse], List[str]]:
+    """
+    Runs a single case against the backend and evaluates it.
+    Returns (result, latency in seconds, the agent's response or None if the API call failed, log lines).
+    Log lines are returned rather than printed so output stays in case order.
+    """
+    case_id = case.get("case_id", f"case_{index+1}")
+    prompt = case["prompt"]
+    log = [f"\n--- Running Case {index+1}/{total}: {case_id} ---", f"Prompt: {prompt}"]
 
+    agent_response = None
+    api_call_status = "FAIL"
+    api_call_details = "No API call made due to error setup."
+
+    await bucket.acquire()
+    start = time.perf_counter()
+    try:
+
+        log.append(f"Calling {backend.target} with prompt: '{prompt[:50]}...'")
+        agent_response = await backend.process(prompt)
+        api_call_status = "PASS"
+        api_call_details = "Successfully received and parsed response."
+        log.append(f"API Call Status: PASS ({backend.name})")
+        log.append(f"Received response (first 150 chars): {agent_response.response[:150]}...")
+        if agent_response.tool_calls:
+            log.append(f"  Tool calls detected: {[tc.tool_name for tc in agent_response.tool_calls]}")
+        else:
+             log.append("  No tool calls detected.")
+
+
+    except httpx.HTTPStatusError as e:
+        api_call_details = f"HTTP Error: {e.response.status_code} - {e.response.text}"
+        log.append(f"API Call Status: FAIL ({api_call_details})")
+    except httpx.RequestError as e:
+        api_call_details = f"Request Error: {e}"
+        log.append(f"API Call Status: FAIL ({api_call_details})")
+    except Exception as e:
+        api_call_details = f"Unexpected Error during API call: {e}"
+        log.append(f"API Call Status: FAIL ({api_call_details})")
+    latency = time.perf_counter() - start
+
+    evaluation_details_for_case = {
+        "API Call Status": {"status": api_call_status, "message": api_call_details}
+    }
+    if agent_response:
+        evaluation_result = await evaluate_case_judged(case, agent_response, judge)
+        evaluation_details_for_case.update(evaluation_result.details)
+        final_case_passed = evaluation_result.passed and (api_call_status == "PASS")
+    else:
+        final_case_passed = False
+
+
+    final_result = EvaluationResult(
+         case_id=case_id,
+         prompt=prompt,
+         passed=final_case_passed,
+         details=evaluation_details_for_case
+    )
+    log.append(f"Case {case_id} OVERALL status: {'PASS' if final_result.passed else 'FAIL'} ({latency * 1000:.1f} ms)")
+    return final_result, latency, agent_response, log
+
+
+# Failed cases whose details are kept for the end-of-run report; the rest are only counted
+# (all of them are in the results file when one is written).
+MAX_REPORTED_FAILURES = 50
+
+
+async def run_all_evaluations(concurrency: int = DEFAULT_CONCURRENCY, rps: Optional[float] = None,
+                              backend: Optional[EvaluationBackend] = None,
+                              cases: Optional[Iterable[Dict[str, Any]]] = None,
+                              output_path: Optional[str] = None, resume: bool = False,
+                              store: Optional[RunStore] = None, label: Optional[str] = None,
+                              judge: Optional[JudgeRunner] = None, cassette: Optional[Cassette] = None):
+    """
+    Runs all defined evaluation test cases against the deployed API, or against `backend`
+    (see backends.py for the in-process and in-memory ASGI alternatives).
+    Up to `concurrency` cases run at once over one pooled client, rate limited to `rps`
+    requests per second (default: DEFAULT_RPS for the http backend, unlimited for the
+    in-memory ones). Output is printed in case order even when cases finish out of order.
+
+    `cases` may be any iterable, e.g. datasets.iter_cases(path) to stream a JSONL file; it
+    is consumed lazily and only a bounded window of cases is in flight, so memory stays
+    flat whatever the suite size. With `output_path` each result is appended to that JSONL
+    file as soon as its case finishes; `resume` keeps the file and skips cases already in it.
+    With `store` the run (per-case outcomes and latency, tool timings, the agent's config
+    hash) is recorded under `label` for later comparison; see run_store.py.
+    `judge` scores the tone/constraint/quality criteria (see judge.py); without one they
+    are reported as ERROR and fail their cases.
+    `cassette` is the record/replay cassette the agent uses (see part1/cassette.py); its
+    hits and misses are reported, and in strict mode any miss fails the run.
+    """
+    if cases is None:
+        cases = get_evaluation_cases()
+    total: Any = len(cases) if isinstance(cases, Sequence) else "?"
+    concurrency = max(1, concurrency)
+    # Cases started ahead of the oldest unprinted one; bounds memory for pending output.
+    window = concurrency * 4
+
+    skip = completed_case_ids(output_path) if resume and output_path else set()
+    writer = ResultWriter(output_path, append=resume) if output_path else None
+    latencies = LatencyHistogram()
+    reported_failures: List[EvaluationResult] = []
+    counts = {"passed": 0, "failed": 0, "skipped": 0, "api_errors": 0}
+
+    if backend is None:
+        backend = create_backend("http", API_BASE_URL, concurrency, API_TIMEOUT_SECONDS)
+    if rps is None:
+        rps = DEFAULT_RPS if backend.remote else 0
+    bucket = TokenBucket(rps)
+    semaphore = asyncio.Semaphore(concurrency)
+    async with backend:
+
+        print(f"Starting automated evaluation against {backend.target}...")
+        print(f"Found {total} test cases. Concurrency: {concurrency}, rate limit: {rps or 'unlimited'} req/s.")
+        if skip:
+            print(f"Resuming: {len(skip)} cases already have results in {output_path}.")
+        recorder = None
+        if store is not None:
+            # A resumed run keeps recording under the run its earlier results belong to,
+            # so the stored run covers the whole suite.
+            resume_id = recorded_run_id(output_path) if resume and output_path else None
+            recorder = store.start_run(label, backend.name, backend.target, resume_id=resume_id)
+            if resume_id is not None and recorder.run_id != resume_id:
+                print(f"Run {resume_id} is not in {store.path}; recording the resumed cases as a new run.")
+
+        async def run_one(i: int, case: Dict[str, Any]) -> List[str]:
+            async with semaphore:
+                result, latency, agent_response, log = await run_case(backend, case, i, total, bucket, judge)
+            api_ok = agent_response is not None
+            latencies.add(latency)
+            counts["api_errors"] += 0 if api_ok else 1
+            counts["passed" if result.passed else "failed"] += 1
+            if not result.passed and len(reported_failures) < MAX_REPORTED_FAILURES:
+                reported_failures.append(result)
+            if writer is not None:
+                run_ref = {"run_id": recorder.run_id} if recorder is not None else {}
+                writer.write(result, latency_ms=round(latency * 1000, 3), api_ok=api_ok, **run_ref)
+            if recorder is not None:
+                recorder.add(result, latency, api_ok, (agent_response.tool_calls or ()) if api_ok else ())
+            return log
+
+        in_flight: Deque["asyncio.Task[List[str]]"] = deque()
+        wall_start = time.perf_counter()
+        with writer if writer is not None else nullcontext():
             try:
-                
-                print(f"Calling POST {PROCESS_ENDPOINT} with prompt: '{prompt[:50]}...'")
-                response = await client.post(
-                    PROCESS_ENDPOINT,
-                    json={"prompt": prompt},
-                    timeout=API_TIMEOUT_SECONDS
-                )
-                response.raise_for_status() 
-                agent_response = AgentResponse.model_validate(response.json())
-                api_call_status = "PASS"
-                api_call_details = "Successfully received and parsed response."
-                print(f"API Call Status: PASS (HTTP {response.status_code})")
-                print(f"Received response (first 150 chars): {agent_response.response[:150]}...")
-                if agent_response.tool_calls:
-                    print(f"  Tool calls detected: {[tc.tool_name for tc in agent_response.tool_calls]}")
-                else:
-                     print("  No tool calls detected.")
-
-
-            except httpx.HTTPStatusError as e:
-                api_call_details = f"HTTP Error: {e.response.status_code} - {e.response.text}"
-                print(f"API Call Status: FAIL ({api_call_details})")
-            except httpx.RequestError as e:
-                api_call_details = f"Request Error: {e}"
-                print(f"API Call Status: FAIL ({api_call_details})")
-            except Exception as e:
-                api_call_details = f"Unexpected Error during API call: {e}"
-                print(f"API Call Status: FAIL ({api_call_details})")
-            evaluation_details_for_case = {
-                "API Call Status": {"status": api_call_status, "message": api_call_details}
-            }
-            if agent_response:
-                evaluation_result = evaluate_case(case, agent_response)
-                evaluation_details_for_case.update(evaluation_result.details)
-                final_case_passed = evaluation_result.passed and (api_call_status == "PASS")
-            else:
-                final_case_passed = False
-
-
-            final_result = EvaluationResult(
-                 case_id=case_id,
-                 prompt=prompt,
-                 passed=final_case_passed,
-                 details=evaluation_details_for_case 
-            )
-            results.append(final_result)
-
-            print(f"Case {case_id} OVERALL status: {'PASS' if final_result.passed else 'FAIL'}")
-
-            await asyncio.sleep(REQUEST_DELAY_SECONDS)
+                for i, case in enumerate(cases):
+                    if case.get("case_id", f"case_{i+1}") in skip:
+                        counts["skipped"] += 1
+                        continue
+                    in_flight.append(asyncio.ensure_future(run_one(i, case)))
+                    if len(in_flight) >= window:
+                        print("\n".join(await in_flight.popleft()))
+                while in_flight:
+                    print("\n".join(await in_flight.popleft()))
+            finally:
+                for task in in_flight:
+                    task.cancel()
+                if recorder is not None:
+                    # Interrupted or not, keep what finished; an interrupted run stays
+                    # unfinished in the store until it is resumed.
+                    recorder.flush()
+        wall_seconds = time.perf_counter() - wall_start
 
 
         print("\n--- Evaluation Summary ---")
-        total_cases = len(results)
-        passed_cases = sum(1 for r in results if r.passed)
-        failed_cases = total_cases - passed_cases
+        passed_cases = counts["passed"]
+        failed_cases = counts["failed"]
+        total_cases = passed_cases + failed_cases
 
         print(f"Total Cases: {total_cases}")
         print(f"Passed: {passed_cases}")
         print(f"Failed: {failed_cases}")
+        if counts["skipped"]:
+            print(f"Skipped (already done): {counts['skipped']}")
+        if writer is not None:
+            print(f"Results written to {output_path}")
+
+        stats = latencies.summarize(wall_seconds, errors=counts["api_errors"])
+        if recorder is not None:
+            recorder.finish(stats, await backend.config_hash())
+            print(f"Recorded as run {recorder.run_id} in {store.path}")
+        print(f"Latency p50/p90/p99: {stats['p50'] * 1000:.1f} / {stats['p90'] * 1000:.1f} / {stats['p99'] * 1000:.1f} ms")
+        print(f"Throughput: {stats['throughput']:.2f} cases/s over {wall_seconds:.2f} s")
+        print(f"API error rate: {stats['error_rate']:.1%}")
+        if judge is not None:
+            judge_stats = judge.stats()
+            print(f"Judge ({judge.judge_impl.version}): {judge_stats['cache_hits']} verdicts from cache, "
+                  f"{judge_stats['judged']} judged in {judge_stats['batches']} calls")
+
+        cassette_ok = True
+        if cassette is not None:
+            cassette_stats = cassette.stats()
+            print(f"Cassette ({cassette.mode}, {cassette.path}): {cassette_stats['hits']} hits, "
+                  f"{cassette_stats['misses']} misses, {cassette_stats['recorded']} recorded")
+            for miss in cassette_stats["miss_details"][:10]:
+                print(f"  miss: {miss}")
+            cassette_ok = not (cassette.mode == MODE_STRICT and cassette_stats["misses"])
 
         if failed_cases > 0:
             print("\nFailed Cases Details:")
-            for result in results:
-                if not result.passed:
-                    print(result)
-        return failed_cases == 0 
+            for result in reported_failures:
+                print(result)
+            if failed_cases > len(reported_failures):
+                print(f"... and {failed_cases - len(reported_failures)} more failed cases.")
+        return failed_cases == 0 and cassette_ok
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the evaluation suite against the agent API.")
+    parser.add_argument("--concurrency", type=int, default=DEFAULT_CONCURRENCY, help="Cases in flight at once.")
+    parser.add_argument("--rps", type=float, default=None,
+                        help=f"Max requests per second (0 = unlimited; default: {DEFAULT_RPS:g} for http, unlimited otherwise).")
+    parser.add_argument("--backend", choices=BACKEND_CHOICES, default="http",
+                        help="http: live server at API_BASE_URL; asgi: the FastAPI app in memory; inprocess: the agent directly.")
+    parser.add_argument("--cases", help="JSONL file of cases to stream instead of the built-in EVALUATION_TEST_CASES.")
+    parser.add_argument("--output", help="Append one JSON line per finished case to this file.")
+    parser.add_argument("--resume", action="store_true", help="Keep --output and skip the cases it already has.")
+    parser.add_argument("--store", default=DEFAULT_DB_PATH,
+                        help="SQLite run store to record the run in (default: EVAL_RUN_DB or evaluation_runs.sqlite3).")
+    parser.add_argument("--no-store", action="store_true", help="Don't record the run.")
+    parser.add_argument("--label", help="Name to record the run under, e.g. a branch or commit.")
+    parser.add_argument("--cassette-mode", choices=CASSETTE_MODES, default=os.getenv("CASSETTE_MODE", "off"),
+                        help="Record tool and LLM calls, replay them (strict: fail on a miss), or call the backends.")
+    parser.add_argument("--cassette", default=DEFAULT_CASSETTE_PATH, help="Cassette file (default: CASSETTE_PATH).")
+    parser.add_argument("--judge", choices=JUDGE_CHOICES, default=os.getenv("EVAL_JUDGE", "local"),
+                        help="Judge for tone/constraint/quality criteria: local rules, the LLM at LLM_BASE_URL, or none.")
+    args = parser.parse_args()
+    if args.resume and not args.output:
+        parser.error("--resume needs --output")
+
     print("--- Automated Evaluation Runner ---")
-    print(f"Attempting to connect to API at: {PROCESS_ENDPOINT}")
-    print("Ensure your FastAPI service is running in a separate terminal.")
-    print("Example: navigate to the project root and run `uvicorn part1.main:app --reload`")
+    if args.backend == "http":
+        print(f"Attempting to connect to API at: {PROCESS_ENDPOINT}")
+        print("Ensure your FastAPI service is running in a separate terminal.")
+        print("Example: navigate to the project root and run `uvicorn part1.main:app --reload`")
+        print("(Or pass --backend asgi / --backend inprocess to evaluate without a server.)")
+    if args.backend == "http" and args.cassette_mode != "off":
+        print("Note: with --backend http the server records/replays; start it with CASSETTE_MODE and CASSETTE_PATH.")
     print("-" * 30)
 
     try:
-        asyncio.run(run_all_evaluations())
+        backend = create_backend(args.backend, API_BASE_URL, args.concurrency, API_TIMEOUT_SECONDS)
+        cases = iter_cases(args.cases) if args.cases else None
+        store = RunStore(args.store) if args.store and not args.no_store else None
+        # Agents created in this process (asgi and inprocess backends) use this cassette.
+        cassette = configure_default_cassette(args.cassette, args.cassette_mode) if args.backend != "http" else None
+
+        async def main() -> bool:
+            judge = create_judge_runner(args.judge)
+            try:
+                return await run_all_evaluations(concurrency=args.concurrency, rps=args.rps, backend=backend,
+                                                 cases=cases, output_path=args.output, resume=args.resume,
+                                                 store=store, label=args.label, judge=judge, cassette=cassette)
+            finally:
+                if judge is not None:
+                    await judge.aclose()
+
+        try:
+            ok = asyncio.run(main())
+        finally:
+            if store is not None:
+                store.close()
+            if cassette is not None:
+                cassette.close()
     except Exception as e:
         print(f"\nAn error occurred while running the evaluation script: {e}")
-        print("Please ensure the FastAPI service is running and accessible at the specified URL.")
\ No newline at end of file
+        if args.backend == "http":
+            print("Please ensure the FastAPI service is running and accessible at the specified URL.")
+        sys.exit(2)
+    # Failed cases, or cassette misses in strict mode, fail the run (e.g. in CI).
+    sys.exit(0 if ok else 1)
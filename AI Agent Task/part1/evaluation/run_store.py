@@ -0,0 +1,436 @@
+"""
+Usage:
+    python -m part1.evaluation.run_store list [--label NAME] [--limit N]
+    python -m part1.evaluation.run_store compare BASE HEAD [--max-new-failures N]
+        [--max-latency-increase 0.2] [--max-tool-increase 0.5] [--min-delta-ms 1]
+
+BASE and HEAD are run IDs, "latest" or "previous". `compare` exits with 1 when the
+head run crosses a threshold, so it can gate CI.
+"""
+import argparse
+import json
+import math
+import os
+import sqlite3
+import sys
+import time
+from dataclasses import dataclass, field
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from part1.evaluation.evaluator import EvaluationResult
+
+# SQLite file every run_evaluation run is recorded in (EVAL_RUN_DB= disables recording).
+DEFAULT_DB_PATH = os.getenv("EVAL_RUN_DB", "evaluation_runs.sqlite3")
+# Case rows buffered before they are written in one transaction.
+WRITE_BATCH_SIZE = 500
+# Latency percentiles reported by `compare`; only the GATED ones can fail it, p99 of a
+# small suite is too noisy to gate on.
+REPORTED_PERCENTILES = (50, 90, 99)
+GATED_PERCENTILES = (50, 90)
+
+# Rows are clustered by run (WITHOUT ROWID tables keyed on run_id first), and the
+# (run_id, latency_ms) and (run_id, tool_name, duration_ms) indexes let percentiles be
+# read by offset from the index instead of sorting the run, however many runs are stored.
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS runs (
+    run_id INTEGER PRIMARY KEY,
+    started_at REAL NOT NULL,
+    finished_at REAL,
+    label TEXT,
+    backend TEXT,
+    target TEXT,
+    config_hash TEXT,
+    total INTEGER NOT NULL DEFAULT 0,
+    passed INTEGER NOT NULL DEFAULT 0,
+    api_errors INTEGER NOT NULL DEFAULT 0,
+    p50_ms REAL,
+    p90_ms REAL,
+    p99_ms REAL,
+    throughput REAL
+);
+CREATE INDEX IF NOT EXISTS idx_runs_label ON runs (label, run_id);
+CREATE INDEX IF NOT EXISTS idx_runs_config_hash ON runs (config_hash, run_id);
+
+CREATE TABLE IF NOT EXISTS case_results (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    case_id TEXT NOT NULL,
+    passed INTEGER NOT NULL,
+    api_ok INTEGER NOT NULL,
+    latency_ms REAL NOT NULL,
+    details TEXT NOT NULL,
+    PRIMARY KEY (run_id, case_id)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_case_results_latency ON case_results (run_id, latency_ms);
+CREATE INDEX IF NOT EXISTS idx_case_results_case ON case_results (case_id, run_id);
+
+CREATE TABLE IF NOT EXISTS tool_calls (
+    run_id INTEGER NOT NULL REFERENCES runs (run_id) ON DELETE CASCADE,
+    case_id TEXT NOT NULL,
+    position INTEGER NOT NULL,
+    tool_name TEXT NOT NULL,
+    status TEXT NOT NULL,
+    cached INTEGER NOT NULL,
+    duration_ms REAL,
+    PRIMARY KEY (run_id, case_id, position)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_tool_calls_timing ON tool_calls (run_id, tool_name, duration_ms);
+"""
+
+
+class RunStoreError(ValueError):
+    """A run reference that doesn't match a stored run."""
+
+
+class RunRecorder:
+    """
+    Records the cases of one run as they finish. Rows are buffered and written
+    WRITE_BATCH_SIZE at a time; `finish()` writes the rest and the run summary. A run
+    that is interrupted should still `flush()`: it then stays unfinished (hidden from
+    `runs()` and "latest"/"previous") until a resumed run finishes it.
+    """
+    def __init__(self, store: "RunStore", run_id: int):
+        self.store = store
+        self.run_id = run_id
+        self._cases: List[Tuple[Any, ...]] = []
+        self._tools: List[Tuple[Any, ...]] = []
+
+    def add(self, result: EvaluationResult, latency: float, api_ok: bool, tool_calls: Iterable[Any] = ()) -> None:
+        """Buffers one case; `tool_calls` are the ToolUsage entries of its response."""
+        self._cases.append((self.run_id, result.case_id, int(result.passed), int(api_ok),
+                            latency * 1000, json.dumps(result.details, default=str)))
+        for position, usage in enumerate(tool_calls):
+            self._tools.append((self.run_id, result.case_id, position, usage.tool_name, usage.status,
+                                int(usage.cached), usage.duration_ms))
+        if len(self._cases) >= WRITE_BATCH_SIZE:
+            self.flush()
+
+    def flush(self) -> None:
+        if not self._cases:
+            return
+        with self.store.connection:
+            # A resumed case replaces its earlier row (and its tool calls).
+            self.store.connection.executemany(
+                "DELETE FROM tool_calls WHERE run_id = ? AND case_id = ?", [row[:2] for row in self._cases])
+            self.store.connection.executemany(
+                "INSERT OR REPLACE INTO case_results VALUES (?, ?, ?, ?, ?, ?)", self._cases)
+            self.store.connection.executemany(
+                "INSERT OR REPLACE INTO tool_calls VALUES (?, ?, ?, ?, ?, ?, ?)", self._tools)
+        self._cases.clear()
+        self._tools.clear()
+
+    def finish(self, summary: Dict[str, float], config_hash: Optional[str] = None) -> None:
+        """
+        Writes the remaining cases and the run summary. Counts and latency percentiles
+        cover every case of the run, including ones recorded before a resume; throughput
+        comes from `summary` (as from LatencyHistogram.summarize), i.e. the last session.
+        """
+        self.flush()
+        percentiles = self.store.latency_percentiles(self.run_id)
+        with self.store.connection:
+            self.store.connection.execute(
+                """UPDATE runs SET finished_at = ?, config_hash = COALESCE(?, config_hash),
+                       total = (SELECT COUNT(*) FROM case_results WHERE run_id = ?),
+                       passed = (SELECT COUNT(*) FROM case_results WHERE run_id = ? AND passed),
+                       api_errors = (SELECT COUNT(*) FROM case_results WHERE run_id = ? AND NOT api_ok),
+                       p50_ms = ?, p90_ms = ?, p99_ms = ?, throughput = ?
+                   WHERE run_id = ?""",
+                (time.time(), config_hash, self.run_id, self.run_id, self.run_id,
+                 percentiles[50], percentiles[90], percentiles[99], summary.get("throughput", 0.0), self.run_id),
+            )
+
+
+class RunStore:
+    """SQLite store of evaluation runs: one row per run, per case and per tool call."""
+    def __init__(self, path: str = DEFAULT_DB_PATH):
+        self.path = path
+        self.connection = sqlite3.connect(path)
+        self.connection.row_factory = sqlite3.Row
+        self.connection.execute("PRAGMA foreign_keys = ON")
+        if path != ":memory:":
+            # Readers (compare, list) don't block a run that is being recorded.
+            self.connection.execute("PRAGMA journal_mode = WAL")
+            self.connection.execute("PRAGMA synchronous = NORMAL")
+        self.connection.executescript(_SCHEMA)
+
+    def __enter__(self) -> "RunStore":
+        return self
+
+    def __exit__(self, *exc_info: Any) -> None:
+        self.close()
+
+    def close(self) -> None:
+        self.connection.close()
+
+    def start_run(self, label: Optional[str] = None, backend: Optional[str] = None,
+                  target: Optional[str] = None, config_hash: Optional[str] = None,
+                  resume_id: Optional[int] = None) -> RunRecorder:
+        """
+        Starts recording a new run, or with `resume_id` reopens that run so the cases of
+        a resumed evaluation are added to (or replace) the ones it already has. A
+        `resume_id` that isn't in the store starts a new run; compare the recorder's
+        run_id to tell.
+        """
+        if resume_id is not None:
+            with self.connection:
+                cursor = self.connection.execute(
+                    """UPDATE runs SET finished_at = NULL, label = COALESCE(?, label), backend = ?, target = ?
+                       WHERE run_id = ?""",
+                    (label, backend, target, resume_id),
+                )
+            if cursor.rowcount:
+                return RunRecorder(self, resume_id)
+        with self.connection:
+            cursor = self.connection.execute(
+                "INSERT INTO runs (started_at, label, backend, target, config_hash) VALUES (?, ?, ?, ?, ?)",
+                (time.time(), label, backend, target, config_hash),
+            )
+        return RunRecorder(self, cursor.lastrowid)
+
+    def runs(self, limit: int = 20, label: Optional[str] = None) -> List[Dict[str, Any]]:
+        """The most recent finished runs, newest first."""
+        query = "SELECT * FROM runs WHERE finished_at IS NOT NULL"
+        params: List[Any] = []
+        if label is not None:
+            query += " AND label = ?"
+            params.append(label)
+        query += " ORDER BY run_id DESC LIMIT ?"
+        params.append(limit)
+        return [dict(row) for row in self.connection.execute(query, params)]
+
+    def run(self, run_id: int) -> Dict[str, Any]:
+        row = self.connection.execute("SELECT * FROM runs WHERE run_id = ?", (run_id,)).fetchone()
+        if row is None:
+            raise RunStoreError(f"No run {run_id} in {self.path}")
+        return dict(row)
+
+    def resolve(self, ref: str) -> int:
+        """Run ID for a reference: a number, or "latest"/"previous" (finished runs only)."""
+        if ref in ("latest", "previous"):
+            offset = 0 if ref == "latest" else 1
+            row = self.connection.execute(
+                "SELECT run_id FROM runs WHERE finished_at IS NOT NULL ORDER BY run_id DESC LIMIT 1 OFFSET ?",
+                (offset,)).fetchone()
+            if row is None:
+                raise RunStoreError(f"No {ref} run in {self.path}")
+            return row[0]
+        try:
+            run_id = int(ref)
+        except ValueError:
+            raise RunStoreError(f"Invalid run reference {ref!r}; use a run ID, 'latest' or 'previous'") from None
+        return self.run(run_id)["run_id"]
+
+    def _nearest_rank(self, count: int, value_query: str, params: Sequence[Any],
+                      pcts: Sequence[float]) -> Dict[float, float]:
+        """Percentiles read one row each, by offset, from the index `value_query` orders by."""
+        values: Dict[float, float] = {}
+        for pct in pcts:
+            if not count:
+                values[pct] = 0.0
+                continue
+            rank = min(count, max(1, math.ceil(pct / 100 * count)))
+            values[pct] = self.connection.execute(value_query, (*params, rank - 1)).fetchone()[0]
+        return values
+
+    def latency_percentiles(self, run_id: int, pcts: Sequence[float] = REPORTED_PERCENTILES) -> Dict[float, float]:
+        """Exact nearest-rank case latency percentiles of a run, in milliseconds."""
+        count = self.connection.execute("SELECT COUNT(*) FROM case_results WHERE run_id = ?", (run_id,)).fetchone()[0]
+        return self._nearest_rank(
+            count,
+            "SELECT latency_ms FROM case_results WHERE run_id = ? ORDER BY latency_ms LIMIT 1 OFFSET ?",
+            (run_id,), pcts,
+        )
+
+    def tool_timings(self, run_id: int, pcts: Sequence[float] = (50, 90)) -> Dict[str, Dict[str, float]]:
+        """Per tool: number of timed calls and duration percentiles (ms). Cached and failed calls are left out."""
+        timed = "run_id = ? AND tool_name = ? AND status = 'ok' AND NOT cached AND duration_ms IS NOT NULL"
+        timings: Dict[str, Dict[str, float]] = {}
+        for (tool_name,) in self.connection.execute(
+                "SELECT DISTINCT tool_name FROM tool_calls WHERE run_id = ?", (run_id,)).fetchall():
+            params = (run_id, tool_name)
+            count = self.connection.execute(f"SELECT COUNT(*) FROM tool_calls WHERE {timed}", params).fetchone()[0]
+            values = self._nearest_rank(
+                count,
+                f"SELECT duration_ms FROM tool_calls WHERE {timed} ORDER BY duration_ms LIMIT 1 OFFSET ?",
+                params, pcts,
+            )
+            timings[tool_name] = {"calls": count, **{f"p{pct:g}": value for pct, value in values.items()}}
+        return timings
+
+    def newly_failing(self, base_id: int, head_id: int) -> List[Tuple[str, Dict[str, Any]]]:
+        """Cases that passed in the base run and fail in the head run, with their head details."""
+        rows = self.connection.execute(
+            """SELECT head.case_id, head.details FROM case_results AS head
+               JOIN case_results AS base ON base.run_id = ? AND base.case_id = head.case_id
+               WHERE head.run_id = ? AND NOT head.passed AND base.passed
+               ORDER BY head.case_id""",
+            (base_id, head_id),
+        )
+        return [(case_id, json.loads(details)) for case_id, details in rows]
+
+    def newly_passing(self, base_id: int, head_id: int) -> List[str]:
+        rows = self.connection.execute(
+            """SELECT head.case_id FROM case_results AS head
+               JOIN case_results AS base ON base.run_id = ? AND base.case_id = head.case_id
+               WHERE head.run_id = ? AND head.passed AND NOT base.passed
+               ORDER BY head.case_id""",
+            (base_id, head_id),
+        )
+        return [case_id for (case_id,) in rows]
+
+
+@dataclass
+class CompareThresholds:
+    """
+    Limits for `compare_runs`. Latency increases are relative (0.2 = 20% slower) and are
+    ignored when the absolute change is below `min_delta_ms`, so sub-millisecond jitter
+    doesn't fail fast suites.
+    """
+    max_new_failures: int = 0
+    max_latency_increase: float = 0.2
+    max_tool_increase: float = 0.5
+    min_delta_ms: float = 1.0
+
+
+@dataclass
+class RunComparison:
+    base: Dict[str, Any]
+    head: Dict[str, Any]
+    newly_failing: List[Tuple[str, Dict[str, Any]]]
+    newly_passing: List[str]
+    # {"p50": (base ms, head ms), ...}
+    latency: Dict[str, Tuple[float, float]]
+    # {tool: {"p50": (base ms, head ms), ...}}; None on one side for tools only one run used.
+    tools: Dict[str, Dict[str, Tuple[Optional[float], Optional[float]]]]
+    violations: List[str] = field(default_factory=list)
+
+    @property
+    def passed(self) -> bool:
+        return not self.violations
+
+
+def _increase(base: Optional[float], head: Optional[float], limit: float, min_delta_ms: float) -> Optional[float]:
+    """Relative increase from base to head when it crosses `limit`, else None."""
+    if not base or head is None or head - base < min_delta_ms:
+        return None
+    change = head / base - 1
+    return change if change > limit else None
+
+
+def compare_runs(store: RunStore, base_id: int, head_id: int,
+                 thresholds: Optional[CompareThresholds] = None) -> RunComparison:
+    """Diffs two stored runs and lists every threshold the head run crosses."""
+    thresholds = thresholds or CompareThresholds()
+    base_pcts = store.latency_percentiles(base_id)
+    head_pcts = store.latency_percentiles(head_id)
+    base_tools = store.tool_timings(base_id)
+    head_tools = store.tool_timings(head_id)
+    comparison = RunComparison(
+        base=store.run(base_id),
+        head=store.run(head_id),
+        newly_failing=store.newly_failing(base_id, head_id),
+        newly_passing=store.newly_passing(base_id, head_id),
+        latency={f"p{pct:g}": (base_pcts[pct], head_pcts[pct]) for pct in REPORTED_PERCENTILES},
+        tools={
+            name: {key: (base_tools.get(name, {}).get(key), head_tools.get(name, {}).get(key)) for key in ("p50", "p90")}
+            for name in sorted(set(base_tools) | set(head_tools))
+        },
+    )
+
+    if len(comparison.newly_failing) > thresholds.max_new_failures:
+        comparison.violations.append(
+            f"{len(comparison.newly_failing)} newly failing cases (allowed: {thresholds.max_new_failures})")
+    for pct in GATED_PERCENTILES:
+        base, head = comparison.latency[f"p{pct:g}"]
+        change = _increase(base, head, thresholds.max_latency_increase, thresholds.min_delta_ms)
+        if change is not None:
+            comparison.violations.append(
+                f"latency p{pct:g} {base:.1f} -> {head:.1f} ms (+{change:.0%}, allowed +{thresholds.max_latency_increase:.0%})")
+    for name, timing in comparison.tools.items():
+        base, head = timing["p50"]
+        change = _increase(base, head, thresholds.max_tool_increase, thresholds.min_delta_ms)
+        if change is not None:
+            comparison.violations.append(
+                f"{name} p50 {base:.1f} -> {head:.1f} ms (+{change:.0%}, allowed +{thresholds.max_tool_increase:.0%})")
+    return comparison
+
+
+def _ms(value: Optional[float]) -> str:
+    return "-" if value is None else f"{value:.1f}"
+
+
+def format_comparison(comparison: RunComparison) -> str:
+    base, head = comparison.base, comparison.head
+    lines = [f"Base run {base['run_id']} ({base['passed']}/{base['total']} passed, config {base['config_hash']})",
+             f"Head run {head['run_id']} ({head['passed']}/{head['total']} passed, config {head['config_hash']})"]
+    if base["config_hash"] != head["config_hash"]:
+        lines.append("Note: the runs used different agent configurations.")
+
+    lines.append(f"\nNewly failing cases: {len(comparison.newly_failing)}")
+    for case_id, details in comparison.newly_failing:
+        failed = [f"{key}: {value.get('message', '')}" for key, value in details.items()
+                  if isinstance(value, dict) and value.get("status") not in (None, "PASS")]
+        lines.append(f"  {case_id}: {'; '.join(failed) or 'failed'}")
+    lines.append(f"Newly passing cases: {len(comparison.newly_passing)}")
+    for case_id in comparison.newly_passing:
+        lines.append(f"  {case_id}")
+
+    lines.append("\nLatency (ms)      base      head")
+    for key, (base_ms, head_ms) in comparison.latency.items():
+        lines.append(f"  {key:<12} {base_ms:>9.1f} {head_ms:>9.1f}")
+    if comparison.tools:
+        lines.append("\nTool p50/p90 (ms)              base            head")
+        for name, timing in comparison.tools.items():
+            lines.append(f"  {name:<24} {_ms(timing['p50'][0]):>7}/{_ms(timing['p90'][0]):<7} "
+                         f"{_ms(timing['p50'][1]):>7}/{_ms(timing['p90'][1]):<7}")
+
+    if comparison.violations:
+        lines.append("\nREGRESSION:")
+        lines.extend(f"  {violation}" for violation in comparison.violations)
+    else:
+        lines.append("\nNo thresholds crossed.")
+    return "\n".join(lines)
+
+
+def main(argv: Optional[Sequence[str]] = None) -> int:
+    parser = argparse.ArgumentParser(description="Inspect and compare stored evaluation runs.")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH or "evaluation_runs.sqlite3", help="Run store (SQLite file).")
+    commands = parser.add_subparsers(dest="command", required=True)
+    list_parser = commands.add_parser("list", help="Show the most recent runs.")
+    list_parser.add_argument("--label")
+    list_parser.add_argument("--limit", type=int, default=20)
+    compare_parser = commands.add_parser("compare", help="Diff two runs; exits 1 when a threshold is crossed.")
+    compare_parser.add_argument("base")
+    compare_parser.add_argument("head")
+    defaults = CompareThresholds()
+    compare_parser.add_argument("--max-new-failures", type=int, default=defaults.max_new_failures)
+    compare_parser.add_argument("--max-latency-increase", type=float, default=defaults.max_latency_increase,
+                                help="Allowed relative p50/p90 latency increase (0.2 = 20%%).")
+    compare_parser.add_argument("--max-tool-increase", type=float, default=defaults.max_tool_increase,
+                                help="Allowed relative p50 increase per tool.")
+    compare_parser.add_argument("--min-delta-ms", type=float, default=defaults.min_delta_ms,
+                                help="Latency changes smaller than this never count as regressions.")
+    args = parser.parse_args(argv)
+
+    if not os.path.exists(args.db):
+        print(f"No run store at {args.db}", file=sys.stderr)
+        return 2
+    with RunStore(args.db) as store:
+        try:
+            if args.command == "list":
+                for run in store.runs(args.limit, args.label):
+                    started = time.strftime("%Y-%m-%d %H:%M:%S", time.localtime(run["started_at"]))
+                    print(f"{run['run_id']:>6}  {started}  {run['label'] or '-':<16} {run['config_hash'] or '-':<16} "
+                          f"{run['passed']}/{run['total']} passed  p50 {_ms(run['p50_ms'])} ms  p90 {_ms(run['p90_ms'])} ms")
+                return 0
+            thresholds = CompareThresholds(args.max_new_failures, args.max_latency_increase,
+                                           args.max_tool_increase, args.min_delta_ms)
+            comparison = compare_runs(store, store.resolve(args.base), store.resolve(args.head), thresholds)
+        except RunStoreError as e:
+            print(e, file=sys.stderr)
+            return 2
+    print(format_comparison(comparison))
+    return 0 if comparison.passed else 1
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,70 @@
+
+import math
+from typing import Dict, Sequence
+
+
+def percentile(values: Sequence[float], pct: float) -> float:
+    """Nearest-rank percentile (pct in 0-100) of an unsorted sequence; 0.0 when empty."""
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    rank = max(1, math.ceil(pct / 100 * len(ordered)))
+    return ordered[min(rank, len(ordered)) - 1]
+
+
+def summarize_latencies(latencies: Sequence[float], wall_seconds: float, errors: int = 0) -> Dict[str, float]:
+    """p50/p90/p99 latency (seconds), throughput (per second) and error rate for a run."""
+    count = len(latencies)
+    return {
+        "count": count,
+        "p50": percentile(latencies, 50),
+        "p90": percentile(latencies, 90),
+        "p99": percentile(latencies, 99),
+        "max": max(latencies) if latencies else 0.0,
+        "throughput": count / wall_seconds if wall_seconds > 0 else 0.0,
+        "error_rate": errors / count if count else 0.0,
+    }
+
+
+class LatencyHistogram:
+    """
+    Constant-memory latency summary for runs too large to keep every sample. Values go
+    into log-spaced buckets `precision` apart (1% by default), so percentiles are exact
+    to within that relative error while memory only depends on the range of values.
+    """
+    def __init__(self, precision: float = 0.01):
+        self._log_base = math.log1p(precision)
+        self._buckets: Dict[int, int] = {}
+        self.count = 0
+        self.max = 0.0
+
+    def add(self, value: float) -> None:
+        # Everything at or below 1 microsecond shares the lowest bucket.
+        bucket = math.ceil(math.log(max(value, 1e-6)) / self._log_base)
+        self._buckets[bucket] = self._buckets.get(bucket, 0) + 1
+        self.count += 1
+        self.max = max(self.max, value)
+
+    def percentile(self, pct: float) -> float:
+        """Nearest-rank percentile, reported as the upper edge of its bucket (capped at the max)."""
+        if not self.count:
+            return 0.0
+        rank = max(1, math.ceil(pct / 100 * self.count))
+        seen = 0
+        for bucket in sorted(self._buckets):
+            seen += self._buckets[bucket]
+            if seen >= rank:
+                return min(self.max, math.exp(bucket * self._log_base))
+        return self.max
+
+    def summarize(self, wall_seconds: float, errors: int = 0) -> Dict[str, float]:
+        """Same fields as summarize_latencies."""
+        return {
+            "count": self.count,
+            "p50": self.percentile(50),
+            "p90": self.percentile(90),
+            "p99": self.percentile(99),
+            "max": self.max,
+            "throughput": self.count / wall_seconds if wall_seconds > 0 else 0.0,
+            "error_rate": errors / self.count if self.count else 0.0,
+        }
@@ -0,0 +1,5 @@
+# part1/llm/__init__.py
+from .client import HttpLLMClient, LLMClient, LLMError, create_llm_client
+from .batching import MicroBatchingLLMClient
+
+__all__ = ["LLMClient", "HttpLLMClient", "LLMError", "MicroBatchingLLMClient", "create_llm_client"]
@@ -0,0 +1,103 @@
+
+import asyncio
+from typing import Dict, List, Optional, Tuple, Union
+
+from part1.llm.client import LLMClient, LLMError
+from part1.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Calls can only share a batch when they use the same system prompt and token limit.
+BatchKey = Tuple[Optional[str], Optional[int]]
+
+
+class _PendingBatch:
+    __slots__ = ("prompts", "futures", "timer")
+
+    def __init__(self):
+        self.prompts: List[str] = []
+        self.futures: List["asyncio.Future[str]"] = []
+        self.timer: Optional[asyncio.TimerHandle] = None
+
+
+class MicroBatchingLLMClient(LLMClient):
+    """
+    Wraps a batching-capable client and merges concurrent `generate` calls.
+
+    The first call of a batch opens a window of `window_ms`; calls arriving in it join
+    the batch, which is sent as one `generate_batch` request when the window closes or
+    `max_batch_size` calls have joined. Each caller gets its own result (or error) back.
+    Trades up to `window_ms` of extra latency for far fewer backend calls under load.
+    If `inner` has no batch endpoint (`supports_batching` is False), its generate_batch
+    sends each batch as concurrent single calls, so batching only adds latency;
+    create_llm_client doesn't wrap such clients.
+    """
+    supports_batching = True
+
+    def __init__(self, inner: LLMClient, window_ms: float = 5.0, max_batch_size: int = 16):
+        self.inner = inner
+        self.window = window_ms / 1000
+        self.max_batch_size = max(1, max_batch_size)
+        self._pending: Dict[BatchKey, _PendingBatch] = {}
+        self._in_flight: "set[asyncio.Task[None]]" = set()
+        self.batches_sent = 0
+        self.calls_batched = 0
+
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        loop = asyncio.get_running_loop()
+        key = (system_prompt, max_tokens)
+        batch = self._pending.get(key)
+        if batch is None:
+            batch = self._pending[key] = _PendingBatch()
+            batch.timer = loop.call_later(self.window, self._flush, key)
+        future: "asyncio.Future[str]" = loop.create_future()
+        batch.prompts.append(prompt)
+        batch.futures.append(future)
+        if len(batch.prompts) >= self.max_batch_size:
+            self._flush(key)
+        return await future
+
+    async def generate_batch(self, prompts: List[str], system_prompt: Optional[str] = None,
+                             max_tokens: Optional[int] = None) -> List[Union[str, LLMError]]:
+        return await self.inner.generate_batch(prompts, system_prompt, max_tokens)
+
+    def _flush(self, key: BatchKey) -> None:
+        batch = self._pending.pop(key, None)
+        if batch is None:
+            return
+        if batch.timer is not None:
+            batch.timer.cancel()
+        task = asyncio.ensure_future(self._dispatch(key, batch))
+        self._in_flight.add(task)
+        task.add_done_callback(self._in_flight.discard)
+
+    async def _dispatch(self, key: BatchKey, batch: _PendingBatch) -> None:
+        # Callers that gave up while waiting are dropped from the batch.
+        live = [(p, f) for p, f in zip(batch.prompts, batch.futures) if not f.done()]
+        if not live:
+            return
+        prompts = [p for p, _ in live]
+        self.batches_sent += 1
+        self.calls_batched += len(prompts)
+        system_prompt, max_tokens = key
+        try:
+            results = await self.inner.generate_batch(prompts, system_prompt, max_tokens)
+        except Exception as e:
+            logger.warning("Batched LLM call of %d prompts failed: %s", len(prompts), e)
+            error = e if isinstance(e, LLMError) else LLMError(str(e))
+            results = [error] * len(prompts)
+        for (_, future), result in zip(live, results):
+            if future.done():
+                continue
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            else:
+                future.set_result(result)
+
+    async def aclose(self) -> None:
+        for key in list(self._pending):
+            self._flush(key)
+        if self._in_flight:
+            await asyncio.gather(*self._in_flight, return_exceptions=True)
+        await self.inner.aclose()
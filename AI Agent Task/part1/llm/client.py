@@ -0,0 +1,231 @@
+
+import asyncio
+import os
+import random
+from abc import ABC, abstractmethod
+from typing import Any, Dict, List, Optional, Union
+
+import httpx
+
+from part1.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+try:
+    import h2  # noqa: F401  (httpx needs it for HTTP/2)
+    HTTP2_AVAILABLE = True
+except ImportError:
+    HTTP2_AVAILABLE = False
+
+# Status codes worth retrying: rate limiting and transient server errors.
+RETRYABLE_STATUS_CODES = frozenset({408, 429, 500, 502, 503, 504})
+# Batched completions: {"model", "requests": [{"messages", "max_tokens"}, ...]} ->
+# {"results": [<chat completion> | {"error": "..."}, ...]} in request order.
+BATCH_COMPLETIONS_PATH = "/v1/batch/chat/completions"
+
+
+class LLMError(Exception):
+    """The LLM backend could not produce a completion (after retries)."""
+
+
+class LLMClient(ABC):
+    """
+    Abstract base class for LLM backends used by the agent for the no-tool fallback
+    and for synthesizing tool results into a final answer.
+    """
+    @abstractmethod
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        """Returns the completion text for `prompt`. Raises LLMError on failure."""
+        raise NotImplementedError
+
+    # True when generate_batch sends one backend request for the whole batch.
+    supports_batching = False
+
+    async def generate_batch(self, prompts: List[str], system_prompt: Optional[str] = None,
+                             max_tokens: Optional[int] = None) -> List[Union[str, LLMError]]:
+        """
+        Completes several prompts. Returns one entry per prompt, in order: the text or
+        the LLMError for that prompt. The default makes one `generate` call per prompt.
+        """
+        results = await asyncio.gather(
+            *(self.generate(prompt, system_prompt, max_tokens) for prompt in prompts), return_exceptions=True
+        )
+        return [r if isinstance(r, (str, LLMError)) else LLMError(str(r)) for r in results]
+
+    async def aclose(self) -> None:
+        """Releases connections held by the client."""
+        return None
+
+
+class HttpLLMClient(LLMClient):
+    """
+    Client for an OpenAI-compatible `/v1/chat/completions` endpoint.
+
+    All requests from a worker share one pooled httpx.AsyncClient (keep-alive, and
+    HTTP/2 when the `h2` package is installed), created on first use. Connection
+    errors, timeouts and 408/429/5xx responses are retried with exponential backoff
+    and full jitter, honouring Retry-After when the server sends it.
+    """
+    def __init__(self, base_url: str, model: str = "mock-llm", api_key: Optional[str] = None,
+                 timeout: float = 30.0, connect_timeout: float = 5.0, max_retries: int = 2,
+                 backoff_base: float = 0.1, backoff_max: float = 2.0, max_connections: int = 100,
+                 http2: bool = True, max_tokens: int = 256,
+                 transport: Optional[httpx.AsyncBaseTransport] = None, batch_endpoint: bool = False):
+        self.base_url = base_url.rstrip("/")
+        self.model = model
+        self.api_key = api_key
+        self.timeout = httpx.Timeout(timeout, connect=connect_timeout)
+        self.max_retries = max(0, max_retries)
+        self.backoff_base = backoff_base
+        self.backoff_max = backoff_max
+        self.limits = httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections)
+        self.http2 = http2 and HTTP2_AVAILABLE
+        self.max_tokens = max_tokens
+        # Custom transport, e.g. httpx.ASGITransport over the mock server in tests.
+        self.transport = transport
+        # Whether the server implements BATCH_COMPLETIONS_PATH.
+        self.supports_batching = batch_endpoint
+        self._client: Optional[httpx.AsyncClient] = None
+        self._loop: Optional[asyncio.AbstractEventLoop] = None
+
+    def _get_client(self) -> httpx.AsyncClient:
+        loop = asyncio.get_running_loop()
+        # A pooled client is bound to the loop it was first used on (one per worker).
+        if self._client is None or self._loop is not loop:
+            headers = {"Authorization": f"Bearer {self.api_key}"} if self.api_key else None
+            self._client = httpx.AsyncClient(base_url=self.base_url, timeout=self.timeout, limits=self.limits,
+                                             http2=self.http2, headers=headers, transport=self.transport)
+            self._loop = loop
+        return self._client
+
+    def _backoff(self, attempt: int, retry_after: Optional[str] = None) -> float:
+        if retry_after:
+            try:
+                return min(self.backoff_max, float(retry_after))
+            except ValueError:
+                pass
+        return random.uniform(0, min(self.backoff_max, self.backoff_base * (2 ** attempt)))
+
+    @staticmethod
+    def _messages(prompt: str, system_prompt: Optional[str]) -> List[Dict[str, str]]:
+        messages: List[Dict[str, str]] = []
+        if system_prompt:
+            messages.append({"role": "system", "content": system_prompt})
+        messages.append({"role": "user", "content": prompt})
+        return messages
+
+    async def _post(self, path: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POSTs `payload` with retries and returns the decoded JSON body."""
+        client = self._get_client()
+        last_error: Optional[Exception] = None
+        for attempt in range(self.max_retries + 1):
+            retry_after = None
+            try:
+                response = await client.post(path, json=payload)
+                if response.status_code not in RETRYABLE_STATUS_CODES:
+                    response.raise_for_status()
+                    try:
+                        return response.json()
+                    except ValueError as e:
+                        raise LLMError("LLM backend returned invalid JSON") from e
+                retry_after = response.headers.get("Retry-After")
+                last_error = LLMError(f"LLM backend returned HTTP {response.status_code}")
+            except (httpx.TransportError, httpx.TimeoutException) as e:
+                last_error = e
+            except httpx.HTTPStatusError as e:
+                raise LLMError(f"LLM backend returned HTTP {e.response.status_code}") from e
+            if attempt < self.max_retries:
+                delay = self._backoff(attempt, retry_after)
+                logger.debug("LLM call failed (%s), retrying in %.3fs", last_error, delay)
+                await asyncio.sleep(delay)
+        raise LLMError(f"LLM call failed after {self.max_retries + 1} attempts: {last_error}") from last_error
+
+    async def generate(self, prompt: str, system_prompt: Optional[str] = None,
+                       max_tokens: Optional[int] = None) -> str:
+        payload = {"model": self.model, "messages": self._messages(prompt, system_prompt),
+                   "max_tokens": max_tokens or self.max_tokens}
+        return self._parse(await self._post("/v1/chat/completions", payload))
+
+    async def generate_batch(self, prompts: List[str], system_prompt: Optional[str] = None,
+                             max_tokens: Optional[int] = None) -> List[Union[str, LLMError]]:
+        if not self.supports_batching:
+            return await super().generate_batch(prompts, system_prompt, max_tokens)
+        payload = {
+            "model": self.model,
+            "requests": [
+                {"messages": self._messages(prompt, system_prompt), "max_tokens": max_tokens or self.max_tokens}
+                for prompt in prompts
+            ],
+        }
+        data = await self._post(BATCH_COMPLETIONS_PATH, payload)
+        results = data.get("results") if isinstance(data, dict) else None
+        if not isinstance(results, list) or len(results) != len(prompts):
+            raise LLMError(f"Batch response has {len(results) if isinstance(results, list) else 'no'} results "
+                           f"for {len(prompts)} prompts")
+        outputs: List[Union[str, LLMError]] = []
+        for item in results:
+            if isinstance(item, dict) and item.get("error"):
+                outputs.append(LLMError(str(item["error"])))
+            else:
+                try:
+                    outputs.append(self._parse(item))
+                except LLMError as e:
+                    outputs.append(e)
+        return outputs
+
+    @staticmethod
+    def _parse(data: Dict[str, Any]) -> str:
+        try:
+            content = data["choices"][0]["message"]["content"]
+        except (KeyError, IndexError, TypeError) as e:
+            raise LLMError(f"Unexpected LLM response shape: {data!r:.200}") from e
+        if not isinstance(content, str):
+            raise LLMError(f"Unexpected LLM response shape: {data!r:.200}")
+        return content
+
+    async def aclose(self) -> None:
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+            self._loop = None
+
+
+def create_llm_client() -> Optional[LLMClient]:
+    """
+    Builds the LLM client from the environment, or returns None when LLM_BASE_URL is
+    not set. Other settings: LLM_MODEL, LLM_API_KEY, LLM_TIMEOUT_SECONDS,
+    LLM_CONNECT_TIMEOUT_SECONDS, LLM_MAX_RETRIES, LLM_MAX_CONNECTIONS, LLM_HTTP2, LLM_MAX_TOKENS.
+
+    Micro-batching is opt-in and needs a backend with the non-standard batch endpoint
+    (BATCH_COMPLETIONS_PATH, served by part1.llm.mock_server). LLM_BATCH_ENDPOINT=true says
+    the backend has it; LLM_BATCH_WINDOW_MS > 0 then collects concurrent calls for that long
+    (up to LLM_BATCH_MAX_SIZE) and sends them as one request. Plain OpenAI-compatible
+    backends don't have the endpoint, so without LLM_BATCH_ENDPOINT the window is ignored
+    (with a warning) and every call is sent on its own.
+    """
+    base_url = os.getenv("LLM_BASE_URL")
+    if not base_url:
+        return None
+    batch_endpoint = os.getenv("LLM_BATCH_ENDPOINT", "false").lower() in ("1", "true", "yes")
+    batch_window_ms = float(os.getenv("LLM_BATCH_WINDOW_MS", "0"))
+    if batch_window_ms > 0 and not batch_endpoint:
+        logger.warning("LLM_BATCH_WINDOW_MS is set but LLM_BATCH_ENDPOINT is not; micro-batching is disabled")
+        batch_window_ms = 0
+    client = HttpLLMClient(
+        base_url,
+        model=os.getenv("LLM_MODEL", "mock-llm"),
+        api_key=os.getenv("LLM_API_KEY") or None,
+        timeout=float(os.getenv("LLM_TIMEOUT_SECONDS", "30")),
+        connect_timeout=float(os.getenv("LLM_CONNECT_TIMEOUT_SECONDS", "5")),
+        max_retries=int(os.getenv("LLM_MAX_RETRIES", "2")),
+        max_connections=int(os.getenv("LLM_MAX_CONNECTIONS", "100")),
+        http2=os.getenv("LLM_HTTP2", "true").lower() in ("1", "true", "yes"),
+        max_tokens=int(os.getenv("LLM_MAX_TOKENS", "256")),
+        batch_endpoint=batch_endpoint,
+    )
+    if batch_window_ms > 0:
+        from part1.llm.batching import MicroBatchingLLMClient  # batching imports this module
+        return MicroBatchingLLMClient(client, window_ms=batch_window_ms,
+                                      max_batch_size=int(os.getenv("LLM_BATCH_MAX_SIZE", "16")))
+    return client
@@ -0,0 +1,129 @@
+"""
+Local stand-in for an OpenAI-compatible LLM server, for benchmarks and offline runs.
+
+Each completion waits `latency_ms` (time to first token) plus one token interval per
+generated token (`tokens_per_second`), then returns a deterministic echo of the prompt.
+`failure_rate` makes that fraction of requests fail with 503 to exercise retries.
+`max_concurrency` limits how many backend calls are processed at once, like a model
+server with a fixed number of slots; /v1/batch/chat/completions handles a whole batch
+in one slot for the cost of its longest completion, as batched inference does.
+/stats reports request, batch and distinct client connection counts, so connection
+reuse can be checked.
+
+Usage:
+    python -m part1.llm.mock_server --port 9000 --latency-ms 50 --tokens-per-second 200
+    LLM_BASE_URL=http://127.0.0.1:9000 uvicorn part1.main:app
+"""
+import argparse
+import asyncio
+import random
+import time
+from typing import Any, Dict, List, Optional
+
+from fastapi import FastAPI, HTTPException, Request
+from pydantic import BaseModel
+
+
+class ChatMessage(BaseModel):
+    role: str
+    content: str
+
+
+class ChatCompletionRequest(BaseModel):
+    model: str = "mock-llm"
+    messages: List[ChatMessage]
+    max_tokens: Optional[int] = 256
+
+
+class BatchItem(BaseModel):
+    messages: List[ChatMessage]
+    max_tokens: Optional[int] = 256
+
+
+class BatchCompletionRequest(BaseModel):
+    model: str = "mock-llm"
+    requests: List[BatchItem]
+
+
+def mock_completion(prompt: str, max_tokens: int) -> str:
+    """The text the mock returns for a prompt, cut to `max_tokens` words."""
+    words = f"Mock LLM response to: {prompt}".split()
+    return " ".join(words[:max(1, max_tokens)])
+
+
+def create_app(latency_ms: float = 50.0, tokens_per_second: float = 0.0, failure_rate: float = 0.0,
+               max_concurrency: int = 0) -> FastAPI:
+    app = FastAPI(title="Mock LLM", description="Stand-in LLM server with configurable latency.")
+    stats: Dict[str, Any] = {"requests": 0, "batches": 0, "batched_prompts": 0, "failures": 0, "connections": set()}
+    slots = asyncio.Semaphore(max_concurrency) if max_concurrency > 0 else None
+
+    def record(request: Request) -> None:
+        stats["requests"] += 1
+        if request.client is not None:
+            stats["connections"].add((request.client.host, request.client.port))
+        if failure_rate and random.random() < failure_rate:
+            stats["failures"] += 1
+            raise HTTPException(status_code=503, detail="Injected failure")
+
+    def complete(messages: List[ChatMessage], max_tokens: Optional[int], model: str) -> Dict[str, Any]:
+        prompt = next((m.content for m in reversed(messages) if m.role == "user"), "")
+        text = mock_completion(prompt, max_tokens or 256)
+        return {
+            "id": f"mock-{stats['requests']}",
+            "object": "chat.completion",
+            "created": int(time.time()),
+            "model": model,
+            "choices": [{"index": 0, "message": {"role": "assistant", "content": text}, "finish_reason": "stop"}],
+            "usage": {"prompt_tokens": len(prompt.split()), "completion_tokens": len(text.split())},
+        }
+
+    async def simulate(completion_tokens: int) -> None:
+        delay = latency_ms / 1000
+        if tokens_per_second > 0:
+            delay += completion_tokens / tokens_per_second
+        if slots is None:
+            await asyncio.sleep(delay)
+            return
+        async with slots:
+            await asyncio.sleep(delay)
+
+    @app.post("/v1/chat/completions")
+    async def chat_completions(body: ChatCompletionRequest, request: Request):
+        record(request)
+        result = complete(body.messages, body.max_tokens, body.model)
+        await simulate(result["usage"]["completion_tokens"])
+        return result
+
+    @app.post("/v1/batch/chat/completions")
+    async def batch_chat_completions(body: BatchCompletionRequest, request: Request):
+        record(request)
+        stats["batches"] += 1
+        stats["batched_prompts"] += len(body.requests)
+        results = [complete(item.messages, item.max_tokens, body.model) for item in body.requests]
+        await simulate(max((r["usage"]["completion_tokens"] for r in results), default=0))
+        return {"results": results}
+
+    @app.get("/stats")
+    def get_stats():
+        return {**{k: v for k, v in stats.items() if k != "connections"}, "connections": len(stats["connections"])}
+
+    return app
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--host", default="127.0.0.1")
+    parser.add_argument("--port", type=int, default=9000)
+    parser.add_argument("--latency-ms", type=float, default=50.0)
+    parser.add_argument("--tokens-per-second", type=float, default=0.0, help="0 = no per-token delay.")
+    parser.add_argument("--failure-rate", type=float, default=0.0)
+    parser.add_argument("--max-concurrency", type=int, default=0, help="Backend calls processed at once (0 = unlimited).")
+    args = parser.parse_args()
+
+    import uvicorn
+    uvicorn.run(create_app(args.latency_ms, args.tokens_per_second, args.failure_rate, args.max_concurrency),
+                host=args.host, port=args.port, log_level="warning")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,42 +1,307 @@
 
-from fastapi import FastAPI, HTTPException
+from fastapi import FastAPI, HTTPException, Request
+from fastapi.responses import JSONResponse, PlainTextResponse, StreamingResponse
+from contextlib import asynccontextmanager
 from dotenv import load_dotenv
+from typing import Any, Dict, List, Optional, Tuple
+import asyncio
 import os
 
-from .models import UserPromptRequest, AgentResponse
-from .agent import IntelligentAgent
-from .prompts import SYSTEM_PROMPT
+from .models import UserPromptRequest, AgentResponse, BatchItemResult
+from .agent import EVENT_FINAL, IntelligentAgent
+from .tools import ToolResultCache, default_registry
+from .tools.resilience import CLOSED
+from .response_cache import CACHE_BYPASS, ResponseCache, make_cache_key
+from .sessions import SessionManager
+from .admission import AdmissionController, AdmissionMiddleware
+from .structured_logging import RequestIdMiddleware, configure_logging, get_logger, logging_stats
+from . import metrics, serialization, tracing
 dotenv_path = os.path.join(os.path.dirname(os.path.dirname(__file__)), '.env')
 load_dotenv(dotenv_path)
+# JSON logs written by a background thread; see LOG_ENABLED / LOG_LEVEL / LOG_DEBUG_SAMPLE_RATE.
+configure_logging()
+logger = get_logger(__name__)
+
+# With PROMETHEUS_MULTIPROC_DIR set (gunicorn with several workers), /metrics aggregates all workers;
+# gunicorn.conf.py clears the directory when the server starts.
+_multiproc_dir = os.getenv(metrics.MULTIPROC_DIR_ENV)
+metrics_exporter = metrics.MultiprocessExporter(metrics.registry, _multiproc_dir) if _multiproc_dir else None
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    # Tools are instantiated in parallel and warmed up before the worker accepts
+    # connections, so the first requests don't pay for it. Without the lifespan
+    # (e.g. a plain TestClient) they are loaded on first use instead.
+    await default_registry.load_all()
+    await default_registry.warmup()
+    get_agent()
+    logger.info("Worker ready", extra=default_registry.status())
+    flusher = asyncio.create_task(metrics_exporter.run_flusher()) if metrics_exporter is not None else None
+    try:
+        yield
+    finally:
+        if flusher is not None:
+            flusher.cancel()
+            # Keep this worker's final counts once it exits.
+            metrics_exporter.flush()
+        tracing.tracer.exporter.close()
+        if _agent is not None and _agent.llm is not None:
+            await _agent.llm.aclose()
+        if _agent is not None and _agent.cassette is not None:
+            # In record mode, writes what this worker recorded.
+            _agent.cassette.close()
+
 
 app = FastAPI(
     title="Agent API",
     description="FastAPI service for an intelligent agent with tools.",
-    version="1.0.0"
+    version="1.0.0",
+    lifespan=lifespan,
 )
-agent = IntelligentAgent(system_prompt=SYSTEM_PROMPT)
+# Caps concurrent agent requests; see ADMISSION_MAX_IN_FLIGHT / ADMISSION_MAX_QUEUE / ADMISSION_QUEUE_TIMEOUT_SECONDS.
+admission = AdmissionController()
+# Added innermost-first: tracing sees the request ID, rejected requests are logged and
+# counted but not traced, metrics time everything.
+app.add_middleware(tracing.TracingMiddleware)
+app.add_middleware(AdmissionMiddleware, controller=admission)
+app.add_middleware(RequestIdMiddleware)
+app.add_middleware(metrics.MetricsMiddleware)
+# Tool result caching is opt-in; limits are configured through TOOL_CACHE_* variables.
+tool_cache = ToolResultCache() if os.getenv("TOOL_CACHE_ENABLED", "false").lower() in ("1", "true", "yes") else None
+_agent: Optional[IntelligentAgent] = None
+
+
+def get_agent() -> IntelligentAgent:
+    """The worker's agent, created on first use (or during startup) from the tool registry."""
+    global _agent
+    if _agent is None:
+        _agent = IntelligentAgent(tool_cache=tool_cache, observers=[metrics.MetricsObserver()])
+    return _agent
+
+
+# Server-side conversation memory for requests with a session_id; see SESSION_* variables.
+sessions = SessionManager()
+# Whole-response cache with single-flight coalescing; RESPONSE_CACHE_TTL_SECONDS=0 disables storing.
+response_cache = ResponseCache()
+CACHE_BYPASS_HEADER = "X-Cache-Bypass"
+# Batch endpoint limits: prompts per request and prompts processed concurrently per batch.
+BATCH_MAX_ITEMS = int(os.getenv("BATCH_MAX_ITEMS", "1000"))
+BATCH_MAX_CONCURRENCY = int(os.getenv("BATCH_MAX_CONCURRENCY", "8"))
+
+
+def _collect_gauges() -> None:
+    """Copies cache and log queue state into the metrics registry at scrape time."""
+    stats = response_cache.stats()
+    metrics.cache_entries.labels("response").set(stats["entries"])
+    metrics.response_cache_in_flight.labels().set(stats["in_flight"])
+    for event in ("hits", "misses", "coalesced", "evictions"):
+        metrics.cache_events_total.labels("response", event).set_total(stats[event])
+    if tool_cache is not None:
+        for tool_name, tool_stats in tool_cache.stats().items():
+            metrics.cache_entries.labels(f"tool:{tool_name}").set(tool_stats["entries"])
+            for event in ("hits", "misses", "evictions"):
+                metrics.cache_events_total.labels(f"tool:{tool_name}", event).set_total(tool_stats[event])
+    if _agent is not None:
+        for tool_name, state in _agent.tool_guard.states().items():
+            metrics.tool_circuit_open.labels(tool_name).set(0 if state == CLOSED else 1)
+    metrics.admission_in_flight.labels().set(admission.in_flight)
+    metrics.admission_queued.labels().set(admission.queued)
+    metrics.admission_rejections_total.labels("queue_full").set_total(admission.rejected_queue_full)
+    metrics.admission_rejections_total.labels("queue_timeout").set_total(admission.rejected_timeout)
+    log_stats = logging_stats()
+    metrics.log_queue_depth.labels().set(log_stats["queued"])
+    metrics.log_records_dropped_total.labels().set_total(log_stats["dropped"])
+
+
+metrics.registry.add_collector(_collect_gauges)
+
+
+def _is_cacheable(agent_response: AgentResponse) -> bool:
+    """Error and degraded responses are never cached."""
+    data = agent_response.structured_data or {}
+    return not (data.get("error") or data.get("degraded"))
+
+
+def _wants_bypass(request: Request) -> bool:
+    if request.headers.get(CACHE_BYPASS_HEADER, "").lower() in ("1", "true", "yes"):
+        return True
+    return "no-cache" in request.headers.get("Cache-Control", "").lower()
+
+
+async def _remember(session_id: str, user_prompt: str, agent_response: AgentResponse) -> None:
+    """Adds a turn to its session; failed runs are left out of the history."""
+    if not (agent_response.structured_data or {}).get("error"):
+        await sessions.record(session_id, user_prompt, agent_response)
+
+
+async def _run_prompt(user_prompt: str, bypass: bool = False, session_id: Optional[str] = None) -> Tuple[AgentResponse, str]:
+    """
+    Validates a prompt and runs it through the response cache and agent. Returns (response, cache status).
+    Prompts of a session depend on its history, so they skip the response cache.
+    """
+    if not user_prompt or len(user_prompt.strip()) < 2:
+         raise HTTPException(status_code=400, detail="Prompt must not be empty and at least 2 characters long.")
+
+    agent = get_agent()
+    try:
+        if session_id:
+            agent_response = await agent.process_prompt(user_prompt, history=await sessions.history(session_id))
+            await _remember(session_id, user_prompt, agent_response)
+            return agent_response, CACHE_BYPASS
+        return await response_cache.get_or_compute(
+            make_cache_key(user_prompt, agent.config_hash),
+            lambda: agent.process_prompt(user_prompt),
+            bypass=bypass,
+            cacheable=_is_cacheable,
+        )
+    except Exception as e:
+        logger.exception("An error occurred during agent processing: %s", e)
+        raise HTTPException(status_code=500, detail="An internal server error occurred.")
+
+
+async def _run_batch_item(index: int, item: UserPromptRequest, semaphore: asyncio.Semaphore, bypass: bool) -> BatchItemResult:
+    async with semaphore:
+        try:
+            agent_response, _ = await _run_prompt(item.prompt, bypass, item.session_id)
+            return BatchItemResult(index=index, status_code=200, response=agent_response)
+        except HTTPException as e:
+            return BatchItemResult(index=index, status_code=e.status_code, error=str(e.detail))
 
 
 # --- Endpoint Definition ---
 @app.post("/process_prompt", response_model=AgentResponse)
-async def process_user_prompt(request: UserPromptRequest):
+async def process_user_prompt(request: UserPromptRequest, http_request: Request):
     """
     Processes a user prompt using the intelligent agent.
+    Identical concurrent prompts share one agent run; send `X-Cache-Bypass: 1`
+    (or `Cache-Control: no-cache`) to force a fresh run.
+    Send `Accept: application/msgpack` for a msgpack body; large bodies are
+    compressed (zstd or gzip) following Accept-Encoding.
+    With a `session_id` the earlier turns of that conversation are kept on the
+    server and given to the LLM, so clients send only the new prompt.
     """
-    user_prompt = request.prompt
+    agent_response, cache_status = await _run_prompt(request.prompt, _wants_bypass(http_request), request.session_id)
+    return serialization.render(agent_response, http_request, headers={"X-Cache": cache_status})
+
+@app.post("/process_prompts", response_model=List[BatchItemResult])
+async def process_user_prompts(requests: List[UserPromptRequest], http_request: Request, stream: bool = False):
+    """
+    Processes a batch of prompts concurrently (at most BATCH_MAX_CONCURRENCY at a time).
+    A failing item is reported in its own result and doesn't fail the batch.
+    With `?stream=true` results are streamed as NDJSON in completion order;
+    otherwise they are returned as a list in submission order.
+    """
+    if len(requests) > BATCH_MAX_ITEMS:
+        raise HTTPException(status_code=413, detail=f"A batch may contain at most {BATCH_MAX_ITEMS} prompts.")
+
+    semaphore = asyncio.Semaphore(BATCH_MAX_CONCURRENCY)
+    bypass = _wants_bypass(http_request)
+    tasks = [asyncio.ensure_future(_run_batch_item(i, item, semaphore, bypass)) for i, item in enumerate(requests)]
+
+    if not stream:
+        return serialization.render(await asyncio.gather(*tasks), http_request)
+
+    async def ndjson_lines():
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                result = await next_done
+                yield serialization.dumps_json(result) + b"\n"
+        finally:
+            # Client went away: stop the work that nobody will read.
+            for task in tasks:
+                task.cancel()
 
-    
+    return StreamingResponse(ndjson_lines(), media_type="application/x-ndjson")
+
+def _format_event(event: Dict[str, Any], fmt: str) -> str:
+    """Encodes an agent stream event as an NDJSON line or an SSE message."""
+    if fmt == "ndjson":
+        return serialization.dumps_json(event).decode("utf-8") + "\n"
+    return f"event: {event['event']}\ndata: {serialization.dumps_json(event['data']).decode('utf-8')}\n\n"
+
+@app.post("/process_prompt/stream")
+async def process_user_prompt_stream(request: UserPromptRequest, format: str = "sse"):
+    """
+    Streaming variant of /process_prompt. Emits routing, tool call and response text
+    events as they happen, then a `final` event with the full AgentResponse.
+    `format` is `sse` (text/event-stream, default) or `ndjson`.
+    """
+    user_prompt = request.prompt
     if not user_prompt or len(user_prompt.strip()) < 2:
          raise HTTPException(status_code=400, detail="Prompt must not be empty and at least 2 characters long.")
+    if format not in ("sse", "ndjson"):
+        raise HTTPException(status_code=400, detail="format must be 'sse' or 'ndjson'.")
 
-    try:
-        agent_response = await agent.process_prompt(user_prompt)
-        return agent_response
-    except Exception as e:
-        print(f"An error occurred during agent processing: {e}", flush=True) 
-        raise HTTPException(status_code=500, detail="An internal server error occurred.")
+    history = await sessions.history(request.session_id) if request.session_id else None
+
+    async def events():
+        async for event in get_agent().stream_prompt(user_prompt, history=history):
+            if request.session_id and event["event"] == EVENT_FINAL:
+                await _remember(request.session_id, user_prompt, AgentResponse.model_validate(event["data"]))
+            yield _format_event(event, format)
+
+    media_type = "application/x-ndjson" if format == "ndjson" else "text/event-stream"
+    return StreamingResponse(events(), media_type=media_type, headers={"Cache-Control": "no-cache"})
+
+@app.get("/cache/stats")
+def cache_stats():
+    """Response and tool cache counters, for capacity planning."""
+    return {
+        "response_cache": response_cache.stats(),
+        "tool_cache": tool_cache.stats() if tool_cache is not None else None,
+    }
+
+@app.get("/metrics")
+def metrics_endpoint():
+    """Prometheus metrics: request, stage and per-tool latency histograms plus cache and queue gauges."""
+    snapshot = metrics_exporter.collect() if metrics_exporter is not None else metrics.registry.snapshot()
+    return PlainTextResponse(metrics.render_prometheus(snapshot), media_type=metrics.CONTENT_TYPE_LATEST)
+
+@app.get("/debug/traces")
+def list_traces(limit: int = 50, min_duration_ms: float = 0.0, errors_only: bool = False):
+    """
+    Recently sampled traces, newest first (slow and failed requests are always kept,
+    see TRACE_SLOW_MS / TRACE_SAMPLE_RATE). Fetch spans with /debug/traces/{trace_id}.
+    """
+    return {
+        "dropped": tracing.tracer.dropped,
+        "traces": tracing.tracer.exporter.recent(limit, min_duration_ms, errors_only),
+    }
+
+@app.get("/debug/traces/{trace_id}")
+def get_trace(trace_id: str):
+    """All spans of one sampled trace."""
+    trace = tracing.tracer.exporter.get(trace_id)
+    if trace is None:
+        raise HTTPException(status_code=404, detail="Trace not found (it may not have been sampled).")
+    return trace
+
+@app.delete("/sessions/{session_id}")
+async def delete_session(session_id: str):
+    """Forgets a conversation."""
+    if not await sessions.delete(session_id):
+        raise HTTPException(status_code=404, detail="Session not found.")
+    return {"deleted": session_id}
+
+@app.get("/sessions/stats")
+def session_stats():
+    """Session store size and limits."""
+    return sessions.stats()
 
 @app.get("/health")
 def health_check():
     """Basic health check endpoint."""
-    return {"status": "ok"}
\ No newline at end of file
+    return {"status": "ok"}
+
+@app.get("/ready")
+def readiness_check():
+    """
+    Readiness: 200 once startup has loaded and warmed up the tools, 503 before
+    (or when the app runs without its lifespan, where tools load on first use).
+    """
+    # The agent configuration being served, so evaluation runs can record what they measured.
+    status = {**default_registry.status(), "config_hash": _agent.config_hash if _agent is not None else None}
+    if status["warmup_ms"] is None:
+        return JSONResponse({"status": "starting", **status}, status_code=503)
+    return {"status": "ready", **status}
\ No newline at end of file
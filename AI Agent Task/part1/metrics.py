@@ -0,0 +1,470 @@
+
+import asyncio
+import bisect
+import glob
+import json
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple
+
+try:
+    import fcntl
+except ImportError:  # pragma: no cover - not on Windows, where gunicorn doesn't run either
+    fcntl = None
+
+from part1.agent import AgentObserver
+from part1.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+CONTENT_TYPE_LATEST = "text/plain; version=0.0.4; charset=utf-8"
+DEFAULT_LATENCY_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0)
+# When set (as for the Prometheus client), every gunicorn worker writes its metrics here
+# and /metrics aggregates all workers instead of reporting only the one that served it.
+MULTIPROC_DIR_ENV = "PROMETHEUS_MULTIPROC_DIR"
+FLUSH_INTERVAL_SECONDS = float(os.getenv("METRICS_FLUSH_SECONDS", "5"))
+# Counters and histograms of exited workers, folded together so their files can be deleted.
+ARCHIVE_FILENAME = "archived.json"
+
+LabelValues = Tuple[str, ...]
+
+
+class _Metric:
+    """
+    Base for labelled metrics. Children are plain Python objects updated without locks:
+    all recording happens on the worker's event loop thread, so there is no contention
+    and recording costs a dict lookup and an addition.
+    """
+    type_name = ""
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = ()):
+        self.name = name
+        self.documentation = documentation
+        self.labelnames = tuple(labelnames)
+        self._children: Dict[LabelValues, Any] = {}
+
+    def labels(self, *values: Any) -> Any:
+        key = tuple(str(v) for v in values)
+        child = self._children.get(key)
+        if child is None:
+            if len(key) != len(self.labelnames):
+                raise ValueError(f"{self.name} expects labels {self.labelnames}, got {key}")
+            child = self._children[key] = self._new_child()
+        return child
+
+    def _new_child(self) -> Any:
+        raise NotImplementedError
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "type": self.type_name,
+            "help": self.documentation,
+            "labelnames": list(self.labelnames),
+            "samples": [[list(k), child.value()] for k, child in self._children.items()],
+        }
+
+
+class _CounterChild:
+    __slots__ = ("_value",)
+
+    def __init__(self):
+        self._value = 0.0
+
+    def inc(self, amount: float = 1.0) -> None:
+        self._value += amount
+
+    def set_total(self, value: float) -> None:
+        """Mirrors a cumulative count kept by another component (e.g. cache hit counters)."""
+        self._value = value
+
+    def value(self) -> float:
+        return self._value
+
+
+class _GaugeChild(_CounterChild):
+    __slots__ = ()
+
+    def dec(self, amount: float = 1.0) -> None:
+        self._value -= amount
+
+    def set(self, value: float) -> None:
+        self._value = value
+
+
+class _HistogramChild:
+    __slots__ = ("_bounds", "_counts", "_sum")
+
+    def __init__(self, bounds: Sequence[float]):
+        self._bounds = bounds
+        self._counts = [0] * (len(bounds) + 1)
+        self._sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self._counts[bisect.bisect_left(self._bounds, value)] += 1
+        self._sum += value
+
+    def value(self) -> Dict[str, Any]:
+        return {"counts": list(self._counts), "sum": self._sum}
+
+
+class Counter(_Metric):
+    type_name = "counter"
+
+    def _new_child(self) -> _CounterChild:
+        return _CounterChild()
+
+
+class Gauge(_Metric):
+    """Gauge; across workers only the values of live workers are summed."""
+    type_name = "gauge"
+
+    def _new_child(self) -> _GaugeChild:
+        return _GaugeChild()
+
+
+class Histogram(_Metric):
+    type_name = "histogram"
+
+    def __init__(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                 buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS):
+        super().__init__(name, documentation, labelnames)
+        self.buckets = tuple(sorted(buckets))
+
+    def _new_child(self) -> _HistogramChild:
+        return _HistogramChild(self.buckets)
+
+    def snapshot(self) -> Dict[str, Any]:
+        data = super().snapshot()
+        data["buckets"] = list(self.buckets)
+        return data
+
+
+class MetricsRegistry:
+    """Holds the metrics of one worker plus callbacks that refresh gauges at scrape time."""
+    def __init__(self):
+        self._metrics: Dict[str, _Metric] = {}
+        self._collectors: List[Callable[[], None]] = []
+
+    def register(self, metric: _Metric) -> Any:
+        if metric.name in self._metrics:
+            raise ValueError(f"Metric '{metric.name}' is already registered")
+        self._metrics[metric.name] = metric
+        return metric
+
+    def counter(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Counter:
+        return self.register(Counter(name, documentation, labelnames))
+
+    def gauge(self, name: str, documentation: str, labelnames: Sequence[str] = ()) -> Gauge:
+        return self.register(Gauge(name, documentation, labelnames))
+
+    def histogram(self, name: str, documentation: str, labelnames: Sequence[str] = (),
+                  buckets: Sequence[float] = DEFAULT_LATENCY_BUCKETS) -> Histogram:
+        return self.register(Histogram(name, documentation, labelnames, buckets))
+
+    def add_collector(self, collector: Callable[[], None]) -> None:
+        """Registers a callback run before each scrape, e.g. to copy cache sizes into gauges."""
+        self._collectors.append(collector)
+
+    def snapshot(self) -> Dict[str, Any]:
+        for collector in self._collectors:
+            try:
+                collector()
+            except Exception:
+                logger.exception("Metrics collector failed")
+        return {name: metric.snapshot() for name, metric in self._metrics.items()}
+
+
+def _pid_alive(pid: int) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+def merge_snapshots(snapshots: Iterable[Tuple[Dict[str, Any], bool]]) -> Dict[str, Any]:
+    """
+    Merges per-worker snapshots, given as (snapshot, worker_alive) pairs. Counters and
+    histograms are summed over all workers, including ones that have exited, so totals
+    never go backwards; gauges are summed over live workers only.
+    """
+    merged: Dict[str, Any] = {}
+    for snapshot, alive in snapshots:
+        for name, data in snapshot.items():
+            if data["type"] == "gauge" and not alive:
+                continue
+            target = merged.setdefault(name, {**data, "samples": {}})
+            for labels, value in data["samples"]:
+                key = tuple(labels)
+                if data["type"] == "histogram":
+                    current = target["samples"].get(key)
+                    if current is None:
+                        target["samples"][key] = {"counts": list(value["counts"]), "sum": value["sum"]}
+                    else:
+                        current["counts"] = [a + b for a, b in zip(current["counts"], value["counts"])]
+                        current["sum"] += value["sum"]
+                else:
+                    target["samples"][key] = target["samples"].get(key, 0.0) + value
+    for data in merged.values():
+        data["samples"] = [[list(k), v] for k, v in data["samples"].items()]
+    return merged
+
+
+def _format_labels(names: Sequence[str], values: Sequence[str], extra: Optional[Tuple[str, str]] = None) -> str:
+    pairs = list(zip(names, values))
+    if extra:
+        pairs.append(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{k}="{_escape_label_value(v)}"' for k, v in pairs) + "}"
+
+
+def _escape_label_value(value: object) -> str:
+    return str(value).replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"')
+
+
+def _format_value(value: float) -> str:
+    if value == float("inf"):
+        return "+Inf"
+    return repr(float(value)) if not float(value).is_integer() else str(int(value))
+
+
+def render_prometheus(snapshot: Dict[str, Any]) -> str:
+    """Renders a (possibly merged) snapshot in the Prometheus text exposition format."""
+    lines: List[str] = []
+    for name, data in sorted(snapshot.items()):
+        lines.append(f"# HELP {name} {data['help']}")
+        lines.append(f"# TYPE {name} {data['type']}")
+        labelnames = data["labelnames"]
+        for labels, value in data["samples"]:
+            if data["type"] == "histogram":
+                cumulative = 0
+                for bound, count in zip(list(data["buckets"]) + [float("inf")], value["counts"]):
+                    cumulative += count
+                    le = _format_value(bound)
+                    lines.append(f"{name}_bucket{_format_labels(labelnames, labels, ('le', le))} {cumulative}")
+                lines.append(f"{name}_sum{_format_labels(labelnames, labels)} {_format_value(value['sum'])}")
+                lines.append(f"{name}_count{_format_labels(labelnames, labels)} {cumulative}")
+            else:
+                lines.append(f"{name}{_format_labels(labelnames, labels)} {_format_value(value)}")
+    return "\n".join(lines) + "\n"
+
+
+def _read_snapshot(path: str) -> Optional[Dict[str, Any]]:
+    try:
+        with open(path, encoding="utf-8") as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return None
+
+
+def _write_snapshot(path: str, snapshot: Dict[str, Any]) -> None:
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(snapshot, f)
+    os.replace(tmp_path, path)
+
+
+def clear_multiprocess_dir(directory: str) -> None:
+    """
+    Deletes the worker files and archive left by a previous server, so counters start from
+    zero with each server like they do with one worker. Call it once in the gunicorn master
+    before any worker starts (see gunicorn.conf.py).
+    """
+    patterns = ("metrics-*.json", "metrics-*.tmp", ARCHIVE_FILENAME, f"{ARCHIVE_FILENAME}.*.tmp")
+    for pattern in patterns:
+        for path in glob.glob(os.path.join(directory, pattern)):
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+
+
+class MultiprocessExporter:
+    """
+    Makes metrics from several gunicorn workers visible through any one of them. Each
+    worker atomically rewrites `<dir>/metrics-<pid>-<start ms>.json` every few seconds and
+    on scrape; the scraped worker merges every file in the directory.
+
+    Files of workers that have exited are folded into `<dir>/archived.json` (counters and
+    histograms only) and deleted, so the directory doesn't grow as gunicorn recycles
+    workers. The start time in the name keeps a new worker that reuses a PID from
+    overwriting the counts of the old one; of several files with one PID, only the newest
+    can belong to a live worker.
+    """
+    def __init__(self, registry: MetricsRegistry, directory: str):
+        self.registry = registry
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+        self.pid = os.getpid()
+        self.path = os.path.join(directory, f"metrics-{self.pid}-{int(time.time() * 1000)}.json")
+        self.archive_path = os.path.join(directory, ARCHIVE_FILENAME)
+
+    def flush(self) -> None:
+        _write_snapshot(self.path, self.registry.snapshot())
+
+    def _worker_files(self) -> List[Tuple[str, int, int]]:
+        files = []
+        for path in glob.glob(os.path.join(self.directory, "metrics-*.json")):
+            pid, _, started = os.path.basename(path)[len("metrics-"):-len(".json")].partition("-")
+            try:
+                files.append((path, int(pid), int(started or 0)))
+            except ValueError:
+                continue
+        return files
+
+    @contextmanager
+    def _lock(self) -> Iterator[None]:
+        if fcntl is None:
+            yield
+            return
+        with open(os.path.join(self.directory, ".lock"), "a") as f:
+            fcntl.flock(f, fcntl.LOCK_EX)
+            try:
+                yield
+            finally:
+                fcntl.flock(f, fcntl.LOCK_UN)
+
+    def _archive(self, paths: List[str]) -> None:
+        """Folds dead workers' files into the archive and deletes them."""
+        # Under the lock, and re-read inside it, so two workers scraped at once can't
+        # both fold the same file.
+        with self._lock():
+            snapshots = [(_read_snapshot(self.archive_path) or {}, False)]
+            folded = []
+            for path in paths:
+                snapshot = _read_snapshot(path)
+                if snapshot is not None:
+                    snapshots.append((snapshot, False))
+                    folded.append(path)
+            if not folded:
+                return
+            _write_snapshot(self.archive_path, merge_snapshots(snapshots))
+            for path in folded:
+                try:
+                    os.remove(path)
+                except FileNotFoundError:
+                    pass
+
+    def collect(self) -> Dict[str, Any]:
+        self.flush()
+        files = self._worker_files()
+        newest: Dict[int, int] = {}
+        for _, pid, started in files:
+            newest[pid] = max(newest.get(pid, started), started)
+        live, dead = [], []
+        for path, pid, started in files:
+            alive = path == self.path or (started == newest[pid] and pid != self.pid and _pid_alive(pid))
+            (live if alive else dead).append(path)
+        if dead:
+            self._archive(dead)
+
+        snapshots = [(snapshot, True) for snapshot in map(_read_snapshot, live) if snapshot is not None]
+        archived = _read_snapshot(self.archive_path)
+        if archived is not None:
+            snapshots.append((archived, False))
+        return merge_snapshots(snapshots)
+
+    async def run_flusher(self, interval: float = FLUSH_INTERVAL_SECONDS) -> None:
+        """Background task that keeps this worker's file fresh between scrapes."""
+        while True:
+            await asyncio.sleep(interval)
+            try:
+                self.flush()
+            except OSError:
+                logger.exception("Could not write metrics snapshot to %s", self.path)
+
+
+# --- Metrics used by the app ---
+registry = MetricsRegistry()
+http_requests_total = registry.counter(
+    "agent_http_requests_total", "HTTP requests handled.", ("method", "endpoint", "status"))
+http_request_duration_seconds = registry.histogram(
+    "agent_http_request_duration_seconds", "HTTP request latency.", ("method", "endpoint"))
+http_requests_in_flight = registry.gauge(
+    "agent_http_requests_in_flight", "HTTP requests currently being handled.", ("endpoint",))
+agent_stage_duration_seconds = registry.histogram(
+    "agent_stage_duration_seconds", "Time spent in each agent stage.", ("stage",))
+tool_calls_total = registry.counter(
+    "agent_tool_calls_total", "Tool calls executed (cache hits excluded).", ("tool",))
+tool_errors_total = registry.counter(
+    "agent_tool_errors_total", "Tool calls that raised.", ("tool",))
+tool_call_duration_seconds = registry.histogram(
+    "agent_tool_call_duration_seconds", "Tool call latency.", ("tool",))
+cache_entries = registry.gauge(
+    "agent_cache_entries", "Entries currently held by each cache.", ("cache",))
+cache_events_total = registry.counter(
+    "agent_cache_events_total", "Cache hits, misses, coalesced requests and evictions.", ("cache", "event"))
+response_cache_in_flight = registry.gauge(
+    "agent_response_cache_in_flight", "Distinct prompts currently being computed by the response cache.")
+tool_circuit_open = registry.gauge(
+    "agent_tool_circuit_open", "1 while a tool's circuit breaker is open or half-open.", ("tool",))
+admission_in_flight = registry.gauge(
+    "agent_admission_in_flight", "Requests admitted and running the agent.")
+admission_queued = registry.gauge(
+    "agent_admission_queued", "Requests waiting for admission.")
+admission_rejections_total = registry.counter(
+    "agent_admission_rejections_total", "Requests rejected by admission control.", ("reason",))
+log_queue_depth = registry.gauge("agent_log_queue_depth", "Log records waiting for the background writer.")
+log_records_dropped_total = registry.counter(
+    "agent_log_records_dropped_total", "Log records dropped because the queue was full.")
+
+
+class MetricsObserver(AgentObserver):
+    """Feeds agent stage and per-tool timings into the registry (keyed by BaseTool.name)."""
+    def on_stage(self, stage: str, seconds: float) -> None:
+        agent_stage_duration_seconds.labels(stage).observe(seconds)
+
+    def on_tool_call(self, tool_name: str, seconds: float, error: Optional[BaseException]) -> None:
+        tool_calls_total.labels(tool_name).inc()
+        tool_call_duration_seconds.labels(tool_name).observe(seconds)
+        if error is not None:
+            tool_errors_total.labels(tool_name).inc()
+
+
+class MetricsMiddleware:
+    """
+    ASGI middleware recording request counts, latency and in-flight requests per endpoint.
+    Endpoints are labelled by route template; unknown paths share the "other" label so
+    scanners can't blow up label cardinality.
+    """
+    def __init__(self, app):
+        self.app = app
+        self._known_paths: Optional[set] = None
+
+    def _endpoint(self, scope) -> str:
+        route = scope.get("route")
+        if route is not None and getattr(route, "path", None):
+            return route.path
+        if self._known_paths is None:
+            root_app = scope.get("app")
+            self._known_paths = {getattr(r, "path", None) for r in getattr(root_app, "routes", [])}
+        path = scope.get("path", "")
+        return path if path in self._known_paths else "other"
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        in_flight = http_requests_in_flight.labels(self._endpoint(scope))
+        in_flight.inc()
+        status = 500
+        start = time.perf_counter()
+
+        async def send_with_status(message):
+            nonlocal status
+            if message["type"] == "http.response.start":
+                status = message["status"]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_status)
+        finally:
+            in_flight.dec()
+            endpoint = self._endpoint(scope)
+            http_requests_total.labels(scope["method"], endpoint, status).inc()
+            http_request_duration_seconds.labels(scope["method"], endpoint).observe(time.perf_counter() - start)
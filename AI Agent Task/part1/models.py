@@ -7,6 +7,7 @@ class UserPromptRequest(BaseModel):
     Schema for the incoming user prompt request.
     """
     prompt: str = Field(..., description="The user's input prompt for the agent.")
+    session_id: Optional[str] = Field(None, max_length=128, description="Optional conversation ID; the server keeps the earlier turns of the session and gives them to the LLM.")
 
 class ToolUsage(BaseModel):
     """
@@ -15,6 +16,10 @@ class ToolUsage(BaseModel):
     tool_name: str = Field(..., description="Name of the tool used.")
     tool_input: Any = Field(..., description="Input provided to the tool.")
     tool_output: Any = Field(..., description="Output received from the tool.")
+    cached: bool = Field(False, description="True if the output was served from the tool result cache instead of a fresh call.")
+    status: str = Field("ok", description="'ok', or why the tool was unavailable: 'error', 'timeout', 'circuit_open' or 'saturated'.")
+    error: Optional[str] = Field(None, description="What went wrong when status is not 'ok'.")
+    duration_ms: Optional[float] = Field(None, description="Wall time of the call in milliseconds, including any wait for a free slot.")
 class AgentResponse(BaseModel):
     """
     Schema for the agent's structured response.
@@ -27,3 +32,12 @@ class AgentResponse(BaseModel):
         "arbitrary_types_allowed": True
         
     }
+
+class BatchItemResult(BaseModel):
+    """
+    Outcome of one prompt in a /process_prompts batch: either a response or an error.
+    """
+    index: int = Field(..., description="Position of the prompt in the submitted batch.")
+    status_code: int = Field(..., description="HTTP-style status for this item (200 on success).")
+    response: Optional[AgentResponse] = Field(None, description="The agent's response, if the item succeeded.")
+    error: Optional[str] = Field(None, description="Error detail, if the item failed.")
@@ -1,5 +1,15 @@
 
-SYSTEM_PROMPT = """
+import hashlib
+from dataclasses import dataclass
+from functools import lru_cache
+from typing import Any, Iterable, Tuple
+
+from part1.routing import declared_triggers
+from part1.tools.registry import default_registry
+
+# Tool descriptions are filled in from the registered tools (see build_prompt_bundle), so
+# they can't drift from the BaseTool `name`/`description` fields. Literal braces must be doubled.
+SYSTEM_PROMPT_TEMPLATE = """
 You are an intelligent agent designed to assist users based on their queries.
 
 Your core responsibilities are:
@@ -10,10 +20,7 @@ Your core responsibilities are:
 5. Format the final response clearly and adhere to all constraints.
 
 Available Tools:
-- [Describe Tool 1 Name]: [Describe Tool 1's function and when to use it]
-- [Describe Tool 2 Name]: [Describe Tool 2's function and when to use it]
-# Add descriptions for your actual tools here.
-# The LLM needs these descriptions to decide when and how to use tools.
+{tool_descriptions}
 
 Constraints:
 - Your response must be concise, typically under 200 words.
@@ -42,3 +49,64 @@ Fallback Logic:
 # This is often followed by the user's current prompt in the LLM call:
 # User: [User Prompt]
 """
+
+
+@dataclass(frozen=True)
+class ToolSpec:
+    """The prompt-relevant metadata of one tool."""
+    name: str
+    description: str
+    triggers: Tuple[str, ...] = ()
+
+    def render(self) -> str:
+        line = f"- {self.name}: {self.description}"
+        if self.triggers:
+            line += " Use when the user mentions " + ", ".join(f"'{t}'" for t in self.triggers) + "."
+        return line
+
+
+@dataclass(frozen=True)
+class PromptBundle:
+    """
+    The rendered system prompt and the tool specs it was built from. The text is the
+    static prefix of every LLM call, so it must stay byte-identical between requests
+    for provider-side prefix caching to hit; `content_hash` identifies it.
+    """
+    text: str
+    tool_specs: Tuple[ToolSpec, ...]
+    content_hash: str
+
+
+def tool_specs(tools: Iterable[Any]) -> Tuple[ToolSpec, ...]:
+    """Specs for `tools`, sorted by name so the rendered prompt doesn't depend on registration order."""
+    specs = {
+        str(tool.name): ToolSpec(str(tool.name), str(tool.description), declared_triggers(tool))
+        for tool in tools
+    }
+    return tuple(specs[name] for name in sorted(specs))
+
+
+@lru_cache(maxsize=32)
+def _render_bundle(specs: Tuple[ToolSpec, ...], template: str) -> PromptBundle:
+    descriptions = "\n".join(spec.render() for spec in specs) or "- (no tools are currently available)"
+    text = template.format(tool_descriptions=descriptions)
+    return PromptBundle(text=text, tool_specs=specs, content_hash=hashlib.sha256(text.encode("utf-8")).hexdigest())
+
+
+def build_prompt_bundle(tools: Iterable[Any], template: str = SYSTEM_PROMPT_TEMPLATE) -> PromptBundle:
+    """
+    Renders the system prompt for a tool set. Results are cached by the tool specs, so
+    the prompt is only re-rendered when a tool is added, removed or its metadata changes,
+    and agents with the same tools share one bundle object.
+    """
+    return _render_bundle(tool_specs(tools), template)
+
+
+def __getattr__(name: str) -> Any:
+    # DEFAULT_PROMPT_BUNDLE / SYSTEM_PROMPT are rendered from the registered tools on first
+    # access, so importing this module doesn't import and instantiate every tool.
+    if name == "DEFAULT_PROMPT_BUNDLE":
+        return build_prompt_bundle(default_registry.instances())
+    if name == "SYSTEM_PROMPT":
+        return build_prompt_bundle(default_registry.instances()).text
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
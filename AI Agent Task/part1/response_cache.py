@@ -0,0 +1,121 @@
+
+import asyncio
+import hashlib
+import os
+import time
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+DEFAULT_TTL_SECONDS = float(os.getenv("RESPONSE_CACHE_TTL_SECONDS", "30"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("RESPONSE_CACHE_MAX_ENTRIES", "1024"))
+
+# Cache status values, also returned to clients in the X-Cache header.
+CACHE_HIT = "HIT"
+CACHE_MISS = "MISS"
+CACHE_COALESCED = "COALESCED"
+CACHE_BYPASS = "BYPASS"
+
+
+def normalize_prompt(prompt: str) -> str:
+    """Collapses whitespace so trivially different prompts share a cache entry."""
+    return " ".join(prompt.split())
+
+
+def make_cache_key(prompt: str, config_hash: str) -> str:
+    """Cache key for a prompt under a given agent configuration (system prompt + tool set)."""
+    digest = hashlib.sha256(normalize_prompt(prompt).encode("utf-8")).hexdigest()
+    return f"{config_hash}:{digest}"
+
+
+class ResponseCache:
+    """
+    TTL/LRU cache for whole agent responses with single-flight coalescing.
+
+    Concurrent callers asking for the same key while it is being computed share one
+    in-flight computation and all receive its result. The computation runs in its own
+    task, so a disconnecting caller doesn't cancel it for the others.
+    """
+    def __init__(self, ttl_seconds: float = DEFAULT_TTL_SECONDS, max_entries: int = DEFAULT_MAX_ENTRIES,
+                 clock=time.monotonic):
+        self.ttl_seconds = ttl_seconds
+        self.max_entries = max_entries
+        self._clock = clock
+        self._entries: "OrderedDict[str, Tuple[Any, float]]" = OrderedDict()
+        self._inflight: Dict[str, "asyncio.Future[Any]"] = {}
+        self.hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.bypassed = 0
+        self.evictions = 0
+
+    def get(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        value, expires_at = entry
+        if expires_at <= self._clock():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def put(self, key: str, value: Any) -> None:
+        if self.ttl_seconds <= 0 or self.max_entries <= 0:
+            return
+        self._entries[key] = (value, self._clock() + self.ttl_seconds)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+            self.evictions += 1
+
+    async def get_or_compute(self, key: str, compute: Callable[[], Awaitable[Any]], bypass: bool = False,
+                             cacheable: Optional[Callable[[Any], bool]] = None) -> Tuple[Any, str]:
+        """
+        Returns (value, status). `bypass` skips the lookup and coalescing but still refreshes
+        the entry; `cacheable` can veto storing a result (e.g. error responses).
+        """
+        if bypass:
+            self.bypassed += 1
+            value = await compute()
+            if cacheable is None or cacheable(value):
+                self.put(key, value)
+            return value, CACHE_BYPASS
+
+        value = self.get(key)
+        if value is not None:
+            self.hits += 1
+            return value, CACHE_HIT
+
+        inflight = self._inflight.get(key)
+        if inflight is not None:
+            self.coalesced += 1
+            return await asyncio.shield(inflight), CACHE_COALESCED
+
+        self.misses += 1
+
+        async def run() -> Any:
+            try:
+                result = await compute()
+                if cacheable is None or cacheable(result):
+                    self.put(key, result)
+                return result
+            finally:
+                self._inflight.pop(key, None)
+
+        task = asyncio.ensure_future(run())
+        self._inflight[key] = task
+        return await asyncio.shield(task), CACHE_MISS
+
+    def clear(self) -> None:
+        self._entries.clear()
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "hits": self.hits,
+            "misses": self.misses,
+            "coalesced": self.coalesced,
+            "bypassed": self.bypassed,
+            "evictions": self.evictions,
+            "entries": len(self._entries),
+            "in_flight": len(self._inflight),
+        }
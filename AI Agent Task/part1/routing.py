@@ -0,0 +1,100 @@
+
+import re
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Mapping, Optional
+
+
+@dataclass(frozen=True)
+class RouteMatch:
+    """A trigger phrase found in the prompt and the tool it routes to."""
+    tool_name: str
+    trigger: str
+    start: int
+    end: int
+
+
+def normalize_phrase(phrase: str) -> str:
+    return " ".join(phrase.lower().split())
+
+
+def declared_triggers(tool: Any) -> tuple:
+    # Read from the class so mocks and other stand-ins without real metadata are skipped.
+    triggers = getattr(type(tool), "triggers", None)
+    if isinstance(triggers, (tuple, list)) and all(isinstance(t, str) for t in triggers):
+        return tuple(triggers)
+    return ()
+
+
+def _trie_pattern(node: Dict[str, Any]) -> str:
+    """Turns a character trie into a regex, so shared prefixes are only matched once."""
+    terminal = "" in node
+    branches = []
+    for char in sorted(k for k in node if k):
+        atom = r"\s+" if char == " " else re.escape(char)
+        branches.append(atom + _trie_pattern(node[char]))
+    if not branches:
+        return ""
+    body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+    if terminal:
+        return "(?:" + body + ")?"
+    return body
+
+
+def compile_triggers(phrases: Iterable[str]) -> Optional["re.Pattern[str]"]:
+    """
+    Compiles all trigger phrases into one case-insensitive regex built from a trie.
+    Matching is a single left-to-right pass over the prompt, and at each position
+    the longest phrase wins ("placeholder tool one" over "tool one").
+    """
+    trie: Dict[str, Any] = {}
+    for phrase in phrases:
+        node = trie
+        for char in phrase:
+            node = node.setdefault(char, {})
+        node[""] = True
+    if not trie:
+        return None
+    return re.compile(r"(?<!\w)" + _trie_pattern(trie) + r"(?!\w)", re.IGNORECASE)
+
+
+class ToolRouter:
+    """
+    Routes prompts to tools using the trigger phrases the tools declare on their class.
+
+    Tools that don't declare triggers themselves (e.g. test doubles) borrow the metadata
+    of the registered tool with the same name from `fallback` (usually TOOL_MAP).
+    """
+    def __init__(self, tools: Iterable[Any], fallback: Optional[Mapping[str, Any]] = None):
+        self._phrase_to_tool: Dict[str, str] = {}
+        # The object whose triggers/build_input describe each routable tool.
+        self.specs: Dict[str, Any] = {}
+        for tool in tools:
+            spec = tool
+            if not declared_triggers(spec) and fallback is not None:
+                spec = fallback.get(tool.name)
+            triggers = declared_triggers(spec) if spec is not None else ()
+            if not triggers:
+                continue
+            self.specs[tool.name] = spec
+            for trigger in triggers:
+                self._phrase_to_tool.setdefault(normalize_phrase(trigger), tool.name)
+        self._pattern = compile_triggers(self._phrase_to_tool)
+
+    def route(self, prompt: str) -> List[RouteMatch]:
+        """Returns the first match for each triggered tool, in prompt order."""
+        if self._pattern is None:
+            return []
+        matches: List[RouteMatch] = []
+        seen = set()
+        for m in self._pattern.finditer(prompt):
+            trigger = normalize_phrase(m.group(0))
+            tool_name = self._phrase_to_tool[trigger]
+            if tool_name in seen:
+                continue
+            seen.add(tool_name)
+            matches.append(RouteMatch(tool_name, trigger, m.start(), m.end()))
+        return matches
+
+    def build_input(self, match: RouteMatch, prompt: str) -> Any:
+        """Derives the tool input for a match using the tool's own `build_input`."""
+        return self.specs[match.tool_name].build_input(prompt, match.start, match.end)
@@ -0,0 +1,138 @@
+
+import gzip
+import json
+import os
+from typing import Any, Dict, List, Optional, Tuple
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+try:
+    import orjson
+    ORJSON_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on the environment
+    orjson = None
+    ORJSON_AVAILABLE = False
+
+try:
+    import msgpack
+    MSGPACK_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on the environment
+    msgpack = None
+    MSGPACK_AVAILABLE = False
+
+try:
+    import zstandard
+    ZSTD_AVAILABLE = True
+except ImportError:  # pragma: no cover - depends on the environment
+    zstandard = None
+    ZSTD_AVAILABLE = False
+
+JSON_MEDIA_TYPE = "application/json"
+MSGPACK_MEDIA_TYPE = "application/msgpack"
+_MSGPACK_ALIASES = (MSGPACK_MEDIA_TYPE, "application/x-msgpack", "application/vnd.msgpack")
+
+# Bodies smaller than this are sent uncompressed; compressing them costs more than it saves.
+COMPRESS_MIN_BYTES = int(os.getenv("RESPONSE_COMPRESS_MIN_BYTES", "4096"))
+GZIP_LEVEL = 5
+ZSTD_LEVEL = 3
+
+
+def _default(obj: Any) -> Any:
+    """
+    Fallback for values the encoders don't handle natively. Models are encoded from
+    their field values as stored, without model_dump(), which would deep-copy large
+    `tool_output` payloads first; the response models have no aliases or custom
+    serializers, so the result is the same.
+    """
+    if isinstance(obj, BaseModel):
+        return obj.__dict__
+    if isinstance(obj, (set, frozenset, tuple)):
+        return list(obj)
+    if isinstance(obj, bytes):
+        return obj.decode("utf-8", errors="replace")
+    return str(obj)
+
+
+def dumps_json(obj: Any) -> bytes:
+    """JSON-encodes plain data or models, with orjson when it is installed."""
+    if orjson is not None:
+        return orjson.dumps(obj, default=_default, option=orjson.OPT_NON_STR_KEYS)
+    return json.dumps(obj, default=_default, ensure_ascii=False, separators=(",", ":")).encode("utf-8")
+
+
+def dumps_msgpack(obj: Any) -> bytes:
+    if msgpack is None:
+        raise RuntimeError("msgpack is not installed")
+    return msgpack.packb(obj, default=_default, use_bin_type=True)
+
+
+def _parse_header(value: str) -> List[Tuple[str, float]]:
+    """Splits an Accept / Accept-Encoding header into (token, q) pairs, best first."""
+    items = []
+    for position, part in enumerate(value.split(",")):
+        token, *params = [p.strip() for p in part.split(";")]
+        if not token:
+            continue
+        q = 1.0
+        for param in params:
+            name, _, raw = param.partition("=")
+            if name.strip().lower() == "q":
+                try:
+                    q = float(raw)
+                except ValueError:
+                    q = 0.0
+        # Ties keep header order.
+        items.append((-q, position, token.lower()))
+    return [(token, -neg_q) for neg_q, _, token in sorted(items) if neg_q < 0]
+
+
+def negotiate_media_type(accept: Optional[str]) -> str:
+    """msgpack when the client prefers it (and it is installed), JSON otherwise."""
+    if not accept or not MSGPACK_AVAILABLE:
+        return JSON_MEDIA_TYPE
+    for media_type, _ in _parse_header(accept):
+        if media_type in _MSGPACK_ALIASES:
+            return MSGPACK_MEDIA_TYPE
+        if media_type in (JSON_MEDIA_TYPE, "application/*", "*/*"):
+            return JSON_MEDIA_TYPE
+    return JSON_MEDIA_TYPE
+
+
+def negotiate_encoding(accept_encoding: Optional[str]) -> Optional[str]:
+    """The preferred content coding among those supported (zstd, gzip), or None."""
+    if not accept_encoding:
+        return None
+    for coding, _ in _parse_header(accept_encoding):
+        if coding == "zstd" and ZSTD_AVAILABLE:
+            return "zstd"
+        if coding in ("gzip", "*"):
+            return "gzip"
+    return None
+
+
+def compress(body: bytes, coding: str) -> bytes:
+    if coding == "zstd":
+        return zstandard.ZstdCompressor(level=ZSTD_LEVEL).compress(body)
+    return gzip.compress(body, compresslevel=GZIP_LEVEL)
+
+
+def render(obj: Any, request: Request, status_code: int = 200,
+           headers: Optional[Dict[str, str]] = None, min_compress_bytes: Optional[int] = None) -> Response:
+    """
+    Encodes `obj` for the client and returns a ready Response. Returning it directly
+    skips FastAPI's response_model pass, which would validate and encode the already
+    validated model a second time. The format follows the Accept header; bodies of at
+    least `min_compress_bytes` are compressed following Accept-Encoding.
+    """
+    media_type = negotiate_media_type(request.headers.get("accept"))
+    body = dumps_msgpack(obj) if media_type == MSGPACK_MEDIA_TYPE else dumps_json(obj)
+    response_headers = {"Vary": "Accept, Accept-Encoding", **(headers or {})}
+
+    threshold = COMPRESS_MIN_BYTES if min_compress_bytes is None else min_compress_bytes
+    if len(body) >= threshold:
+        coding = negotiate_encoding(request.headers.get("accept-encoding"))
+        if coding is not None:
+            body = compress(body, coding)
+            response_headers["Content-Encoding"] = coding
+    return Response(content=body, status_code=status_code, media_type=media_type, headers=response_headers)
@@ -0,0 +1,314 @@
+
+import asyncio
+import hashlib
+import json
+import os
+import sys
+import weakref
+from abc import ABC, abstractmethod
+from collections import OrderedDict, deque
+from typing import Any, Deque, Dict, Iterable, List, Optional
+
+from part1.models import AgentResponse
+from part1.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Per-session budget for stored turns plus the summary of older ones, in estimated tokens.
+DEFAULT_MAX_TOKENS = int(os.getenv("SESSION_MAX_TOKENS", "2000"))
+# Share of that budget the summary of trimmed turns may use; its oldest lines go first.
+DEFAULT_SUMMARY_TOKENS = int(os.getenv("SESSION_SUMMARY_TOKENS", "400"))
+# Worker-wide limits of the in-memory store; least recently used sessions are evicted first.
+DEFAULT_MAX_SESSIONS = int(os.getenv("SESSION_MAX_SESSIONS", "10000"))
+DEFAULT_MAX_BYTES = int(os.getenv("SESSION_MAX_BYTES", str(64 * 1024 * 1024)))
+
+# Rough fixed cost of a stored turn / session object, added to the text sizes when
+# accounting memory against SESSION_MAX_BYTES.
+_TURN_OVERHEAD_BYTES = 200
+_SESSION_OVERHEAD_BYTES = 400
+# Longest prompt/response excerpt kept in a summary line.
+_SUMMARY_EXCERPT_CHARS = 80
+
+
+def estimate_tokens(text: str) -> int:
+    """Cheap token estimate (about 4 characters per token for English text)."""
+    return (len(text) + 3) // 4
+
+
+def _excerpt(text: str, limit: int = _SUMMARY_EXCERPT_CHARS) -> str:
+    text = " ".join(text.split())
+    return text if len(text) <= limit else text[:limit - 3] + "..."
+
+
+class ToolRecord:
+    """Which tool a turn used and how it went; tool names are interned, so repeats share one string."""
+    __slots__ = ("name", "status")
+
+    def __init__(self, name: str, status: str):
+        self.name = sys.intern(name)
+        self.status = sys.intern(status)
+
+
+class Turn:
+    """One prompt and the agent's answer. Tool outputs are not kept; the answer already summarizes them."""
+    __slots__ = ("prompt", "response", "tools", "tokens", "nbytes")
+
+    def __init__(self, prompt: str, response: str, tools: Iterable[ToolRecord] = ()):
+        self.prompt = prompt
+        self.response = response
+        self.tools = tuple(tools)
+        self.tokens = estimate_tokens(prompt) + estimate_tokens(response)
+        self.nbytes = len(prompt) + len(response) + _TURN_OVERHEAD_BYTES
+
+    def summary_line(self) -> str:
+        line = f"User asked: {_excerpt(self.prompt)}"
+        if self.tools:
+            line += f" (tools: {', '.join(t.name if t.status == 'ok' else f'{t.name} [{t.status}]' for t in self.tools)})"
+        return f"{line}; answered: {_excerpt(self.response)}"
+
+
+class Session:
+    """
+    Recent turns of one conversation plus a one-line-per-turn summary of older ones.
+    `add_turn` keeps the session within its token budget incrementally: the oldest turns
+    are folded into summary lines, and the oldest summary lines are dropped once the
+    summary outgrows its share.
+    """
+    __slots__ = ("session_id", "turns", "summary", "tokens", "summary_tokens", "nbytes")
+
+    def __init__(self, session_id: str):
+        self.session_id = session_id
+        self.turns: Deque[Turn] = deque()
+        self.summary: Deque[str] = deque()
+        self.tokens = 0
+        self.summary_tokens = 0
+        self.nbytes = _SESSION_OVERHEAD_BYTES
+
+    def add_turn(self, turn: Turn, max_tokens: int = DEFAULT_MAX_TOKENS,
+                 summary_tokens: int = DEFAULT_SUMMARY_TOKENS) -> None:
+        self.turns.append(turn)
+        self.tokens += turn.tokens
+        self.nbytes += turn.nbytes
+        # Always keep the newest turn, even when it alone is over budget.
+        while self.tokens > max_tokens and len(self.turns) > 1:
+            oldest = self.turns.popleft()
+            self.tokens -= oldest.tokens
+            self.nbytes -= oldest.nbytes
+            self._add_summary_line(oldest.summary_line())
+        summary_budget = min(summary_tokens, max_tokens // 2)
+        while self.summary and (self.summary_tokens > summary_budget or self.tokens > max_tokens):
+            self._drop_summary_line()
+
+    def _add_summary_line(self, line: str) -> None:
+        self.summary.append(line)
+        cost = estimate_tokens(line)
+        self.summary_tokens += cost
+        self.tokens += cost
+        self.nbytes += len(line)
+
+    def _drop_summary_line(self) -> None:
+        line = self.summary.popleft()
+        cost = estimate_tokens(line)
+        self.summary_tokens -= cost
+        self.tokens -= cost
+        self.nbytes -= len(line)
+
+    def context(self) -> Optional[str]:
+        """The conversation so far as prompt text for the LLM, or None for a new session."""
+        if not self.turns and not self.summary:
+            return None
+        parts: List[str] = []
+        if self.summary:
+            parts.append("Earlier in this conversation:\n" + "\n".join(f"- {line}" for line in self.summary))
+        for turn in self.turns:
+            parts.append(f"User: {turn.prompt}\nAssistant: {turn.response}")
+        return "\n\n".join(parts)
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "session_id": self.session_id,
+            "summary": list(self.summary),
+            "turns": [[t.prompt, t.response, [[r.name, r.status] for r in t.tools]] for t in self.turns],
+        }
+
+    @classmethod
+    def from_dict(cls, data: Dict[str, Any]) -> "Session":
+        session = cls(data["session_id"])
+        for line in data.get("summary", ()):
+            session._add_summary_line(line)
+        for prompt, response, tools in data.get("turns", ()):
+            turn = Turn(prompt, response, (ToolRecord(name, status) for name, status in tools))
+            session.turns.append(turn)
+            session.tokens += turn.tokens
+            session.nbytes += turn.nbytes
+        return session
+
+
+class SessionStore(ABC):
+    """Where sessions live between requests. Stores with `blocking = True` are called from a worker thread."""
+    blocking = False
+
+    @abstractmethod
+    def get(self, session_id: str) -> Optional[Session]:
+        pass
+
+    @abstractmethod
+    def put(self, session: Session) -> None:
+        pass
+
+    @abstractmethod
+    def delete(self, session_id: str) -> bool:
+        pass
+
+    def stats(self) -> Dict[str, Any]:
+        return {}
+
+
+class InMemorySessionStore(SessionStore):
+    """
+    Sessions of this worker, in LRU order. Storing a session evicts the least recently
+    used ones while there are more than `max_sessions` or their accounted size exceeds
+    `max_bytes`, the hard memory cap per worker.
+    """
+    def __init__(self, max_sessions: int = DEFAULT_MAX_SESSIONS, max_bytes: int = DEFAULT_MAX_BYTES):
+        self.max_sessions = max_sessions
+        self.max_bytes = max_bytes
+        self._sessions: "OrderedDict[str, Session]" = OrderedDict()
+        # Size of each session when it was last stored, so updates adjust the total.
+        self._sizes: Dict[str, int] = {}
+        self.total_bytes = 0
+        self.evictions = 0
+
+    def get(self, session_id: str) -> Optional[Session]:
+        session = self._sessions.get(session_id)
+        if session is not None:
+            self._sessions.move_to_end(session_id)
+        return session
+
+    def put(self, session: Session) -> None:
+        key = session.session_id
+        self.total_bytes += session.nbytes - self._sizes.get(key, 0)
+        self._sizes[key] = session.nbytes
+        self._sessions[key] = session
+        self._sessions.move_to_end(key)
+        while len(self._sessions) > 1 and (len(self._sessions) > self.max_sessions or self.total_bytes > self.max_bytes):
+            evicted, _ = self._sessions.popitem(last=False)
+            self.total_bytes -= self._sizes.pop(evicted)
+            self.evictions += 1
+
+    def delete(self, session_id: str) -> bool:
+        if self._sessions.pop(session_id, None) is None:
+            return False
+        self.total_bytes -= self._sizes.pop(session_id)
+        return True
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "backend": "memory",
+            "sessions": len(self._sessions),
+            "bytes": self.total_bytes,
+            "max_sessions": self.max_sessions,
+            "max_bytes": self.max_bytes,
+            "evictions": self.evictions,
+        }
+
+
+class DiskSessionStore(SessionStore):
+    """
+    One JSON file per session in `directory`, written atomically. Sessions survive
+    restarts and are shared by all workers on the host; they use no worker memory
+    between requests. Files are not expired here; clean the directory externally.
+    """
+    blocking = True
+
+    def __init__(self, directory: str):
+        self.directory = directory
+        os.makedirs(directory, exist_ok=True)
+
+    def _path(self, session_id: str) -> str:
+        digest = hashlib.sha256(session_id.encode("utf-8")).hexdigest()[:32]
+        return os.path.join(self.directory, f"session-{digest}.json")
+
+    def get(self, session_id: str) -> Optional[Session]:
+        try:
+            with open(self._path(session_id), "r", encoding="utf-8") as f:
+                return Session.from_dict(json.load(f))
+        except FileNotFoundError:
+            return None
+        except (OSError, ValueError, KeyError, TypeError) as e:
+            logger.warning("Unreadable session file for %s, starting over: %s", session_id, e)
+            return None
+
+    def put(self, session: Session) -> None:
+        path = self._path(session.session_id)
+        tmp_path = f"{path}.{os.getpid()}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(session.to_dict(), f, ensure_ascii=False)
+        os.replace(tmp_path, path)
+
+    def delete(self, session_id: str) -> bool:
+        try:
+            os.remove(self._path(session_id))
+            return True
+        except FileNotFoundError:
+            return False
+
+    def stats(self) -> Dict[str, Any]:
+        sessions = sum(1 for name in os.listdir(self.directory) if name.endswith(".json"))
+        return {"backend": "disk", "directory": self.directory, "sessions": sessions}
+
+
+def create_session_store() -> SessionStore:
+    """Store selected by SESSION_STORE: "memory" (default) or "disk" (files in SESSION_DIR)."""
+    backend = os.getenv("SESSION_STORE", "memory").lower()
+    if backend == "disk":
+        return DiskSessionStore(os.getenv("SESSION_DIR", ".sessions"))
+    if backend != "memory":
+        logger.warning("Unknown SESSION_STORE %r, using the in-memory store.", backend)
+    return InMemorySessionStore()
+
+
+class SessionManager:
+    """Loads a session's history for a prompt and records the finished turn back into the store."""
+    def __init__(self, store: Optional[SessionStore] = None, max_tokens: int = DEFAULT_MAX_TOKENS,
+                 summary_tokens: int = DEFAULT_SUMMARY_TOKENS):
+        self.store = store or create_session_store()
+        self.max_tokens = max_tokens
+        self.summary_tokens = summary_tokens
+        # A session's load-modify-store must not interleave with another request of the same session.
+        self._locks: "weakref.WeakValueDictionary[str, asyncio.Lock]" = weakref.WeakValueDictionary()
+
+    async def _call(self, method, *args):
+        if self.store.blocking:
+            return await asyncio.to_thread(method, *args)
+        return method(*args)
+
+    def _lock(self, session_id: str) -> asyncio.Lock:
+        lock = self._locks.get(session_id)
+        if lock is None:
+            lock = asyncio.Lock()
+            self._locks[session_id] = lock
+        return lock
+
+    async def history(self, session_id: str) -> Optional[str]:
+        """The conversation so far as prompt text, or None for a new session."""
+        session = await self._call(self.store.get, session_id)
+        return session.context() if session is not None else None
+
+    async def record(self, session_id: str, prompt: str, agent_response: AgentResponse) -> None:
+        """Appends a finished turn, trimming the session to its token budget."""
+        # Each side of a turn is capped at the whole budget, so one huge prompt can't blow the memory cap.
+        max_chars = self.max_tokens * 4
+        tools = [ToolRecord(usage.tool_name, usage.status) for usage in agent_response.tool_calls or ()]
+        turn = Turn(prompt[:max_chars], agent_response.response[:max_chars], tools)
+        async with self._lock(session_id):
+            session = await self._call(self.store.get, session_id) or Session(session_id)
+            session.add_turn(turn, self.max_tokens, self.summary_tokens)
+            await self._call(self.store.put, session)
+
+    async def delete(self, session_id: str) -> bool:
+        async with self._lock(session_id):
+            return await self._call(self.store.delete, session_id)
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.store.stats(), "max_tokens": self.max_tokens}
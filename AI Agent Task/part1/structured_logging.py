@@ -0,0 +1,183 @@
+
+import atexit
+import contextvars
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import traceback
+import uuid
+from logging.handlers import QueueHandler, QueueListener
+from typing import Any, Dict, Optional
+
+# Root logger for everything in the app; modules use get_logger(__name__).
+ROOT_LOGGER_NAME = "part1"
+REQUEST_ID_HEADER = "X-Request-ID"
+
+# Request ID of the request being handled; copied into every record logged while handling it.
+request_id_var: contextvars.ContextVar[Optional[str]] = contextvars.ContextVar("request_id", default=None)
+
+# Attributes every LogRecord has; anything else on a record came from `extra=` and is emitted as a field.
+_STANDARD_ATTRS = set(vars(logging.LogRecord("", 0, "", 0, "", (), None))) | {"message", "asctime", "request_id"}
+
+_listener: Optional[QueueListener] = None
+_queue_handler: Optional["NonBlockingQueueHandler"] = None
+
+
+def get_logger(name: str) -> logging.Logger:
+    """Returns a logger under the app's root logger (so it uses the structured handler)."""
+    if name != ROOT_LOGGER_NAME and not name.startswith(ROOT_LOGGER_NAME + "."):
+        name = f"{ROOT_LOGGER_NAME}.{name}"
+    return logging.getLogger(name)
+
+
+def new_request_id() -> str:
+    return uuid.uuid4().hex
+
+
+class JsonFormatter(logging.Formatter):
+    """Formats a record as one JSON object per line. Runs on the background writer thread."""
+    def format(self, record: logging.LogRecord) -> str:
+        entry: Dict[str, Any] = {
+            "ts": round(record.created, 6),
+            "level": record.levelname,
+            "logger": record.name,
+            "msg": record.getMessage(),
+        }
+        request_id = getattr(record, "request_id", None)
+        if request_id:
+            entry["request_id"] = request_id
+        for key, value in vars(record).items():
+            if key not in _STANDARD_ATTRS and not key.startswith("_"):
+                entry[key] = value
+        if record.exc_text:
+            entry["exc"] = record.exc_text
+        return json.dumps(entry, default=str)
+
+
+class DebugSampler(logging.Filter):
+    """Keeps only a fraction of DEBUG records; other levels always pass."""
+    def __init__(self, rate: float):
+        super().__init__()
+        self.rate = rate
+
+    def filter(self, record: logging.LogRecord) -> bool:
+        if record.levelno > logging.DEBUG or self.rate >= 1:
+            return True
+        return self.rate > 0 and random.random() < self.rate
+
+
+class NonBlockingQueueHandler(QueueHandler):
+    """
+    Hands records to the background writer through a bounded queue. The caller only
+    captures the request ID and the rendered message; JSON encoding and the actual write
+    happen on the listener thread. When the queue is full records are dropped (and
+    counted) rather than blocking the event loop.
+    """
+    def __init__(self, log_queue: "queue.Queue[logging.LogRecord]"):
+        super().__init__(log_queue)
+        self.dropped = 0
+
+    def prepare(self, record: logging.LogRecord) -> logging.LogRecord:
+        record.request_id = request_id_var.get()
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = "".join(traceback.format_exception(*record.exc_info))
+            record.exc_info = None
+        return record
+
+    def enqueue(self, record: logging.LogRecord) -> None:
+        try:
+            self.queue.put_nowait(record)
+        except queue.Full:
+            self.dropped += 1
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+def configure_logging(level: Optional[str] = None, enabled: Optional[bool] = None,
+                      debug_sample_rate: Optional[float] = None, queue_size: Optional[int] = None,
+                      stream=None) -> logging.Logger:
+    """
+    Sets up structured logging for the app (idempotent; later calls reconfigure).
+
+    LOG_ENABLED=false is a hard off switch: the app logger is disabled and every log call
+    returns after a single flag check. LOG_LEVEL sets the level (default INFO) and
+    LOG_DEBUG_SAMPLE_RATE keeps that fraction of DEBUG records.
+    """
+    global _listener, _queue_handler
+    enabled = _env_flag("LOG_ENABLED", "true") if enabled is None else enabled
+    level = (level or os.getenv("LOG_LEVEL", "INFO")).upper()
+    debug_sample_rate = float(os.getenv("LOG_DEBUG_SAMPLE_RATE", "1.0")) if debug_sample_rate is None else debug_sample_rate
+    queue_size = queue_size or int(os.getenv("LOG_QUEUE_SIZE", "10000"))
+
+    shutdown_logging()
+    root = logging.getLogger(ROOT_LOGGER_NAME)
+    root.handlers.clear()
+    root.propagate = False
+    root.disabled = not enabled
+    root.setLevel(level if enabled else logging.CRITICAL + 1)
+    if not enabled:
+        return root
+
+    log_queue: "queue.Queue[logging.LogRecord]" = queue.Queue(maxsize=queue_size)
+    _queue_handler = NonBlockingQueueHandler(log_queue)
+    _queue_handler.addFilter(DebugSampler(debug_sample_rate))
+    writer = logging.StreamHandler(stream or sys.stdout)
+    writer.setFormatter(JsonFormatter())
+    _listener = QueueListener(log_queue, writer, respect_handler_level=False)
+    _listener.start()
+    root.addHandler(_queue_handler)
+    return root
+
+
+def shutdown_logging() -> None:
+    """Flushes queued records and stops the background writer."""
+    global _listener
+    if _listener is not None:
+        _listener.stop()
+        _listener = None
+
+
+def logging_stats() -> Dict[str, int]:
+    """Queue depth and dropped record count, for metrics."""
+    if _queue_handler is None:
+        return {"queued": 0, "dropped": 0}
+    return {"queued": _queue_handler.queue.qsize(), "dropped": _queue_handler.dropped}
+
+
+class RequestIdMiddleware:
+    """
+    ASGI middleware that gives each HTTP request an ID (taken from X-Request-ID when the
+    client sends one), exposes it to loggers through request_id_var and echoes it back.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http":
+            await self.app(scope, receive, send)
+            return
+
+        header = REQUEST_ID_HEADER.lower().encode("latin-1")
+        request_id = next((v.decode("latin-1") for k, v in scope["headers"] if k == header), None) or new_request_id()
+        token = request_id_var.set(request_id)
+
+        async def send_with_request_id(message):
+            if message["type"] == "http.response.start":
+                message.setdefault("headers", [])
+                message["headers"] = list(message["headers"]) + [(header, request_id.encode("latin-1"))]
+            await send(message)
+
+        try:
+            await self.app(scope, receive, send_with_request_id)
+        finally:
+            request_id_var.reset(token)
+
+
+atexit.register(shutdown_logging)
@@ -0,0 +1,118 @@
+
+import asyncio
+
+import pytest
+from fastapi.testclient import TestClient
+
+import part1.main as api
+from part1.admission import AdmissionController, AdmissionRejected, ToolLimiter, ToolSaturated
+from part1.agent import IntelligentAgent
+from part1.tools.base import BaseTool
+
+
+async def test_requests_beyond_limit_wait_in_fifo_order():
+    controller = AdmissionController(max_in_flight=1, max_queue=2, queue_timeout=1)
+    await controller.acquire()
+    order = []
+
+    async def waiter(name):
+        await controller.acquire()
+        order.append(name)
+
+    tasks = [asyncio.ensure_future(waiter("a")), asyncio.ensure_future(waiter("b"))]
+    await asyncio.sleep(0)
+    assert controller.queued == 2
+
+    controller.release()
+    await asyncio.sleep(0)
+    controller.release()
+    await asyncio.gather(*tasks)
+    assert order == ["a", "b"]
+    assert controller.in_flight == 1
+
+
+async def test_full_queue_is_rejected_with_429():
+    controller = AdmissionController(max_in_flight=1, max_queue=0, queue_timeout=1, retry_after=3)
+    await controller.acquire()
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await controller.acquire()
+    assert exc_info.value.status_code == 429
+    assert exc_info.value.retry_after == 3
+    assert controller.stats()["rejected_queue_full"] == 1
+
+
+async def test_queue_deadline_is_rejected_with_503_and_frees_nothing():
+    controller = AdmissionController(max_in_flight=1, max_queue=5, queue_timeout=0.01)
+    await controller.acquire()
+    with pytest.raises(AdmissionRejected) as exc_info:
+        await controller.acquire()
+    assert exc_info.value.status_code == 503
+    assert controller.queued == 0
+
+    controller.release()
+    assert controller.in_flight == 0
+
+
+async def test_cancelled_waiter_does_not_leak_a_slot():
+    controller = AdmissionController(max_in_flight=1, max_queue=5, queue_timeout=1)
+    await controller.acquire()
+    task = asyncio.ensure_future(controller.acquire())
+    await asyncio.sleep(0)
+    task.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await task
+
+    controller.release()
+    assert controller.in_flight == 0
+    await controller.acquire()
+    assert controller.in_flight == 1
+
+
+def test_api_rejects_with_retry_after_when_at_capacity(monkeypatch):
+    monkeypatch.setattr(api.admission, "max_in_flight", 1)
+    monkeypatch.setattr(api.admission, "max_queue", 0)
+    monkeypatch.setattr(api.admission, "in_flight", 1)
+    client = TestClient(api.app)
+
+    response = client.post("/process_prompt", json={"prompt": "Hello there"})
+    assert response.status_code == 429
+    assert response.headers["Retry-After"] == "1"
+    assert "capacity" in response.json()["detail"]
+
+    # Endpoints that don't run the agent are not subject to admission control.
+    assert client.get("/health").status_code == 200
+
+
+class SlowTool(BaseTool):
+    name = "SlowTool"
+    description = "Sleeps."
+    max_concurrency = 1
+
+    def __init__(self):
+        self.running = 0
+        self.peak = 0
+
+    async def arun(self, tool_input):
+        self.running += 1
+        self.peak = max(self.peak, self.running)
+        await asyncio.sleep(0.02)
+        self.running -= 1
+        return "done"
+
+
+async def test_tool_limiter_caps_concurrent_calls_per_tool():
+    tool = SlowTool()
+    agent = IntelligentAgent(tools=[tool], tool_limiter=ToolLimiter(wait_timeout=1))
+    await asyncio.gather(*(agent._call_tool(tool, tool.name, {}, asyncio.Semaphore(10)) for _ in range(3)))
+    assert tool.peak == 1
+
+
+async def test_saturated_tool_fails_fast():
+    tool = SlowTool()
+    limiter = ToolLimiter(wait_timeout=0.001)
+    async with limiter.slot(tool.name, tool):
+        with pytest.raises(ToolSaturated):
+            async with limiter.slot(tool.name, tool):
+                pass
+    # Tools without a declared limit use the default (unlimited here).
+    assert ToolLimiter(default_limit=0).limit_for(object()) == 0
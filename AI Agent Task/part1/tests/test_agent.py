@@ -1,10 +1,14 @@
 
+import asyncio
+import time
+
 import pytest
 from unittest.mock import AsyncMock, MagicMock 
 
 from part1.agent import IntelligentAgent
 from part1.prompts import SYSTEM_PROMPT
 from part1.tools.base import BaseTool 
+from part1.tools.executor import ToolExecutor, resolve_executor_mode
 from part1.models import AgentResponse, ToolUsage 
 def create_mock_tool(mocker, name, description, return_value, is_async=False):
     
@@ -108,7 +112,7 @@ async def test_agent_uses_llm_fallback(agent, mock_tools, mocker):
 
 @pytest.mark.asyncio
 async def test_agent_handles_tool_error(agent, mock_tools, mocker):
-    """Test that the agent handles exceptions raised by tools gracefully."""
+    """Test that a failing tool degrades the response instead of failing the request."""
     mock_tool_one = next(t for t in mock_tools if t.name == "PlaceholderToolOne")
     assert isinstance(mock_tool_one.run, MagicMock) 
 
@@ -124,9 +128,129 @@ async def test_agent_handles_tool_error(agent, mock_tools, mocker):
     
     mock_tool_one.run.assert_called_once()
 
-    assert "An error occurred while processing your request" in response.response
+    assert "Information from PlaceholderToolOne was unavailable" in response.response
     assert error_message in response.response
+    assert response.structured_data == {"degraded": True, "unavailable_tools": ["PlaceholderToolOne"]}
 
-    
-    assert response.tool_calls is None 
+    assert len(response.tool_calls) == 1
+    assert response.tool_calls[0].status == "error"
+    assert response.tool_calls[0].error == error_message
+    assert response.tool_calls[0].tool_output is None
+
+
+
+class _AsyncEchoTool(BaseTool):
+    name = "PlaceholderToolOne"
+    description = "Async-native stand-in for tool one."
+
+    async def arun(self, tool_input):
+        await asyncio.sleep(0)
+        return f"async:{tool_input}"
+
+
+class _SlowSyncTool(BaseTool):
+    name = "SlowSyncTool"
+    description = "Blocks its thread for a while."
+
+    def run(self, tool_input):
+        time.sleep(0.2)
+        return tool_input
+
+
+@pytest.mark.asyncio
+async def test_agent_awaits_async_native_tool():
+    """Tools that override arun are awaited instead of being sent to the thread pool."""
+    tool = _AsyncEchoTool()
+    assert resolve_executor_mode(tool) == "async"
+
+    agent_instance = IntelligentAgent(system_prompt=SYSTEM_PROMPT, tools=[tool])
+    response = await agent_instance.process_prompt("placeholder tool one: hello")
+
+    assert response.tool_calls[0].tool_output.startswith("async:")
+
+
+@pytest.mark.asyncio
+async def test_sync_tools_do_not_block_event_loop():
+    """Sync tools run in the thread pool, so concurrent calls overlap instead of queueing."""
+    tool = _SlowSyncTool()
+    assert resolve_executor_mode(tool) == "thread"
+    executor = ToolExecutor(max_thread_workers=4)
+
+    start = time.perf_counter()
+    results = await asyncio.gather(*(executor.run(tool, i) for i in range(4)))
+    elapsed = time.perf_counter() - start
+    executor.shutdown()
+
+    assert results == [0, 1, 2, 3]
+    assert elapsed < 0.6
+
+
+def test_resolve_executor_mode_rejects_unknown_mode():
+    tool = _SlowSyncTool()
+    tool.executor = "gpu"
+    with pytest.raises(ValueError):
+        resolve_executor_mode(tool)
+
+
+@pytest.mark.asyncio
+async def test_agent_runs_independent_tools_concurrently(mocker):
+    """Both tools are called for one prompt, concurrently, and reported in prompt order."""
+    async def slow_one(_):
+        await asyncio.sleep(0.2)
+        return "one"
+
+    async def slow_two(_):
+        await asyncio.sleep(0.2)
+        return "two"
+
+    tool_one = create_mock_tool(mocker, "PlaceholderToolOne", "Mocks tool one.", None, is_async=True)
+    tool_two = create_mock_tool(mocker, "PlaceholderToolTwo", "Mocks tool two.", None, is_async=True)
+    tool_one.run.side_effect = slow_one
+    tool_two.run.side_effect = slow_two
+    agent_instance = IntelligentAgent(system_prompt=SYSTEM_PROMPT, tools=[tool_one, tool_two])
+
+    start = time.perf_counter()
+    response = await agent_instance.process_prompt("Use tool two and tool one please")
+    elapsed = time.perf_counter() - start
+
+    assert [tc.tool_name for tc in response.tool_calls] == ["PlaceholderToolTwo", "PlaceholderToolOne"]
+    assert [tc.tool_output for tc in response.tool_calls] == ["two", "one"]
+    assert elapsed < 0.35
+    assert "Used PlaceholderToolTwo. Result: two." in response.response
+    assert "Used PlaceholderToolOne. Result: one." in response.response
+
+
+@pytest.mark.asyncio
+async def test_agent_passes_upstream_output_to_dependent_tool(agent, mock_tools):
+    """A step sequenced with 'then' receives the earlier step's output."""
+    prompt_input = "Run tool one on this, then tool two"
+    steps = agent.plan_tool_calls(prompt_input)
+    assert [s.depends_on for s in steps] == [(), (0,)]
+
+    response = await agent.process_prompt(prompt_input)
+
+    mock_tool_two = next(t for t in mock_tools if t.name == "PlaceholderToolTwo")
+    mock_tool_two.run.assert_called_once_with({
+        "query": prompt_input,
+        "upstream": {"PlaceholderToolOne": "Mocked Result from ToolOne"},
+    })
+    assert len(response.tool_calls) == 2
+
+
+@pytest.mark.asyncio
+async def test_agent_stream_prompt_emits_events_in_order(agent):
+    """stream_prompt yields the same response as process_prompt, preceded by progress events."""
+    prompt_input = "Use placeholder tool one: streaming data"
+    events = [event async for event in agent.stream_prompt(prompt_input)]
+    names = [event["event"] for event in events]
+
+    assert names[0] == "routing"
+    assert events[0]["data"]["steps"] == [{"tool_name": "PlaceholderToolOne", "depends_on": []}]
+    assert names[1:3] == ["tool_call_started", "tool_call_finished"]
+    assert events[2]["data"]["tool_usage"]["tool_output"] == "Mocked Result from ToolOne"
+    assert names[-1] == "final"
 
+    final = AgentResponse.model_validate(events[-1]["data"])
+    expected = await agent.process_prompt(prompt_input)
+    assert final.response == expected.response
+    assert "".join(e["data"]["text"] for e in events if e["event"] == "response_chunk") == final.response
@@ -50,3 +50,70 @@ def test_process_prompt_empty_string():
 
     assert response.status_code == 400
     assert response.json()["detail"] == "Prompt must not be empty and at least 2 characters long."
+
+def test_process_prompt_response_cache_headers():
+    """Repeated prompts are served from the response cache unless the client bypasses it."""
+    payload = {"prompt": "Cache me if you can, agent."}
+    first = client.post("/process_prompt", json=payload, headers={"X-Cache-Bypass": "1"})
+    second = client.post("/process_prompt", json=payload)
+
+    assert first.headers["X-Cache"] == "BYPASS"
+    assert second.headers["X-Cache"] == "HIT"
+    assert first.json() == second.json()
+
+    stats = client.get("/cache/stats").json()
+    assert stats["response_cache"]["hits"] >= 1
+
+def test_process_prompts_batch_reports_per_item_results():
+    """A bad item gets its own error without failing the rest of the batch."""
+    batch = [{"prompt": "Run placeholder tool two now."}, {"prompt": ""}, {"prompt": "Hello there, agent."}]
+    response = client.post("/process_prompts", json=batch)
+
+    assert response.status_code == 200
+    results = response.json()
+    assert [r["index"] for r in results] == [0, 1, 2]
+    assert [r["status_code"] for r in results] == [200, 400, 200]
+    assert results[0]["response"]["tool_calls"][0]["tool_name"] == "PlaceholderToolTwo"
+    assert results[1]["error"] == "Prompt must not be empty and at least 2 characters long."
+    assert "Hello there, agent." in results[2]["response"]["response"]
+
+def test_process_prompts_batch_streams_ndjson():
+    batch = [{"prompt": f"Streaming batch prompt {i}"} for i in range(5)]
+    response = client.post("/process_prompts?stream=true", json=batch)
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("application/x-ndjson")
+    lines = [json.loads(line) for line in response.text.splitlines() if line]
+    assert sorted(item["index"] for item in lines) == list(range(5))
+    assert all(item["status_code"] == 200 for item in lines)
+
+def test_process_prompt_stream_sse_events():
+    """The streaming endpoint emits routing, tool and chunk events before the final response."""
+    response = client.post("/process_prompt/stream", json={"prompt": "Run placeholder tool two now."})
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/event-stream")
+    events = [line[len("event: "):] for line in response.text.splitlines() if line.startswith("event: ")]
+    assert events[0] == "routing"
+    assert events[1:3] == ["tool_call_started", "tool_call_finished"]
+    assert "response_chunk" in events
+    assert events[-1] == "final"
+
+def test_process_prompt_stream_ndjson_final_matches_schema():
+    prompt = "Stream me a fallback answer, agent."
+    response = client.post("/process_prompt/stream?format=ndjson", json={"prompt": prompt})
+
+    events = [json.loads(line) for line in response.text.splitlines() if line]
+    final = AgentResponse.model_validate(events[-1]["data"])
+    chunks = "".join(e["data"]["text"] for e in events if e["event"] == "response_chunk")
+    assert chunks == final.response
+    assert prompt in final.response
+
+def test_process_prompt_stream_rejects_empty_prompt():
+    response = client.post("/process_prompt/stream", json={"prompt": " "})
+    assert response.status_code == 400
+
+def test_request_id_is_echoed_or_generated():
+    response = client.get("/health", headers={"X-Request-ID": "abc-123"})
+    assert response.headers["X-Request-ID"] == "abc-123"
+    assert len(client.get("/health").headers["X-Request-ID"]) == 32
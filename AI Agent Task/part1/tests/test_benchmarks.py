@@ -0,0 +1,28 @@
+
+import pytest
+
+from part1.benchmarks.bench_api import build_workload, find_regressions, parse_mix, prompts_by_category
+
+
+def test_prompt_mix_comes_from_evaluation_cases():
+    groups = prompts_by_category()
+    assert all(groups[category] for category in ("tool_one", "tool_two", "fallback"))
+    assert all("tool one" in p for p in groups["tool_one"])
+
+    workload = build_workload(20, parse_mix("tool_two=1"), seed=1)
+    assert len(workload) == 20
+    assert all("tool two" in p for p in workload)
+    assert len(set(workload)) == 20
+
+
+def test_parse_mix_rejects_unknown_category():
+    with pytest.raises(ValueError):
+        parse_mix("tool_three=1")
+
+
+def test_find_regressions_uses_threshold():
+    baseline = {"requests_per_sec": 100.0, "p95_ms": 10.0, "p99_ms": 20.0}
+    assert find_regressions({"requests_per_sec": 90.0, "p95_ms": 11.0, "p99_ms": 21.0}, baseline, 0.2) == []
+
+    problems = find_regressions({"requests_per_sec": 70.0, "p95_ms": 13.0, "p99_ms": 20.0}, baseline, 0.2)
+    assert len(problems) == 2
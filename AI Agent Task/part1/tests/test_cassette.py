@@ -0,0 +1,140 @@
+
+import os
+import subprocess
+import sys
+
+import pytest
+
+from part1.agent import IntelligentAgent
+from part1.cassette import KIND_TOOL, MODE_RECORD, MODE_REPLAY, MODE_STRICT, Cassette, request_key
+from part1.evaluation.backends import InProcessBackend
+from part1.evaluation.run_evaluation import run_all_evaluations
+from part1.tests.test_llm import FakeLLM
+from part1.tools.base import BaseTool
+
+
+class CountingTool(BaseTool):
+    name = "Counter"
+    description = "Counts its calls."
+    triggers = ("count",)
+
+    def __init__(self, fail: bool = False):
+        self.calls = 0
+        self.fail = fail
+
+    def run(self, tool_input):
+        self.calls += 1
+        if self.fail:
+            raise RuntimeError("backend down")
+        return {"echo": tool_input, "call": self.calls}
+
+
+def make_agent(cassette, tool=None, llm=None):
+    return IntelligentAgent(tools=[tool or CountingTool()], llm=llm, cassette=cassette)
+
+
+async def test_replay_serves_recorded_calls_without_backends(tmp_path):
+    path = str(tmp_path / "agent.cassette")
+    tool, llm = CountingTool(), FakeLLM()
+    recording = Cassette(path, MODE_RECORD)
+    recorded = [await make_agent(recording, tool, llm).process_prompt(p) for p in ("count this", "hello there")]
+    recording.close()
+    assert tool.calls == 1 and len(llm.prompts) == 2
+
+    replay = Cassette(path, MODE_STRICT)
+    replay_tool = CountingTool()
+    agent = make_agent(replay, replay_tool, llm=None)
+    replayed = [await agent.process_prompt(p) for p in ("count this", "hello there")]
+    assert [r.response for r in replayed] == [r.response for r in recorded]
+    assert replayed[0].tool_calls[0].tool_output == recorded[0].tool_calls[0].tool_output
+    assert replay_tool.calls == 0
+    assert replay.stats()["hits"] == 3 and replay.misses == 0
+
+
+async def test_strict_mode_reports_misses_and_replay_mode_falls_through(tmp_path):
+    path = str(tmp_path / "agent.cassette")
+    strict = Cassette(path, MODE_STRICT)
+    response = await make_agent(strict).process_prompt("count that")
+    assert response.tool_calls[0].status == "error"
+    assert "No recording for tool Counter" in response.tool_calls[0].error
+    llm = FakeLLM()
+    response = await make_agent(strict, llm=llm).process_prompt("hello")
+    assert "No recording for llm completion" in response.structured_data["error"] and llm.prompts == []
+    assert strict.misses == 2 and strict.miss_details[0].startswith("tool Counter")
+
+    replay, tool = Cassette(path, MODE_REPLAY), CountingTool()
+    response = await make_agent(replay, tool).process_prompt("count that")
+    assert response.tool_calls[0].status == "ok" and tool.calls == 1 and replay.misses == 1
+
+
+async def test_strict_misses_do_not_open_the_tool_circuit_breaker(tmp_path):
+    strict = Cassette(str(tmp_path / "agent.cassette"), MODE_STRICT)
+    agent = make_agent(strict)
+    prompts = [f"count item {i}" for i in range(agent.tool_guard.failure_threshold * 2)]
+    statuses = [(await agent.process_prompt(p)).tool_calls[0].status for p in prompts]
+    assert statuses == ["error"] * len(prompts)
+    assert strict.misses == len(prompts)
+    assert agent.tool_guard.states() == {"Counter": "closed"}
+
+
+async def test_recorded_errors_are_replayed(tmp_path):
+    path = str(tmp_path / "agent.cassette")
+    recording = Cassette(path, MODE_RECORD)
+    await make_agent(recording, CountingTool(fail=True), FakeLLM(fail=True)).process_prompt("count it")
+    recording.close()
+
+    replay = Cassette(path, MODE_STRICT)
+    response = await make_agent(replay, CountingTool()).process_prompt("count it")
+    assert response.tool_calls[0].status == "error"
+    assert response.tool_calls[0].error == "backend down"
+    assert replay.misses == 0
+
+
+def test_cassette_file_is_content_addressed_and_merged_on_save(tmp_path):
+    path = str(tmp_path / "agent.cassette")
+    first = Cassette(path, MODE_RECORD)
+    for i in range(50):
+        first.record(request_key(KIND_TOOL, "T", i), KIND_TOOL, {"ok": "same output " * 20})
+    first.close()
+    size_with_one_payload = os.path.getsize(path)
+
+    second = Cassette(path, MODE_RECORD)
+    second.record(request_key(KIND_TOOL, "T", "new"), KIND_TOOL, {"ok": "other"})
+    second.close()
+
+    replay = Cassette(path, MODE_STRICT)
+    assert len(replay) == 51
+    assert replay.lookup(request_key(KIND_TOOL, "T", 7)) == {"ok": "same output " * 20}
+    assert replay.lookup(request_key(KIND_TOOL, "T", "new")) == {"ok": "other"}
+    assert replay.lookup(request_key(KIND_TOOL, "T", "missing")) is None
+    # 50 index entries share one payload.
+    assert size_with_one_payload < 50 * 60
+    replay.close()
+
+    (tmp_path / "broken.cassette").write_bytes(b"not a cassette at all, just some bytes here")
+    with pytest.raises(ValueError):
+        Cassette(str(tmp_path / "broken.cassette"), MODE_REPLAY)
+
+
+async def test_strict_misses_fail_the_evaluation_run(tmp_path, capsys):
+    cassette = Cassette(str(tmp_path / "empty.cassette"), MODE_STRICT)
+    backend = InProcessBackend(IntelligentAgent(llm=None, cassette=cassette))
+    all_passed = await run_all_evaluations(concurrency=2, rps=0, backend=backend, cassette=cassette)
+    output = capsys.readouterr().out
+    assert all_passed is False
+    assert "Cassette (strict" in output and "miss: tool PlaceholderTool" in output
+
+
+def test_evaluation_script_exit_status(tmp_path):
+    def run(*args):
+        root = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+        return subprocess.run([sys.executable, "-m", "part1.evaluation.run_evaluation", "--backend", "inprocess",
+                               "--no-store", *args], cwd=root, capture_output=True, text=True, timeout=60)
+
+    strict = run("--cassette-mode", "strict", "--cassette", str(tmp_path / "empty.cassette"))
+    assert strict.returncode == 1 and "misses" in strict.stdout
+
+    (tmp_path / "broken.cassette").write_bytes(b"not a cassette at all, just some bytes here")
+    broken = run("--cassette-mode", "replay", "--cassette", str(tmp_path / "broken.cassette"))
+    assert broken.returncode == 2 and "is not a cassette file" in broken.stdout
+    assert "FastAPI service" not in broken.stdout
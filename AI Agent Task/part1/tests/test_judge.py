@@ -0,0 +1,129 @@
+
+import asyncio
+
+from part1.evaluation.evaluation_cases import get_evaluation_cases
+from part1.evaluation.evaluator import evaluate_case
+from part1.evaluation.judge import (JudgeItem, JudgeRunner, Judge, LLMJudge, LocalJudge, Verdict, VerdictCache,
+                                    evaluate_case_judged, evaluate_many_judged)
+from part1.models import AgentResponse
+from part1.tests.test_llm import FakeLLM
+
+
+class CountingJudge(Judge):
+    version = "counting-1"
+
+    def __init__(self, delay: float = 0.0):
+        self.delay = delay
+        self.batches = []
+        self.running = 0
+        self.max_running = 0
+
+    async def judge_batch(self, items):
+        self.batches.append(list(items))
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        await asyncio.sleep(self.delay)
+        self.running -= 1
+        return [Verdict("PASS", "ok") for _ in items]
+
+
+def item(response: str, criterion: str = "adheres_to_tone", expectation: str = "helpful", prompt: str = "p") -> JudgeItem:
+    return JudgeItem(criterion, expectation, prompt, response)
+
+
+def test_local_judge_rules_are_deterministic():
+    judge = LocalJudge(concise_max_words=5)
+    assert judge.judge(item("Happy to help, here is the answer.", expectation="polite")).status == "PASS"
+    assert judge.judge(item("Here is the answer.", expectation="polite")).status == "FAIL"
+    assert judge.judge(item("What a stupid question.")).status == "FAIL"
+    assert judge.judge(item("THIS IS THE ANSWER YOU WANTED")).status == "FAIL"
+    assert judge.judge(item("one two three", "adheres_to_constraints", "concise")).status == "PASS"
+    assert judge.judge(item("one two three four five six", "adheres_to_constraints", "concise")).status == "FAIL"
+    assert judge.judge(item("x", "adheres_to_constraints", "rhymes")).status == "ERROR"
+    assert judge.judge(item("Cats and dogs live in cities.", "response_quality", "relevant",
+                            prompt="Tell me about cats and cities.")).status == "PASS"
+    assert judge.judge(item("The weather is nice.", "response_quality", "relevant",
+                            prompt="Tell me about cats and cities.")).status == "FAIL"
+
+
+async def test_runner_batches_calls_with_bounded_concurrency():
+    judge = CountingJudge(delay=0.01)
+    runner = JudgeRunner(judge, batch_size=8, max_concurrency=2)
+    verdicts = await runner.judge_many(item(f"response {i}") for i in range(40))
+    assert all(v.status == "PASS" for v in verdicts)
+    assert [len(batch) for batch in judge.batches] == [8] * 5
+    assert judge.max_running == 2
+
+
+async def test_identical_items_are_judged_once():
+    judge = CountingJudge()
+    runner = JudgeRunner(judge)
+    await runner.judge_many([item("same")] * 10)
+    assert sum(len(batch) for batch in judge.batches) == 1
+
+
+async def test_cache_makes_reruns_judge_only_what_changed(tmp_path):
+    path = str(tmp_path / "verdicts.sqlite3")
+    responses = [f"response {i}" for i in range(20)]
+
+    first = JudgeRunner(CountingJudge(), VerdictCache(path))
+    await first.judge_many(item(r) for r in responses)
+    await first.aclose()
+    assert first.stats()["judged"] == 20
+
+    responses[3] = "a changed response"
+    second = JudgeRunner(CountingJudge(), VerdictCache(path))
+    await second.judge_many(item(r) for r in responses)
+    await second.aclose()
+    assert second.stats() == {"cache_hits": 19, "judged": 1, "batches": 1}
+
+    class NewJudge(CountingJudge):
+        version = "counting-2"
+    third = JudgeRunner(NewJudge(), VerdictCache(path))
+    await third.judge_many(item(r) for r in responses)
+    assert third.stats()["judged"] == 20
+
+
+async def test_llm_judge_parses_batched_verdicts_and_does_not_cache_errors():
+    class ScriptedLLM(FakeLLM):
+        reply = ('Sure: [{"id": 1, "verdict": "PASS", "reason": "friendly"}, '
+                 '{"id": 2, "verdict": "fail", "reason": "rude"}]')
+
+        async def generate(self, prompt, system_prompt=None, max_tokens=None):
+            await super().generate(prompt, system_prompt, max_tokens)
+            return self.reply
+
+    llm = ScriptedLLM()
+    cache = VerdictCache(":memory:")
+    runner = JudgeRunner(LLMJudge(llm), cache)
+    verdicts = await runner.judge_many([item("a"), item("b"), item("c")])
+    assert [v.status for v in verdicts] == ["PASS", "FAIL", "ERROR"]
+    assert len(llm.prompts) == 1 and "Item 3" in llm.prompts[0]
+    assert len(cache) == 2
+
+    failing = JudgeRunner(LLMJudge(FakeLLM(fail=True)), VerdictCache(":memory:"))
+    assert (await failing.judge(item("d"))).status == "ERROR"
+    assert len(failing.cache) == 0
+
+
+async def test_judged_criteria_need_a_judge():
+    case = next(c for c in get_evaluation_cases() if c["case_id"] == "typical_factual_1")
+    response = AgentResponse(response="The capital of Canada is Ottawa.")
+
+    unjudged = evaluate_case(case, response)
+    assert unjudged.passed is False
+    assert unjudged.details["criterion_3_adheres_to_tone"]["status"] == "ERROR"
+
+    runner = JudgeRunner(LocalJudge())
+    judged = await evaluate_case_judged(case, response, runner)
+    assert judged.passed is True
+    assert judged.details["criterion_3_adheres_to_tone"]["status"] == "PASS"
+
+
+async def test_evaluate_many_judged_batches_across_cases():
+    cases = [c for c in get_evaluation_cases() if c["case_id"] in ("typical_factual_1", "ambiguous_prompt")]
+    pairs = [(case, AgentResponse(response=f"Ottawa. Animals live in cities. #{i}")) for i in range(10) for case in cases]
+    judge = CountingJudge()
+    results = await evaluate_many_judged(pairs, JudgeRunner(judge, batch_size=64))
+    assert len(judge.batches) == 1 and len(judge.batches[0]) == 20
+    assert all(r.details.get("criterion_3_adheres_to_tone", {"status": "PASS"})["status"] == "PASS" for r in results)
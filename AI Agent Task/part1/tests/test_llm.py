@@ -0,0 +1,216 @@
+
+import asyncio
+
+import httpx
+import pytest
+
+from part1.agent import IntelligentAgent
+from part1.llm import HttpLLMClient, LLMClient, LLMError, MicroBatchingLLMClient, create_llm_client
+from part1.llm.mock_server import create_app
+
+
+class FakeLLM(LLMClient):
+    def __init__(self, fail: bool = False):
+        self.fail = fail
+        self.prompts = []
+
+    async def generate(self, prompt, system_prompt=None, max_tokens=None):
+        self.prompts.append(prompt)
+        if self.fail:
+            raise LLMError("backend down")
+        return f"LLM answer #{len(self.prompts)}"
+
+
+def make_client(handler, **kwargs) -> HttpLLMClient:
+    return HttpLLMClient("http://llm.local", transport=httpx.MockTransport(handler),
+                         backoff_base=0.001, backoff_max=0.01, **kwargs)
+
+
+def completion(text: str) -> httpx.Response:
+    return httpx.Response(200, json={"choices": [{"message": {"role": "assistant", "content": text}}]})
+
+
+async def test_client_against_mock_server():
+    server = create_app(latency_ms=0)
+    client = HttpLLMClient("http://llm.local", transport=httpx.ASGITransport(app=server))
+    try:
+        text = await client.generate("hello there", system_prompt="be brief")
+    finally:
+        await client.aclose()
+    assert text == "Mock LLM response to: hello there"
+
+
+async def test_mock_server_truncates_to_max_tokens():
+    server = create_app(latency_ms=0)
+    client = HttpLLMClient("http://llm.local", transport=httpx.ASGITransport(app=server), max_tokens=3)
+    try:
+        assert await client.generate("one two three four") == "Mock LLM response"
+    finally:
+        await client.aclose()
+
+
+async def test_client_retries_transient_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        if len(calls) < 3:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        return completion("recovered")
+
+    client = make_client(handler, max_retries=2)
+    assert await client.generate("hi") == "recovered"
+    assert len(calls) == 3
+    await client.aclose()
+
+
+async def test_client_gives_up_after_max_retries():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        raise httpx.ConnectError("refused")
+
+    client = make_client(handler, max_retries=1)
+    with pytest.raises(LLMError):
+        await client.generate("hi")
+    assert len(calls) == 2
+
+
+async def test_client_does_not_retry_client_errors():
+    calls = []
+
+    def handler(request):
+        calls.append(request)
+        return httpx.Response(400, json={"error": "bad request"})
+
+    client = make_client(handler, max_retries=3)
+    with pytest.raises(LLMError):
+        await client.generate("hi")
+    assert len(calls) == 1
+
+
+async def test_malformed_replies_raise_llm_error():
+    client = make_client(lambda request: httpx.Response(200, text="<html>gateway</html>"), max_retries=0)
+    with pytest.raises(LLMError, match="invalid JSON"):
+        await client.generate("hi")
+    for body in ({"choices": []}, {"choices": [{"message": {"content": None}}]}, ["not", "a", "dict"]):
+        client = make_client(lambda request, body=body: httpx.Response(200, json=body), max_retries=0)
+        with pytest.raises(LLMError, match="Unexpected LLM response shape"):
+            await client.generate("hi")
+
+    agent = IntelligentAgent(tools=[], llm=make_client(lambda request: httpx.Response(200, text="oops")))
+    response = await agent.process_prompt("Tell me a story about a cat.")
+    assert "simulated LLM response" in response.response
+
+
+async def test_client_reuses_one_pooled_connection_client():
+    client = make_client(lambda request: completion("ok"))
+    await client.generate("a")
+    pooled = client._client
+    await client.generate("b")
+    assert client._client is pooled
+    await client.aclose()
+
+
+async def test_agent_fallback_uses_llm():
+    llm = FakeLLM()
+    agent = IntelligentAgent(tools=[], llm=llm)
+    response = await agent.process_prompt("Tell me a story about a cat.")
+    assert response.response == "LLM answer #1"
+    assert response.tool_calls is None
+    assert llm.prompts == ["Tell me a story about a cat."]
+
+
+async def test_agent_synthesizes_tool_results_with_llm():
+    llm = FakeLLM()
+    agent = IntelligentAgent(llm=llm)
+    response = await agent.process_prompt("use tool one: some data")
+    assert "Used PlaceholderToolOne" in response.response
+    assert response.response.endswith("Based on this: LLM answer #1")
+    assert "PlaceholderToolOne" in llm.prompts[0]
+
+
+async def test_agent_falls_back_to_simulated_response_when_llm_fails():
+    agent = IntelligentAgent(tools=[], llm=FakeLLM(fail=True))
+    response = await agent.process_prompt("Tell me a story about a cat.")
+    assert "simulated LLM response" in response.response
+    assert response.structured_data is None
+
+
+class FakeBatchLLM(LLMClient):
+    supports_batching = True
+
+    def __init__(self):
+        self.batches = []
+
+    async def generate(self, prompt, system_prompt=None, max_tokens=None):
+        raise AssertionError("single calls should be batched")
+
+    async def generate_batch(self, prompts, system_prompt=None, max_tokens=None):
+        self.batches.append(list(prompts))
+        return [LLMError("bad prompt") if p == "bad" else f"answer to {p}" for p in prompts]
+
+
+async def test_concurrent_calls_are_merged_into_one_batch():
+    inner = FakeBatchLLM()
+    client = MicroBatchingLLMClient(inner, window_ms=10)
+    results = await asyncio.gather(*(client.generate(f"q{i}") for i in range(5)))
+
+    assert results == [f"answer to q{i}" for i in range(5)]
+    assert inner.batches == [[f"q{i}" for i in range(5)]]
+
+
+async def test_max_batch_size_splits_batches():
+    inner = FakeBatchLLM()
+    client = MicroBatchingLLMClient(inner, window_ms=10, max_batch_size=2)
+    await asyncio.gather(*(client.generate(f"q{i}") for i in range(5)))
+
+    assert [len(b) for b in inner.batches] == [2, 2, 1]
+
+
+async def test_per_item_error_reaches_only_its_caller():
+    client = MicroBatchingLLMClient(FakeBatchLLM(), window_ms=10)
+    results = await asyncio.gather(client.generate("ok"), client.generate("bad"), return_exceptions=True)
+
+    assert results[0] == "answer to ok"
+    assert isinstance(results[1], LLMError)
+
+
+async def test_micro_batching_against_mock_batch_endpoint():
+    server = create_app(latency_ms=0)
+    inner = HttpLLMClient("http://llm.local", transport=httpx.ASGITransport(app=server), batch_endpoint=True)
+    client = MicroBatchingLLMClient(inner, window_ms=10)
+    try:
+        results = await asyncio.gather(client.generate("one"), client.generate("two"))
+    finally:
+        await client.aclose()
+
+    assert results == ["Mock LLM response to: one", "Mock LLM response to: two"]
+    assert client.batches_sent == 1
+
+
+async def test_micro_batching_needs_a_batch_endpoint(monkeypatch):
+    monkeypatch.setenv("LLM_BASE_URL", "http://llm.local")
+    monkeypatch.setenv("LLM_BATCH_WINDOW_MS", "5")
+    monkeypatch.delenv("LLM_BATCH_ENDPOINT", raising=False)
+    plain = create_llm_client()
+    assert isinstance(plain, HttpLLMClient) and not plain.supports_batching
+
+    monkeypatch.setenv("LLM_BATCH_ENDPOINT", "true")
+    batched = create_llm_client()
+    assert isinstance(batched, MicroBatchingLLMClient) and batched.inner.supports_batching
+
+    # Without the endpoint a batch goes out as single chat completions, never to the batch path.
+    paths = []
+
+    def handler(request):
+        paths.append(request.url.path)
+        return completion("ok")
+
+    client = MicroBatchingLLMClient(make_client(handler), window_ms=10)
+    try:
+        assert await asyncio.gather(client.generate("one"), client.generate("two")) == ["ok", "ok"]
+    finally:
+        await client.aclose()
+    assert paths == ["/v1/chat/completions"] * 2
@@ -0,0 +1,70 @@
+
+import io
+import json
+import logging
+
+import pytest
+
+from part1.structured_logging import (
+    configure_logging, get_logger, logging_stats, request_id_var, shutdown_logging,
+)
+
+
+@pytest.fixture
+def log_stream():
+    stream = io.StringIO()
+    yield stream
+    # Restore the default configuration for the rest of the suite.
+    configure_logging()
+
+
+def read_records(stream):
+    shutdown_logging()
+    return [json.loads(line) for line in stream.getvalue().splitlines()]
+
+
+def test_records_are_json_with_request_id_and_extra_fields(log_stream):
+    configure_logging(level="DEBUG", stream=log_stream)
+    logger = get_logger("tests.logging")
+
+    token = request_id_var.set("req-123")
+    try:
+        logger.info("Handled %s", "prompt", extra={"tool_name": "PlaceholderToolOne"})
+    finally:
+        request_id_var.reset(token)
+
+    [record] = read_records(log_stream)
+    assert record["msg"] == "Handled prompt"
+    assert record["level"] == "INFO"
+    assert record["logger"] == "part1.tests.logging"
+    assert record["request_id"] == "req-123"
+    assert record["tool_name"] == "PlaceholderToolOne"
+
+
+def test_debug_sampling_and_level(log_stream):
+    configure_logging(level="DEBUG", debug_sample_rate=0.0, stream=log_stream)
+    logger = get_logger("tests.logging")
+    for _ in range(20):
+        logger.debug("sampled away")
+    logger.warning("kept")
+
+    assert [r["msg"] for r in read_records(log_stream)] == ["kept"]
+
+
+def test_off_switch_disables_everything(log_stream):
+    configure_logging(enabled=False, stream=log_stream)
+    logger = get_logger("tests.logging")
+
+    assert not logger.isEnabledFor(logging.CRITICAL)
+    logger.error("not written")
+    assert log_stream.getvalue() == ""
+
+
+def test_full_queue_drops_instead_of_blocking(log_stream):
+    configure_logging(level="INFO", queue_size=1, stream=log_stream)
+    shutdown_logging()  # stop the writer so the queue stays full
+    logger = get_logger("tests.logging")
+    for _ in range(5):
+        logger.info("burst")
+
+    assert logging_stats()["dropped"] >= 4
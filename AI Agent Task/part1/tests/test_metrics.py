@@ -0,0 +1,123 @@
+
+import json
+import os
+
+from fastapi.testclient import TestClient
+
+from part1.main import app
+from part1.metrics import (
+    MetricsObserver, MetricsRegistry, MultiprocessExporter, clear_multiprocess_dir, merge_snapshots,
+    render_prometheus, tool_call_duration_seconds, tool_errors_total,
+)
+
+client = TestClient(app)
+
+
+def test_histogram_renders_cumulative_buckets():
+    registry = MetricsRegistry()
+    histogram = registry.histogram("latency_seconds", "Latency.", ("tool",), buckets=(0.1, 1.0))
+    for value in (0.05, 0.5, 5.0):
+        histogram.labels("ToolA").observe(value)
+
+    text = render_prometheus(registry.snapshot())
+
+    assert "# TYPE latency_seconds histogram" in text
+    assert 'latency_seconds_bucket{tool="ToolA",le="0.1"} 1' in text
+    assert 'latency_seconds_bucket{tool="ToolA",le="1"} 2' in text
+    assert 'latency_seconds_bucket{tool="ToolA",le="+Inf"} 3' in text
+    assert 'latency_seconds_count{tool="ToolA"} 3' in text
+    assert 'latency_seconds_sum{tool="ToolA"} 5.55' in text
+
+
+def test_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("calls_total", "Calls.", ("tool",)).labels('a"b\\c').inc()
+    assert 'calls_total{tool="a\\"b\\\\c"} 1' in render_prometheus(registry.snapshot())
+
+
+def test_newlines_in_label_values_are_escaped():
+    registry = MetricsRegistry()
+    registry.counter("calls_total", "Calls.", ("tool",)).labels("line one\nline two").inc()
+    assert 'calls_total{tool="line one\\nline two"} 1' in render_prometheus(registry.snapshot())
+
+
+def test_merge_sums_counters_but_drops_gauges_of_dead_workers():
+    def worker_snapshot(calls, in_flight):
+        registry = MetricsRegistry()
+        registry.counter("calls_total", "Calls.").labels().inc(calls)
+        registry.gauge("in_flight", "In flight.").labels().set(in_flight)
+        registry.histogram("latency", "Latency.", buckets=(1.0,)).labels().observe(0.5)
+        return registry.snapshot()
+
+    merged = merge_snapshots([(worker_snapshot(3, 2), True), (worker_snapshot(4, 5), False)])
+
+    assert merged["calls_total"]["samples"] == [[[], 7.0]]
+    assert merged["in_flight"]["samples"] == [[[], 2.0]]
+    assert merged["latency"]["samples"][0][1]["counts"] == [2, 0]
+
+
+def test_multiprocess_exporter_merges_worker_files(tmp_path):
+    registry = MetricsRegistry()
+    registry.counter("calls_total", "Calls.").labels().inc(2)
+    # A worker that has already exited (pid that can't exist) left its counts behind.
+    other = MetricsRegistry()
+    other.counter("calls_total", "Calls.").labels().inc(5)
+    (tmp_path / "metrics-999999999.json").write_text(json.dumps(other.snapshot()))
+
+    exporter = MultiprocessExporter(registry, str(tmp_path))
+    merged = exporter.collect()
+
+    assert os.path.exists(exporter.path)
+    assert merged["calls_total"]["samples"] == [[[], 7.0]]
+
+
+def test_dead_workers_are_archived_and_pid_reuse_keeps_their_counts(tmp_path):
+    def worker_file(name, calls, in_flight):
+        registry = MetricsRegistry()
+        registry.counter("calls_total", "Calls.").labels().inc(calls)
+        registry.gauge("in_flight", "In flight.").labels().set(in_flight)
+        (tmp_path / name).write_text(json.dumps(registry.snapshot()))
+
+    worker_file("metrics-999999999-1.json", 5, 3)
+    # An earlier worker with this process's PID: PID reuse gives it a file of its own.
+    worker_file(f"metrics-{os.getpid()}-1.json", 4, 3)
+    registry = MetricsRegistry()
+    registry.counter("calls_total", "Calls.").labels().inc(2)
+    registry.gauge("in_flight", "In flight.").labels().set(1)
+    exporter = MultiprocessExporter(registry, str(tmp_path))
+
+    for _ in range(2):
+        merged = exporter.collect()
+        assert merged["calls_total"]["samples"] == [[[], 11.0]]
+        assert merged["in_flight"]["samples"] == [[[], 1.0]]
+    assert sorted(p.name for p in tmp_path.glob("*.json")) == ["archived.json", os.path.basename(exporter.path)]
+
+    clear_multiprocess_dir(str(tmp_path))
+    assert list(tmp_path.glob("*.json")) == []
+
+
+def test_observer_records_tool_latency_and_errors():
+    observer = MetricsObserver()
+    before = tool_errors_total.labels("MetricsTestTool").value()
+    observer.on_tool_call("MetricsTestTool", 0.02, None)
+    observer.on_tool_call("MetricsTestTool", 0.03, RuntimeError("boom"))
+
+    assert tool_errors_total.labels("MetricsTestTool").value() == before + 1
+    assert sum(tool_call_duration_seconds.labels("MetricsTestTool").value()["counts"]) >= 2
+
+
+def test_metrics_endpoint_reports_requests_and_tools():
+    client.post("/process_prompt", json={"prompt": "Use tool one for metrics"}, headers={"X-Cache-Bypass": "1"})
+    client.get("/no/such/path")
+
+    response = client.get("/metrics")
+
+    assert response.status_code == 200
+    assert response.headers["content-type"].startswith("text/plain; version=0.0.4")
+    text = response.text
+    assert 'agent_http_requests_total{method="POST",endpoint="/process_prompt",status="200"}' in text
+    assert 'endpoint="other"' in text
+    assert 'agent_tool_call_duration_seconds_count{tool="PlaceholderToolOne"}' in text
+    assert 'agent_stage_duration_seconds_bucket{stage="routing"' in text
+    assert 'agent_cache_entries{cache="response"}' in text
+    assert "agent_log_queue_depth" in text
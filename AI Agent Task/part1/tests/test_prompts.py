@@ -0,0 +1,40 @@
+
+from part1.agent import IntelligentAgent
+from part1.benchmarks.bench_routing import make_synthetic_tools
+from part1.prompts import SYSTEM_PROMPT, build_prompt_bundle
+from part1.tools import AVAILABLE_TOOLS
+from part1.tools.base import BaseTool
+
+
+def test_system_prompt_lists_registered_tools():
+    for tool in AVAILABLE_TOOLS:
+        assert f"- {tool.name}: {tool.description}" in SYSTEM_PROMPT
+    assert "[Describe Tool 1 Name]" not in SYSTEM_PROMPT
+    assert "'placeholder tool one'" in SYSTEM_PROMPT
+
+
+def test_bundle_is_shared_and_independent_of_tool_order():
+    tools = make_synthetic_tools(5)
+    first = build_prompt_bundle(tools)
+    second = build_prompt_bundle(list(reversed(tools)))
+    assert second is first
+    assert len(first.content_hash) == 64
+
+
+def test_bundle_is_rerendered_when_tool_metadata_changes():
+    tools = make_synthetic_tools(3)
+    before = build_prompt_bundle(tools)
+    extra = type("ExtraTool", (BaseTool,), {"name": "ExtraTool", "description": "Does extra things."})()
+    after = build_prompt_bundle(tools + [extra])
+    assert after.content_hash != before.content_hash
+    assert "- ExtraTool: Does extra things." in after.text
+
+
+def test_agent_prompt_follows_its_tools_unless_overridden():
+    tools = make_synthetic_tools(3)
+    agent = IntelligentAgent(tools=tools)
+    assert agent.prompt_bundle is build_prompt_bundle(tools)
+    assert agent.system_prompt == agent.prompt_bundle.text
+    assert "SyntheticTool0" in agent.system_prompt
+
+    assert IntelligentAgent(system_prompt="Custom prompt", tools=tools).system_prompt == "Custom prompt"
@@ -0,0 +1,99 @@
+
+import asyncio
+import os
+import subprocess
+import sys
+import time
+
+from fastapi.testclient import TestClient
+
+from part1.main import app, get_agent
+from part1.tools.base import BaseTool
+from part1.tools.registry import WARMUP_FAILED, WARMUP_OK, WARMUP_TIMEOUT, ToolRegistry, parse_tool_config
+
+REPO_ROOT = os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+
+class SlowTool(BaseTool):
+    name = "SlowTool"
+    description = "Takes a while to construct."
+    created = 0
+
+    def __init__(self):
+        time.sleep(0.2)
+        type(self).created += 1
+
+    def run(self, tool_input):
+        return "slow"
+
+
+def make_tool(tool_name, warmup=None):
+    attrs = {"name": tool_name, "description": "Test tool.", "run": lambda self, tool_input: tool_name}
+    if warmup is not None:
+        attrs["warmup"] = warmup
+    return type(tool_name, (BaseTool,), attrs)
+
+
+def test_parse_tool_config():
+    assert parse_tool_config(" A, B=pkg.mod:Cls ,,") == {"A": None, "B": "pkg.mod:Cls"}
+
+
+def test_tools_are_instantiated_on_first_use_only():
+    calls = []
+    registry = ToolRegistry({"A": lambda: calls.append("A") or "tool-a", "B": lambda: calls.append("B") or "tool-b"})
+
+    assert registry.names() == ["A", "B"]
+    assert calls == []
+    assert registry.get("A") is registry.get("A")
+    assert calls == ["A"]
+    assert registry.get("missing") is None
+
+
+def test_enabled_list_selects_and_adds_tools():
+    registry = ToolRegistry(enabled="PlaceholderToolTwo,Slow=part1.tests.test_registry:SlowTool,Unknown",
+                            entry_point_group=None)
+    assert registry.names() == ["PlaceholderToolTwo", "Slow"]
+    assert registry.get("PlaceholderToolTwo").name == "PlaceholderToolTwo"
+
+
+def test_importing_the_app_imports_no_tools():
+    code = ("import sys, part1.main; "
+            "assert not {'part1.tools.tool_one', 'part1.tools.tool_two'} & set(sys.modules), sorted(sys.modules)")
+    subprocess.run([sys.executable, "-c", code], check=True, cwd=REPO_ROOT, capture_output=True)
+
+
+async def test_load_all_instantiates_in_parallel():
+    SlowTool.created = 0
+    registry = ToolRegistry({"S1": SlowTool, "S2": SlowTool, "S3": SlowTool})
+    start = time.perf_counter()
+    tools = await registry.load_all()
+
+    assert time.perf_counter() - start < 0.5
+    assert len(tools) == 3 and SlowTool.created == 3
+
+
+async def test_warmup_reports_each_tool():
+    async def ok(self):
+        await asyncio.sleep(0)
+
+    async def hang(self):
+        await asyncio.sleep(10)
+
+    def broken(self):
+        raise RuntimeError("no connection")
+
+    registry = ToolRegistry({"Ok": make_tool("Ok", ok), "Hang": make_tool("Hang", hang),
+                             "Broken": make_tool("Broken", broken), "Plain": make_tool("Plain")},
+                            warmup_timeout=0.05)
+    await registry.load_all()
+    assert await registry.warmup() == {"Ok": WARMUP_OK, "Hang": WARMUP_TIMEOUT, "Broken": WARMUP_FAILED, "Plain": WARMUP_OK}
+
+
+def test_ready_after_lifespan_startup():
+    with TestClient(app) as client:
+        response = client.get("/ready")
+        assert response.status_code == 200
+        assert response.json()["status"] == "ready"
+        assert set(response.json()["loaded"]) == {"PlaceholderToolOne", "PlaceholderToolTwo"}
+        assert response.json()["config_hash"] == get_agent().config_hash
+        assert client.get("/health").json() == {"status": "ok"}
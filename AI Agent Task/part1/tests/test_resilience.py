@@ -0,0 +1,134 @@
+
+import asyncio
+import time
+
+import pytest
+
+from part1.agent import IntelligentAgent
+from part1.tools.base import BaseTool
+from part1.tools.resilience import CLOSED, HALF_OPEN, OPEN, CircuitBreaker, CircuitOpen, ToolGuard
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class FlakyTool(BaseTool):
+    name = "PlaceholderToolOne"
+    description = "Fails while `failing` is set."
+
+    def __init__(self):
+        self.failing = True
+        self.calls = 0
+
+    async def arun(self, tool_input):
+        self.calls += 1
+        if self.failing:
+            raise RuntimeError("backend down")
+        return "fresh result"
+
+
+class HangingTool(BaseTool):
+    name = "PlaceholderToolTwo"
+    description = "Never answers in time."
+    timeout_seconds = 0.05
+
+    async def arun(self, tool_input):
+        await asyncio.sleep(10)
+
+
+def test_breaker_opens_then_half_open_probe_closes_it():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=2, reset_timeout=10, clock=clock)
+    breaker.record_failure()
+    assert breaker.state == CLOSED
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.allow() is False
+
+    clock.now = 10
+    assert breaker.allow() is True
+    assert breaker.state == HALF_OPEN
+    # Only one probe at a time.
+    assert breaker.allow() is False
+    breaker.record_success()
+    assert breaker.state == CLOSED
+
+
+def test_failed_probe_reopens_breaker():
+    clock = FakeClock()
+    breaker = CircuitBreaker(failure_threshold=1, reset_timeout=5, clock=clock)
+    breaker.record_failure()
+    clock.now = 5
+    assert breaker.allow() is True
+    breaker.record_failure()
+    assert breaker.state == OPEN
+    assert breaker.retry_in() == 5
+
+
+async def test_hanging_tool_is_cut_off_at_its_deadline():
+    agent = IntelligentAgent(tools=[HangingTool()])
+    start = time.perf_counter()
+    response = await agent.process_prompt("run tool two please")
+    elapsed = time.perf_counter() - start
+
+    assert elapsed < 1
+    assert response.tool_calls[0].status == "timeout"
+    assert "Information from PlaceholderToolTwo was unavailable (timed out after 0.05s)" in response.response
+    assert response.structured_data == {"degraded": True, "unavailable_tools": ["PlaceholderToolTwo"]}
+
+
+async def test_open_circuit_skips_tool_until_probe_succeeds():
+    clock = FakeClock()
+    tool = FlakyTool()
+    agent = IntelligentAgent(tools=[tool], tool_guard=ToolGuard(failure_threshold=2, reset_timeout=30, clock=clock))
+
+    for _ in range(2):
+        response = await agent.process_prompt("use tool one: x")
+        assert response.tool_calls[0].status == "error"
+    response = await agent.process_prompt("use tool one: x")
+    assert response.tool_calls[0].status == "circuit_open"
+    assert tool.calls == 2
+
+    tool.failing = False
+    clock.now = 30
+    response = await agent.process_prompt("use tool one: x")
+    assert response.tool_calls[0].status == "ok"
+    assert response.structured_data is None
+    assert agent.tool_guard.states() == {"PlaceholderToolOne": CLOSED}
+
+
+async def test_guard_raises_circuit_open_without_calling():
+    guard = ToolGuard(failure_threshold=1, reset_timeout=60)
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await guard.call("T", object(), fail)
+    with pytest.raises(CircuitOpen):
+        await guard.call("T", object(), fail)
+
+
+async def test_dependent_step_runs_without_failed_upstream():
+    tool = FlakyTool()
+    seen = []
+
+    class RecordingTwo(BaseTool):
+        name = "PlaceholderToolTwo"
+        description = "Records its input."
+
+        async def arun(self, tool_input):
+            seen.append(tool_input)
+            return "two"
+
+    agent = IntelligentAgent(tools=[tool, RecordingTwo()])
+    response = await agent.process_prompt("use tool one: x then tool two")
+
+    assert [u.status for u in response.tool_calls] == ["error", "ok"]
+    assert "upstream" not in seen[0]
+    assert "Based on this:" in response.response
@@ -0,0 +1,89 @@
+
+import asyncio
+
+import pytest
+
+from part1.response_cache import (
+    CACHE_BYPASS, CACHE_COALESCED, CACHE_HIT, CACHE_MISS, ResponseCache, make_cache_key,
+)
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+def test_cache_key_normalizes_whitespace_and_includes_config():
+    assert make_cache_key("  hello   world ", "cfg") == make_cache_key("hello world", "cfg")
+    assert make_cache_key("hello world", "cfg") != make_cache_key("hello world", "other")
+
+
+@pytest.mark.asyncio
+async def test_concurrent_identical_requests_share_one_computation():
+    cache = ResponseCache(ttl_seconds=60, max_entries=10)
+    calls = 0
+
+    async def compute():
+        nonlocal calls
+        calls += 1
+        await asyncio.sleep(0.05)
+        return {"answer": 42}
+
+    results = await asyncio.gather(*(cache.get_or_compute("k", compute) for _ in range(5)))
+
+    assert calls == 1
+    assert all(value == {"answer": 42} for value, _ in results)
+    assert sorted(status for _, status in results) == [CACHE_COALESCED] * 4 + [CACHE_MISS]
+
+    value, status = await cache.get_or_compute("k", compute)
+    assert (value, status, calls) == ({"answer": 42}, CACHE_HIT, 1)
+    assert cache.stats()["coalesced"] == 4
+
+
+@pytest.mark.asyncio
+async def test_entries_expire_and_lru_evicts():
+    clock = FakeClock()
+    cache = ResponseCache(ttl_seconds=10, max_entries=2, clock=clock)
+
+    async def compute_value(value):
+        return value
+
+    for key in ("a", "b", "c"):
+        await cache.get_or_compute(key, lambda key=key: compute_value(key))
+    assert cache.get("a") is None
+    assert cache.stats()["evictions"] == 1
+
+    clock.now = 11
+    assert cache.get("c") is None
+
+
+@pytest.mark.asyncio
+async def test_bypass_and_uncacheable_results():
+    cache = ResponseCache(ttl_seconds=60, max_entries=10)
+
+    async def compute():
+        return "error"
+
+    _, status = await cache.get_or_compute("k", compute, cacheable=lambda v: v != "error")
+    assert status == CACHE_MISS
+    assert cache.get("k") is None
+
+    _, status = await cache.get_or_compute("k", compute, bypass=True)
+    assert status == CACHE_BYPASS
+    assert cache.get("k") == "error"
+
+
+@pytest.mark.asyncio
+async def test_failed_computation_is_not_cached():
+    cache = ResponseCache(ttl_seconds=60, max_entries=10)
+
+    async def boom():
+        raise RuntimeError("boom")
+
+    with pytest.raises(RuntimeError):
+        await cache.get_or_compute("k", boom)
+    assert cache.stats()["in_flight"] == 0
+    assert cache.get("k") is None
@@ -0,0 +1,57 @@
+
+from part1.benchmarks.bench_routing import make_synthetic_tools
+from part1.routing import ToolRouter, compile_triggers
+from part1.tools import TOOL_MAP, PlaceholderToolOne, PlaceholderToolTwo
+
+
+def test_router_prefers_longest_trigger_and_ignores_case():
+    router = ToolRouter([PlaceholderToolOne(), PlaceholderToolTwo()])
+    matches = router.route("Please use PLACEHOLDER  Tool One on this")
+
+    assert [(m.tool_name, m.trigger) for m in matches] == [("PlaceholderToolOne", "placeholder tool one")]
+
+
+def test_router_returns_each_tool_once_in_prompt_order():
+    router = ToolRouter([PlaceholderToolOne(), PlaceholderToolTwo()])
+    matches = router.route("tool two first, then tool one, then tool two again")
+
+    assert [m.tool_name for m in matches] == ["PlaceholderToolTwo", "PlaceholderToolOne"]
+
+
+def test_router_requires_word_boundaries():
+    router = ToolRouter([PlaceholderToolOne()])
+    assert router.route("the multitool oneliner") == []
+    assert router.route("tool ones") == []
+
+
+def test_router_borrows_triggers_for_undeclared_tools(mocker):
+    stand_in = mocker.MagicMock()
+    stand_in.name = "PlaceholderToolOne"
+    router = ToolRouter([stand_in], fallback=TOOL_MAP)
+
+    match = router.route("placeholder tool one: Important Data")[0]
+    assert router.build_input(match, "placeholder tool one: Important Data") == "Important Data"
+
+
+def test_tool_one_input_extraction():
+    tool = PlaceholderToolOne()
+    router = ToolRouter([tool])
+
+    def input_for(prompt):
+        return router.build_input(router.route(prompt)[0], prompt)
+
+    assert input_for("use tool one: Important Data") == "Important Data"
+    assert input_for("Process the text 'sample data' using placeholder tool one.") == "sample data"
+    assert input_for("Don't stop, run tool one on everything") == "Don't stop, run  on everything"
+
+
+def test_router_scales_to_many_tools():
+    router = ToolRouter(make_synthetic_tools(1000))
+    matches = router.route("first lookup widget 997 then synthetic tool 7")
+
+    assert [m.tool_name for m in matches] == ["SyntheticTool997", "SyntheticTool7"]
+
+
+def test_compile_triggers_empty():
+    assert compile_triggers([]) is None
+    assert ToolRouter([]).route("tool one") == []
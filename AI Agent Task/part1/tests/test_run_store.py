@@ -0,0 +1,151 @@
+
+import pytest
+
+from part1.evaluation.backends import InProcessBackend
+from part1.evaluation.evaluator import EvaluationResult
+from part1.evaluation.run_evaluation import run_all_evaluations
+from part1.evaluation.run_store import CompareThresholds, RunStore, RunStoreError, compare_runs, main
+from part1.models import ToolUsage
+
+
+def record_run(store, cases, label=None):
+    """cases: (case_id, passed, latency_ms, tool_ms or None) tuples."""
+    recorder = store.start_run(label, "test", "test target", config_hash="abc")
+    for case_id, passed, latency_ms, tool_ms in cases:
+        status = "PASS" if passed else "FAIL"
+        result = EvaluationResult(case_id, "p", passed, {"Criterion 1 (tool_used)": {"status": status, "message": "m"}})
+        tools = [] if tool_ms is None else [ToolUsage(tool_name="Slow", tool_input="", tool_output="", duration_ms=tool_ms)]
+        recorder.add(result, latency_ms / 1000, True, tools)
+    recorder.finish({"p50": 0.0, "p90": 0.0, "p99": 0.0, "throughput": 1.0})
+    return recorder.run_id
+
+
+@pytest.fixture
+def store(tmp_path):
+    with RunStore(str(tmp_path / "runs.sqlite3")) as store:
+        yield store
+
+
+def test_compare_reports_new_failures_and_slowdowns(store):
+    base = record_run(store, [(f"c{i}", True, 10.0, 5.0) for i in range(10)])
+    head = record_run(store, [("c0", False, 10.0, 5.0)] + [(f"c{i}", True, 20.0, 12.0) for i in range(1, 10)])
+
+    comparison = compare_runs(store, base, head)
+    assert [case_id for case_id, _ in comparison.newly_failing] == ["c0"]
+    assert comparison.latency["p50"] == (10.0, 20.0)
+    assert comparison.tools["Slow"]["p50"] == (5.0, 12.0)
+    assert not comparison.passed
+    assert len(comparison.violations) == 4  # failure, p50, p90, tool p50
+
+    assert compare_runs(store, base, base).passed
+    lenient = CompareThresholds(max_new_failures=1, max_latency_increase=1.5, max_tool_increase=2.0)
+    assert compare_runs(store, base, head, lenient).passed
+
+
+def test_small_absolute_latency_changes_are_ignored(store):
+    base = record_run(store, [("c0", True, 0.2, 0.1)])
+    head = record_run(store, [("c0", True, 0.6, 0.3)])
+    assert compare_runs(store, base, head).passed
+
+
+def test_recorded_cases_replace_earlier_rows_and_summary_counts_them(store):
+    recorder = store.start_run()
+    recorder.add(EvaluationResult("c0", "p", False, {}), 0.01, False)
+    recorder.flush()
+    recorder.add(EvaluationResult("c0", "p", True, {}), 0.02, True)
+    recorder.finish({"p50": 0.02})
+    run = store.run(recorder.run_id)
+    assert (run["total"], run["passed"], run["api_errors"]) == (1, 1, 0)
+
+
+def test_resolve_run_references(store):
+    first = record_run(store, [("c0", True, 1.0, None)])
+    second = record_run(store, [("c0", True, 1.0, None)], label="main")
+    assert store.resolve("latest") == second
+    assert store.resolve("previous") == first
+    assert store.resolve(str(first)) == first
+    assert [run["run_id"] for run in store.runs(label="main")] == [second]
+    with pytest.raises(RunStoreError):
+        store.resolve("999")
+    with pytest.raises(RunStoreError):
+        store.resolve("yesterday")
+
+
+def test_percentile_queries_use_the_indexes(store):
+    plans = [
+        " ".join(row[3] for row in store.connection.execute(f"EXPLAIN QUERY PLAN {query}", params))
+        for query, params in [
+            ("SELECT latency_ms FROM case_results WHERE run_id = ? ORDER BY latency_ms LIMIT 1 OFFSET 3", (1,)),
+            ("SELECT duration_ms FROM tool_calls WHERE run_id = ? AND tool_name = ? ORDER BY duration_ms", (1, "Slow")),
+        ]
+    ]
+    assert "idx_case_results_latency" in plans[0] and "TEMP B-TREE" not in plans[0]
+    assert "idx_tool_calls_timing" in plans[1] and "TEMP B-TREE" not in plans[1]
+
+
+def test_compare_command_exit_codes(tmp_path, capsys):
+    path = str(tmp_path / "runs.sqlite3")
+    with RunStore(path) as store:
+        record_run(store, [("c0", True, 10.0, None)])
+        record_run(store, [("c0", False, 10.0, None)])
+    assert main(["--db", path, "compare", "latest", "latest"]) == 0
+    assert main(["--db", path, "compare", "previous", "latest"]) == 1
+    assert "Newly failing cases: 1" in capsys.readouterr().out
+    assert main(["--db", path, "compare", "1", "7"]) == 2
+    assert main(["--db", str(tmp_path / "missing.sqlite3"), "list"]) == 2
+
+
+@pytest.mark.asyncio
+async def test_run_all_evaluations_records_the_run(tmp_path, capsys):
+    with RunStore(str(tmp_path / "runs.sqlite3")) as store:
+        backend = InProcessBackend()
+        await run_all_evaluations(concurrency=2, rps=0, backend=backend, store=store, label="ci")
+        run = store.runs()[0]
+        assert run["label"] == "ci"
+        assert run["config_hash"] == backend.agent.config_hash
+        assert run["total"] == 6
+        timings = store.tool_timings(run["run_id"])
+        assert timings["PlaceholderToolOne"]["calls"] >= 1
+        assert f"Recorded as run {run['run_id']}" in capsys.readouterr().out
+
+
+class Interrupted(BaseException):
+    """Stands in for Ctrl+C partway through a run."""
+
+
+class InterruptingBackend(InProcessBackend):
+    def __init__(self, after: int):
+        super().__init__()
+        self.after = after
+        self.calls = 0
+
+    async def process(self, prompt):
+        self.calls += 1
+        if self.calls > self.after:
+            raise Interrupted()
+        return await super().process(prompt)
+
+
+@pytest.mark.asyncio
+async def test_interrupted_run_is_hidden_and_resume_completes_it(tmp_path, capsys):
+    output_path = str(tmp_path / "results.jsonl")
+    with RunStore(str(tmp_path / "runs.sqlite3")) as store:
+        finished = record_run(store, [("c0", True, 1.0, None)])
+        with pytest.raises(Interrupted):
+            await run_all_evaluations(concurrency=1, rps=0, backend=InterruptingBackend(after=3), store=store,
+                                      output_path=output_path)
+        interrupted = store.connection.execute("SELECT MAX(run_id) FROM runs").fetchone()[0]
+        # The cases that finished were kept, but the run isn't "latest" until it is complete.
+        assert store.run(interrupted)["finished_at"] is None
+        assert store.connection.execute(
+            "SELECT COUNT(*) FROM case_results WHERE run_id = ?", (interrupted,)).fetchone()[0] == 3
+        assert store.resolve("latest") == finished
+        assert [run["run_id"] for run in store.runs()] == [finished]
+
+        await run_all_evaluations(concurrency=1, rps=0, backend=InProcessBackend(), store=store,
+                                  output_path=output_path, resume=True)
+        assert "Skipped (already done): 3" in capsys.readouterr().out
+        assert store.resolve("latest") == interrupted
+        run = store.run(interrupted)
+        assert run["total"] == 6 and run["finished_at"] is not None
+        assert run["p50_ms"] == store.latency_percentiles(interrupted)[50]
@@ -0,0 +1,80 @@
+
+import json
+
+from fastapi.testclient import TestClient
+
+from part1 import serialization
+from part1.main import app
+from part1.models import AgentResponse, BatchItemResult, ToolUsage
+
+client = TestClient(app)
+
+
+def make_response() -> AgentResponse:
+    return AgentResponse(
+        response="Based on this: done",
+        structured_data={"degraded": True, "unavailable_tools": ["PlaceholderToolTwo"]},
+        tool_calls=[ToolUsage(tool_name="PlaceholderToolOne", tool_input="x", tool_output={"rows": [1, 2, 3]})],
+    )
+
+
+def test_dumps_json_matches_pydantic_encoding():
+    response = make_response()
+    assert json.loads(serialization.dumps_json(response)) == json.loads(response.model_dump_json())
+
+    batch = [BatchItemResult(index=0, status_code=200, response=response)]
+    assert json.loads(serialization.dumps_json(batch)) == [json.loads(batch[0].model_dump_json())]
+
+
+def test_dumps_json_without_orjson(monkeypatch):
+    monkeypatch.setattr(serialization, "orjson", None)
+    response = make_response()
+    assert json.loads(serialization.dumps_json(response)) == json.loads(response.model_dump_json())
+
+
+def test_unknown_tool_output_types_fall_back_to_str():
+    class Opaque:
+        def __str__(self):
+            return "opaque"
+
+    usage = ToolUsage(tool_name="T", tool_input=("a", "b"), tool_output=Opaque())
+    assert json.loads(serialization.dumps_json(usage))["tool_output"] == "opaque"
+    assert json.loads(serialization.dumps_json(usage))["tool_input"] == ["a", "b"]
+
+
+def test_media_type_negotiation(monkeypatch):
+    monkeypatch.setattr(serialization, "MSGPACK_AVAILABLE", True)
+    assert serialization.negotiate_media_type(None) == "application/json"
+    assert serialization.negotiate_media_type("application/msgpack") == "application/msgpack"
+    assert serialization.negotiate_media_type("application/json, application/x-msgpack;q=0.5") == "application/json"
+    assert serialization.negotiate_media_type("application/json;q=0.5, application/x-msgpack") == "application/msgpack"
+
+    monkeypatch.setattr(serialization, "MSGPACK_AVAILABLE", False)
+    assert serialization.negotiate_media_type("application/msgpack") == "application/json"
+
+
+def test_encoding_negotiation(monkeypatch):
+    monkeypatch.setattr(serialization, "ZSTD_AVAILABLE", False)
+    assert serialization.negotiate_encoding("zstd, gzip") == "gzip"
+    assert serialization.negotiate_encoding("gzip;q=0, br") is None
+    assert serialization.negotiate_encoding(None) is None
+
+    monkeypatch.setattr(serialization, "ZSTD_AVAILABLE", True)
+    assert serialization.negotiate_encoding("gzip;q=0.8, zstd") == "zstd"
+
+
+def test_large_responses_are_compressed(monkeypatch):
+    monkeypatch.setattr(serialization, "COMPRESS_MIN_BYTES", 0)
+    response = client.post("/process_prompt", json={"prompt": "use tool one: compress me"},
+                           headers={"Accept-Encoding": "gzip", "X-Cache-Bypass": "1"})
+
+    assert response.status_code == 200
+    assert response.headers["content-encoding"] == "gzip"
+    assert response.headers["x-cache"] == "BYPASS"
+    AgentResponse.model_validate(response.json())
+
+
+def test_small_responses_are_not_compressed():
+    response = client.post("/process_prompt", json={"prompt": "hello there"}, headers={"Accept-Encoding": "gzip"})
+    assert "content-encoding" not in response.headers
+    assert response.headers["content-type"] == "application/json"
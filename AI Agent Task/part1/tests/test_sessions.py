@@ -0,0 +1,85 @@
+
+from fastapi.testclient import TestClient
+
+from part1 import main
+from part1.main import app
+from part1.agent import IntelligentAgent
+from part1.models import AgentResponse, ToolUsage
+from part1.sessions import DiskSessionStore, InMemorySessionStore, Session, SessionManager, ToolRecord, Turn
+from part1.tests.test_llm import FakeLLM
+
+client = TestClient(app)
+
+
+def test_session_trims_oldest_turns_into_summary():
+    session = Session("s")
+    for i in range(20):
+        session.add_turn(Turn(f"question {i} " + "x" * 200, f"answer {i} " + "y" * 200), max_tokens=500, summary_tokens=100)
+
+    assert session.tokens <= 500
+    assert session.turns[-1].prompt.startswith("question 19")
+    assert session.summary and session.summary_tokens <= 100
+    context = session.context()
+    assert context.startswith("Earlier in this conversation:")
+    assert "question 0 " not in context
+
+
+def test_tool_names_are_interned():
+    name = "".join(["Placeholder", "ToolOne"])
+    assert ToolRecord(name, "ok").name is ToolRecord("PlaceholderToolOne", "ok").name
+
+
+def test_memory_store_evicts_least_recently_used():
+    store = InMemorySessionStore(max_sessions=2)
+    for session_id in ("a", "b"):
+        store.put(Session(session_id))
+    store.get("a")
+    store.put(Session("c"))
+
+    assert store.get("b") is None
+    assert store.get("a") is not None and store.evictions == 1
+
+
+def test_memory_store_enforces_byte_cap():
+    store = InMemorySessionStore(max_bytes=6000)
+    for i in range(10):
+        session = Session(f"s{i}")
+        session.add_turn(Turn("p" * 1000, "r" * 1000))
+        store.put(session)
+
+    assert store.total_bytes <= 6000
+    assert store.stats()["sessions"] == 2
+
+
+async def test_disk_store_round_trip(tmp_path):
+    manager = SessionManager(DiskSessionStore(str(tmp_path)))
+    response = AgentResponse(response="done", tool_calls=[
+        ToolUsage(tool_name="PlaceholderToolOne", tool_input="x", tool_output="y")])
+    await manager.record("chat-1", "use tool one", response)
+
+    reloaded = SessionManager(DiskSessionStore(str(tmp_path)))
+    assert await reloaded.history("chat-1") == "User: use tool one\nAssistant: done"
+    assert await reloaded.delete("chat-1") is True
+    assert await reloaded.history("chat-1") is None
+
+
+async def test_agent_passes_history_to_llm():
+    llm = FakeLLM()
+    agent = IntelligentAgent(tools=[], llm=llm)
+    await agent.process_prompt("and what about tomorrow?", history="User: weather today?\nAssistant: sunny")
+
+    assert "User: weather today?" in llm.prompts[0]
+    assert llm.prompts[0].endswith("and what about tomorrow?")
+
+
+def test_api_keeps_session_history(monkeypatch):
+    monkeypatch.setattr(main, "sessions", SessionManager(InMemorySessionStore()))
+    first = client.post("/process_prompt", json={"prompt": "hello there", "session_id": "abc"})
+    client.post("/process_prompt", json={"prompt": "use tool one: x", "session_id": "abc"})
+
+    assert first.headers["x-cache"] == "BYPASS"
+    session = main.sessions.store.get("abc")
+    assert [turn.prompt for turn in session.turns] == ["hello there", "use tool one: x"]
+    assert session.turns[1].tools[0].name == "PlaceholderToolOne"
+    assert client.delete("/sessions/abc").status_code == 200
+    assert client.delete("/sessions/abc").status_code == 404
@@ -0,0 +1,102 @@
+
+import asyncio
+
+import pytest
+
+from part1.agent import IntelligentAgent
+from part1.prompts import SYSTEM_PROMPT
+from part1.tools.base import BaseTool
+from part1.tools.cache import CachePolicy, ToolResultCache, canonicalize_input
+
+
+class FakeClock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class CountingTool(BaseTool):
+    name = "PlaceholderToolTwo"
+    description = "Counts how often it really runs."
+    cacheable = True
+
+    def __init__(self):
+        self.calls = 0
+
+    def run(self, tool_input):
+        self.calls += 1
+        return f"result #{self.calls}"
+
+
+class UncachedTool(CountingTool):
+    cacheable = False
+
+
+def test_canonicalize_input_ignores_dict_order():
+    assert canonicalize_input({"query": "a", "limit": 1}) == canonicalize_input({"limit": 1, "query": "a"})
+    assert canonicalize_input("query") != canonicalize_input({"query": "query"})
+
+
+def test_cache_hit_miss_and_ttl_expiry():
+    clock = FakeClock()
+    cache = ToolResultCache(CachePolicy(ttl_seconds=10, max_entries=10, max_bytes=10_000), clock=clock)
+    tool = CountingTool()
+
+    assert cache.get(tool, "x") == (False, None)
+    cache.put(tool, "x", "value")
+    assert cache.get(tool, "x") == (True, "value")
+
+    clock.now = 11
+    assert cache.get(tool, "x") == (False, None)
+    stats = cache.stats()[tool.name]
+    assert (stats["hits"], stats["misses"], stats["expirations"]) == (1, 2, 1)
+
+
+def test_cache_evicts_least_recently_used():
+    cache = ToolResultCache(CachePolicy(ttl_seconds=60, max_entries=2, max_bytes=10_000))
+    tool = CountingTool()
+    cache.put(tool, "a", 1)
+    cache.put(tool, "b", 2)
+    cache.get(tool, "a")
+    cache.put(tool, "c", 3)
+
+    assert cache.get(tool, "b") == (False, None)
+    assert cache.get(tool, "a") == (True, 1)
+    assert cache.stats()[tool.name]["evictions"] == 1
+
+
+def test_cache_respects_byte_limit():
+    cache = ToolResultCache(CachePolicy(ttl_seconds=60, max_entries=100, max_bytes=200))
+    tool = CountingTool()
+    cache.put(tool, "big", "x" * 1000)
+    assert cache.get(tool, "big") == (False, None)
+
+    for i in range(10):
+        cache.put(tool, i, "y" * 50)
+    assert cache.stats()[tool.name]["bytes"] <= 200
+
+
+@pytest.mark.asyncio
+async def test_agent_marks_cached_tool_calls():
+    tool = CountingTool()
+    agent_instance = IntelligentAgent(system_prompt=SYSTEM_PROMPT, tools=[tool], tool_cache=ToolResultCache())
+
+    first = await agent_instance.process_prompt("Run placeholder tool two now.")
+    second = await agent_instance.process_prompt("Run placeholder tool two now.")
+
+    assert tool.calls == 1
+    assert first.tool_calls[0].cached is False
+    assert second.tool_calls[0].cached is True
+    assert second.tool_calls[0].tool_output == first.tool_calls[0].tool_output
+
+
+@pytest.mark.asyncio
+async def test_agent_skips_cache_for_non_cacheable_tools():
+    tool = UncachedTool()
+    agent_instance = IntelligentAgent(system_prompt=SYSTEM_PROMPT, tools=[tool], tool_cache=ToolResultCache())
+
+    await asyncio.gather(*(agent_instance.process_prompt("Run placeholder tool two now.") for _ in range(3)))
+
+    assert tool.calls == 3
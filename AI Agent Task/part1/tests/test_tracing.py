@@ -0,0 +1,118 @@
+
+import json
+import threading
+
+import pytest
+from fastapi.testclient import TestClient
+
+import part1.main as api
+from part1 import tracing
+from part1.agent import IntelligentAgent
+from part1.tools.base import BaseTool
+from part1.tracing import TailSampler, TraceExporter, Tracer, current_span
+
+
+class SpanRecordingTool(BaseTool):
+    """Sync tool (so it runs in the thread pool) that remembers which span it saw."""
+    def __init__(self):
+        self.seen_span = None
+        self.thread_name = None
+
+    @property
+    def name(self) -> str:
+        return "PlaceholderToolOne"
+
+    @property
+    def description(self) -> str:
+        return "Records the current span."
+
+    def run(self, tool_input):
+        self.seen_span = current_span()
+        self.thread_name = threading.current_thread().name
+        return "ok"
+
+
+@pytest.fixture
+def keep_all_tracer():
+    previous = tracing.tracer
+    tracing.tracer = Tracer(sampler=TailSampler(slow_threshold_ms=0, sample_rate=1.0))
+    yield tracing.tracer
+    tracing.tracer = previous
+
+
+async def test_spans_follow_request_across_thread_pool(keep_all_tracer):
+    tool = SpanRecordingTool()
+    agent = IntelligentAgent(tools=[tool])
+
+    await agent.process_prompt("use tool one please")
+
+    [trace] = keep_all_tracer.exporter.recent(limit=1)
+    record = keep_all_tracer.exporter.get(trace["trace_id"])
+    names = [s["name"] for s in record["spans"]]
+    assert names == ["agent.process", "agent.routing", "agent.tools", "tool.call", "agent.response"]
+    tool_span = next(s for s in record["spans"] if s["name"] == "tool.call")
+    assert tool_span["attributes"]["tool"] == "PlaceholderToolOne"
+    # The tool ran on a worker thread but still saw its tool.call span.
+    assert tool.thread_name.startswith("tool")
+    assert tool.seen_span.span_id == tool_span["span_id"]
+    assert tool.seen_span.trace_id == trace["trace_id"]
+
+
+async def test_tool_error_marks_trace_failed_and_is_kept():
+    sampler = TailSampler(slow_threshold_ms=10_000, sample_rate=0.0)
+    previous = tracing.tracer
+    tracing.tracer = Tracer(sampler=sampler)
+    try:
+        class FailingTool(SpanRecordingTool):
+            def run(self, tool_input):
+                raise RuntimeError("backend down")
+
+        await IntelligentAgent(tools=[FailingTool()]).process_prompt("use tool one please")
+        traces = tracing.tracer.exporter.recent(errors_only=True)
+    finally:
+        tracing.tracer = previous
+
+    assert len(traces) == 1
+    assert traces[0]["error"] is True
+
+
+def test_tail_sampler_keeps_slow_traces_and_drops_fast_ones():
+    sampler = TailSampler(slow_threshold_ms=100, sample_rate=0.0)
+    trace = tracing.Trace("t")
+    assert sampler.keep(trace, 150) is True
+    assert sampler.keep(trace, 5) is False
+    trace.error = True
+    assert sampler.keep(trace, 5) is True
+
+
+def test_exporter_ring_buffer_and_jsonl(tmp_path):
+    path = tmp_path / "traces.jsonl"
+    exporter = TraceExporter(buffer_size=2, jsonl_path=str(path))
+    for i in range(3):
+        exporter.export({"trace_id": f"t{i}", "duration_ms": i, "error": False, "spans": []})
+    exporter.close()
+
+    assert [t["trace_id"] for t in exporter.recent()] == ["t2", "t1"]
+    assert exporter.get("t0") is None
+    lines = [json.loads(line) for line in path.read_text().splitlines()]
+    assert [line["trace_id"] for line in lines] == ["t0", "t1", "t2"]
+
+
+def test_debug_endpoints_return_request_trace(keep_all_tracer):
+    client = TestClient(api.app)
+    response = client.post("/process_prompt", json={"prompt": "Use tool one for tracing"},
+                           headers={"X-Cache-Bypass": "1", "X-Request-ID": "trace-req-1"})
+    trace_id = response.headers["X-Trace-ID"]
+
+    listing = client.get("/debug/traces").json()
+    assert trace_id in [t["trace_id"] for t in listing["traces"]]
+
+    trace = client.get(f"/debug/traces/{trace_id}").json()
+    assert trace["name"] == "POST /process_prompt"
+    root = trace["spans"][0]
+    assert root["parent_id"] is None
+    assert root["attributes"]["request_id"] == "trace-req-1"
+    assert root["attributes"]["status"] == 200
+    assert "agent.process" in [s["name"] for s in trace["spans"]]
+
+    assert client.get("/debug/traces/does-not-exist").status_code == 404
@@ -1,19 +1,30 @@
 # part1/tools/__init__.py
 # Expose the tool classes/instances so they can be imported from part1.tools
 from .base import BaseTool # Export BaseTool if you want it accessible
-from .tool_one import PlaceholderToolOne # Import the class
-from .tool_two import PlaceholderToolTwo # Import the class
+from .executor import ToolExecutor
+from .cache import CachePolicy, ToolResultCache
+from .resilience import CircuitBreaker, ToolGuard
+from .registry import ToolRegistry, default_registry
 
-# Instantiate your tools here
-# Remember to replace these with your actual tool implementations
-AVAILABLE_TOOLS = [
-    PlaceholderToolOne(),
-    PlaceholderToolTwo(),
-    # Add instances of your real tool classes here
-]
+# Tools are registered in tools/registry.py (BUILTIN_TOOLS, entry points or AGENT_TOOLS)
+# and only imported and instantiated when first used. AVAILABLE_TOOLS, TOOL_MAP and the
+# tool classes are resolved lazily on attribute access below.
+_LAZY_CLASSES = {
+    "PlaceholderToolOne": "part1.tools.tool_one",
+    "PlaceholderToolTwo": "part1.tools.tool_two",
+}
+
+
+def __getattr__(name):
+    if name == "AVAILABLE_TOOLS":
+        return default_registry.instances()
+    if name == "TOOL_MAP":
+        return {tool.name: tool for tool in default_registry.instances()}
+    if name in _LAZY_CLASSES:
+        import importlib
+        return getattr(importlib.import_module(_LAZY_CLASSES[name]), name)
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
 
-# Create a dictionary for easy lookup by name
-TOOL_MAP = {tool.name: tool for tool in AVAILABLE_TOOLS}
 
 # Export the list and map
-__all__ = ["BaseTool", "AVAILABLE_TOOLS", "TOOL_MAP", "PlaceholderToolOne", "PlaceholderToolTwo"]
\ No newline at end of file
+__all__ = ["BaseTool", "ToolExecutor", "ToolResultCache", "CachePolicy", "CircuitBreaker", "ToolGuard", "ToolRegistry", "default_registry", "AVAILABLE_TOOLS", "TOOL_MAP", "PlaceholderToolOne", "PlaceholderToolTwo"]
@@ -1,9 +1,45 @@
 # part1/tools/base.py
 from abc import ABC, abstractmethod
-from typing import Any
+from typing import Any, Optional, Tuple
+
+# How a tool wants to be executed by the agent:
+# - "async":   the tool implements `arun` and is awaited on the event loop.
+# - "thread":  the sync `run` is sent to the shared, bounded thread pool (I/O-bound tools).
+# - "process": the sync `run` is sent to the process pool (CPU-bound tools; tool and input must be picklable).
+EXECUTOR_ASYNC = "async"
+EXECUTOR_THREAD = "thread"
+EXECUTOR_PROCESS = "process"
+EXECUTOR_MODES = (EXECUTOR_ASYNC, EXECUTOR_THREAD, EXECUTOR_PROCESS)
+
 
 class BaseTool(ABC):
-    """Abstract base class for agent tools."""
+    """Abstract base class for agent tools.
+
+    Subclasses implement the sync `run`, the async `arun`, or both.
+    """
+
+    # Optional execution mode (one of EXECUTOR_MODES). When left as None the agent
+    # awaits `arun` if the subclass overrides it and otherwise runs `run` in a thread.
+    executor: Optional[str] = None
+
+    # Opt-in result caching (see tools/cache.py). Only mark tools whose output depends
+    # solely on their input. None limits fall back to the cache's default policy.
+    cacheable: bool = False
+    cache_ttl_seconds: Optional[float] = None
+    cache_max_entries: Optional[int] = None
+    cache_max_bytes: Optional[int] = None
+
+    # Max concurrent calls of this tool across all requests in a worker (None = the
+    # TOOL_MAX_CONCURRENCY default). Protects slow backends without starving other tools.
+    max_concurrency: Optional[int] = None
+
+    # Deadline for one call in seconds (None = the TOOL_TIMEOUT_SECONDS default, 0 = no
+    # deadline). A call that runs over is cancelled and the agent answers without it.
+    timeout_seconds: Optional[float] = None
+
+    # Case-insensitive phrases that route a prompt to this tool, e.g. ("tool one",).
+    # The agent compiles the phrases of all registered tools into a single matcher.
+    triggers: Tuple[str, ...] = ()
 
     @property
     @abstractmethod
@@ -17,9 +53,20 @@ class BaseTool(ABC):
         """A description of the tool's function, used by the agent."""
         pass
 
-    # Decide if run should be async if your tools do async operations (like API calls)
-    @abstractmethod
-    # async def run(self, tool_input: Any) -> Any: # Example for async
-    def run(self, tool_input: Any) -> Any: # Example for sync
-        """Execute the tool with the given input."""
-        pass
\ No newline at end of file
+    def build_input(self, prompt: str, trigger_start: int, trigger_end: int) -> Any:
+        """Derives the tool input from the prompt; `trigger_start:trigger_end` is the matched trigger."""
+        return {"query": prompt}
+
+    async def warmup(self) -> None:
+        """
+        Optional startup hook (open connections, load models) run by the tool registry
+        before the worker takes traffic. May also be overridden as a sync method.
+        """
+
+    def run(self, tool_input: Any) -> Any:
+        """Execute the tool synchronously with the given input."""
+        raise NotImplementedError(f"{type(self).__name__} does not implement run()")
+
+    async def arun(self, tool_input: Any) -> Any:
+        """Execute the tool asynchronously with the given input."""
+        raise NotImplementedError(f"{type(self).__name__} does not implement arun()")
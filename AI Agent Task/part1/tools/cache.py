@@ -0,0 +1,141 @@
+# part1/tools/cache.py
+import json
+import os
+import pickle
+import sys
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Dict, Optional, Tuple
+
+DEFAULT_TTL_SECONDS = float(os.getenv("TOOL_CACHE_TTL_SECONDS", "300"))
+DEFAULT_MAX_ENTRIES = int(os.getenv("TOOL_CACHE_MAX_ENTRIES", "1024"))
+DEFAULT_MAX_BYTES = int(os.getenv("TOOL_CACHE_MAX_BYTES", str(16 * 1024 * 1024)))
+
+
+@dataclass(frozen=True)
+class CachePolicy:
+    """Limits for one tool's cache partition."""
+    ttl_seconds: float = DEFAULT_TTL_SECONDS
+    max_entries: int = DEFAULT_MAX_ENTRIES
+    max_bytes: int = DEFAULT_MAX_BYTES
+
+
+def canonicalize_input(tool_input: Any) -> str:
+    """Stable string form of a tool input: dict key order and whitespace do not matter."""
+    return json.dumps(tool_input, sort_keys=True, separators=(",", ":"), default=repr)
+
+
+def estimate_size(value: Any) -> int:
+    """Approximate size in bytes of a cached output."""
+    try:
+        return len(pickle.dumps(value, protocol=pickle.HIGHEST_PROTOCOL))
+    except Exception:
+        return sys.getsizeof(value)
+
+
+def is_cacheable(tool: Any) -> bool:
+    """Tools opt in by setting `cacheable = True` on the class."""
+    return getattr(tool, "cacheable", False) is True
+
+
+class _Partition:
+    """LRU entries and counters for a single tool."""
+    __slots__ = ("policy", "entries", "bytes", "hits", "misses", "evictions", "expirations")
+
+    def __init__(self, policy: CachePolicy):
+        self.policy = policy
+        # key -> (value, expires_at, size); most recently used at the end
+        self.entries: "OrderedDict[str, Tuple[Any, float, int]]" = OrderedDict()
+        self.bytes = 0
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self.expirations = 0
+
+
+class ToolResultCache:
+    """
+    TTL/LRU cache for tool outputs, keyed by tool name plus canonicalized input.
+
+    Each tool gets its own partition with its own TTL, entry and byte limits, taken from
+    `cache_ttl_seconds` / `cache_max_entries` / `cache_max_bytes` on the tool, falling back
+    to the default policy. Operations never await, so they are atomic for asyncio callers;
+    the lock makes them safe from worker threads too.
+    """
+    def __init__(self, default_policy: Optional[CachePolicy] = None, clock=time.monotonic):
+        self.default_policy = default_policy or CachePolicy()
+        self._clock = clock
+        self._partitions: Dict[str, _Partition] = {}
+        self._lock = threading.Lock()
+
+    def policy_for(self, tool: Any) -> CachePolicy:
+        default = self.default_policy
+        return CachePolicy(
+            ttl_seconds=getattr(type(tool), "cache_ttl_seconds", None) or default.ttl_seconds,
+            max_entries=getattr(type(tool), "cache_max_entries", None) or default.max_entries,
+            max_bytes=getattr(type(tool), "cache_max_bytes", None) or default.max_bytes,
+        )
+
+    def _partition(self, tool: Any) -> _Partition:
+        partition = self._partitions.get(tool.name)
+        if partition is None:
+            partition = self._partitions[tool.name] = _Partition(self.policy_for(tool))
+        return partition
+
+    def get(self, tool: Any, tool_input: Any) -> Tuple[bool, Any]:
+        """Returns (hit, value). Expired entries count as misses and are dropped."""
+        key = canonicalize_input(tool_input)
+        with self._lock:
+            partition = self._partition(tool)
+            entry = partition.entries.get(key)
+            if entry is not None:
+                value, expires_at, size = entry
+                if expires_at > self._clock():
+                    partition.entries.move_to_end(key)
+                    partition.hits += 1
+                    return True, value
+                del partition.entries[key]
+                partition.bytes -= size
+                partition.expirations += 1
+            partition.misses += 1
+            return False, None
+
+    def put(self, tool: Any, tool_input: Any, value: Any) -> None:
+        """Stores a fresh output, evicting least recently used entries past the limits."""
+        key = canonicalize_input(tool_input)
+        size = estimate_size(value)
+        with self._lock:
+            partition = self._partition(tool)
+            policy = partition.policy
+            if size > policy.max_bytes:
+                return
+            old = partition.entries.pop(key, None)
+            if old is not None:
+                partition.bytes -= old[2]
+            partition.entries[key] = (value, self._clock() + policy.ttl_seconds, size)
+            partition.bytes += size
+            while len(partition.entries) > policy.max_entries or partition.bytes > policy.max_bytes:
+                _, (_, _, evicted_size) = partition.entries.popitem(last=False)
+                partition.bytes -= evicted_size
+                partition.evictions += 1
+
+    def clear(self) -> None:
+        with self._lock:
+            self._partitions.clear()
+
+    def stats(self) -> Dict[str, Dict[str, int]]:
+        """Per-tool hit/miss/eviction counters and current size."""
+        with self._lock:
+            return {
+                name: {
+                    "hits": p.hits,
+                    "misses": p.misses,
+                    "evictions": p.evictions,
+                    "expirations": p.expirations,
+                    "entries": len(p.entries),
+                    "bytes": p.bytes,
+                }
+                for name, p in self._partitions.items()
+            }
@@ -0,0 +1,75 @@
+# part1/tools/executor.py
+import asyncio
+import contextvars
+import inspect
+import os
+from concurrent.futures import Executor, ProcessPoolExecutor, ThreadPoolExecutor
+from typing import Any, Optional
+
+from part1.tools.base import BaseTool, EXECUTOR_ASYNC, EXECUTOR_MODES, EXECUTOR_PROCESS, EXECUTOR_THREAD
+
+DEFAULT_THREAD_WORKERS = min(32, (os.cpu_count() or 1) + 4)
+DEFAULT_PROCESS_WORKERS = os.cpu_count() or 1
+
+
+def resolve_executor_mode(tool: Any) -> str:
+    """Works out how a tool should be executed (see EXECUTOR_MODES in base.py)."""
+    mode = getattr(tool, "executor", None)
+    if isinstance(mode, str):
+        if mode not in EXECUTOR_MODES:
+            raise ValueError(f"Tool '{getattr(tool, 'name', tool)}' declares unknown executor '{mode}'")
+        return mode
+    # Legacy tools that declared `async def run` are awaited directly.
+    if inspect.iscoroutinefunction(getattr(tool, "run", None)):
+        return EXECUTOR_ASYNC
+    arun = getattr(type(tool), "arun", None)
+    if arun is not None and arun is not BaseTool.arun:
+        return EXECUTOR_ASYNC
+    return EXECUTOR_THREAD
+
+
+class ToolExecutor:
+    """
+    Runs tool calls without blocking the event loop.
+
+    Native coroutines are awaited directly, sync tools go to a bounded thread pool
+    (or a process pool for CPU-bound tools). Pools are created on first use.
+    """
+    def __init__(self, max_thread_workers: Optional[int] = None, max_process_workers: Optional[int] = None):
+        self.max_thread_workers = max_thread_workers or int(os.getenv("TOOL_THREAD_WORKERS", DEFAULT_THREAD_WORKERS))
+        self.max_process_workers = max_process_workers or int(os.getenv("TOOL_PROCESS_WORKERS", DEFAULT_PROCESS_WORKERS))
+        self._thread_pool: Optional[ThreadPoolExecutor] = None
+        self._process_pool: Optional[ProcessPoolExecutor] = None
+
+    def _pool_for(self, mode: str) -> Executor:
+        if mode == EXECUTOR_PROCESS:
+            if self._process_pool is None:
+                self._process_pool = ProcessPoolExecutor(max_workers=self.max_process_workers)
+            return self._process_pool
+        if self._thread_pool is None:
+            self._thread_pool = ThreadPoolExecutor(max_workers=self.max_thread_workers, thread_name_prefix="tool")
+        return self._thread_pool
+
+    async def run(self, tool: Any, tool_input: Any) -> Any:
+        """Executes `tool` with `tool_input` using the tool's declared execution mode."""
+        mode = resolve_executor_mode(tool)
+        if mode == EXECUTOR_ASYNC:
+            if inspect.iscoroutinefunction(getattr(tool, "run", None)):
+                return await tool.run(tool_input)
+            return await tool.arun(tool_input)
+
+        loop = asyncio.get_running_loop()
+        if mode == EXECUTOR_PROCESS:
+            return await loop.run_in_executor(self._pool_for(mode), tool.run, tool_input)
+        # Carry context variables (trace span, request ID) into the worker thread.
+        ctx = contextvars.copy_context()
+        return await loop.run_in_executor(self._pool_for(mode), ctx.run, tool.run, tool_input)
+
+    def shutdown(self, wait: bool = True) -> None:
+        """Shuts down any pools that were started."""
+        if self._thread_pool is not None:
+            self._thread_pool.shutdown(wait=wait)
+            self._thread_pool = None
+        if self._process_pool is not None:
+            self._process_pool.shutdown(wait=wait)
+            self._process_pool = None
@@ -0,0 +1,199 @@
+
+import asyncio
+import importlib
+import inspect
+import os
+import threading
+import time
+from typing import Any, Callable, Dict, List, Mapping, Optional, Union
+
+from part1.structured_logging import get_logger
+
+logger = get_logger(__name__)
+
+# Installed packages can contribute tools under this entry point group, e.g. in pyproject.toml:
+#   [project.entry-points."part1.tools"]
+#   WeatherTool = "weather_tool:WeatherTool"
+ENTRY_POINT_GROUP = "part1.tools"
+
+# Tools shipped with the agent, as "module:attribute" references that are only imported when used.
+BUILTIN_TOOLS: Dict[str, str] = {
+    "PlaceholderToolOne": "part1.tools.tool_one:PlaceholderToolOne",
+    "PlaceholderToolTwo": "part1.tools.tool_two:PlaceholderToolTwo",
+}
+
+# Warmup outcomes reported by ToolRegistry.status().
+WARMUP_PENDING = "pending"
+WARMUP_OK = "ok"
+WARMUP_FAILED = "failed"
+WARMUP_TIMEOUT = "timeout"
+
+ToolFactory = Union[str, Callable[[], Any]]
+
+
+def parse_tool_config(value: str) -> Dict[str, Optional[str]]:
+    """
+    Parses AGENT_TOOLS: a comma-separated list of tool names, each optionally with its own
+    "module:attribute" reference ("PlaceholderToolOne,Weather=weather_tool:WeatherTool").
+    Names without a reference are looked up among the built-in and entry point tools.
+    """
+    config: Dict[str, Optional[str]] = {}
+    for item in value.split(","):
+        name, _, target = item.strip().partition("=")
+        if name.strip():
+            config[name.strip()] = target.strip() or None
+    return config
+
+
+def _load_reference(reference: str) -> Any:
+    module_name, _, attribute = reference.partition(":")
+    target: Any = importlib.import_module(module_name)
+    for part in filter(None, attribute.split(".")):
+        target = getattr(target, part)
+    return target
+
+
+class ToolRegistry:
+    """
+    Knows which tools a deployment uses and instantiates them only when needed.
+
+    Tools come from BUILTIN_TOOLS and the ENTRY_POINT_GROUP entry points; AGENT_TOOLS
+    (see parse_tool_config) narrows that down to the tools a deployment actually uses or
+    adds new ones. Nothing is imported until a tool is first requested with `get()`, or
+    until `load_all()` instantiates every enabled tool in parallel, e.g. during app
+    startup. `warmup()` then runs each tool's `warmup()` hook so connections and models
+    are ready before the worker starts taking traffic.
+    """
+    def __init__(self, factories: Optional[Mapping[str, ToolFactory]] = None, enabled: Optional[str] = None,
+                 entry_point_group: Optional[str] = ENTRY_POINT_GROUP, warmup_timeout: Optional[float] = None):
+        self._explicit = dict(factories) if factories is not None else None
+        self._enabled = os.getenv("AGENT_TOOLS", "") if enabled is None else enabled
+        self.entry_point_group = entry_point_group
+        self.warmup_timeout = float(os.getenv("TOOL_WARMUP_TIMEOUT_SECONDS", "30")) if warmup_timeout is None else warmup_timeout
+        self._factories: Optional[Dict[str, ToolFactory]] = None
+        self._instances: Dict[str, Any] = {}
+        self._lock = threading.Lock()
+        self._name_locks: Dict[str, threading.Lock] = {}
+        self.warmup_status: Dict[str, str] = {}
+        self.load_seconds: Optional[float] = None
+        self.warmup_seconds: Optional[float] = None
+
+    def _discover(self) -> Dict[str, ToolFactory]:
+        if self._explicit is not None:
+            available: Dict[str, ToolFactory] = dict(self._explicit)
+        else:
+            available = dict(BUILTIN_TOOLS)
+            if self.entry_point_group:
+                from importlib.metadata import entry_points
+                # Only the entry point metadata is read here; the tool modules stay unimported.
+                for entry_point in entry_points(group=self.entry_point_group):
+                    available.setdefault(entry_point.name, entry_point.value)
+        if not self._enabled.strip():
+            return available
+
+        factories: Dict[str, ToolFactory] = {}
+        for name, reference in parse_tool_config(self._enabled).items():
+            factory = reference or available.get(name)
+            if factory is None:
+                logger.warning("AGENT_TOOLS lists unknown tool %s; skipping it.", name)
+                continue
+            factories[name] = factory
+        return factories
+
+    def _get_factories(self) -> Dict[str, ToolFactory]:
+        if self._factories is None:
+            with self._lock:
+                if self._factories is None:
+                    self._factories = self._discover()
+        return self._factories
+
+    def names(self) -> List[str]:
+        """Names of the enabled tools, in registration order. Imports nothing."""
+        return list(self._get_factories())
+
+    def __contains__(self, name: str) -> bool:
+        return name in self._get_factories()
+
+    def is_loaded(self, name: str) -> bool:
+        return name in self._instances
+
+    def get(self, name: str, default: Any = None) -> Any:
+        """
+        The tool instance for `name`, importing and instantiating it on first use, or
+        `default` for tools that aren't enabled (so the registry can stand in for TOOL_MAP).
+        """
+        instance = self._instances.get(name)
+        if instance is not None:
+            return instance
+        factory = self._get_factories().get(name)
+        if factory is None:
+            return default
+        with self._lock:
+            name_lock = self._name_locks.setdefault(name, threading.Lock())
+        # Per-name lock: parallel loading of different tools, one instance per tool.
+        with name_lock:
+            instance = self._instances.get(name)
+            if instance is None:
+                start = time.perf_counter()
+                target = _load_reference(factory) if isinstance(factory, str) else factory
+                instance = target() if callable(target) else target
+                self._instances[name] = instance
+                logger.debug("Loaded tool %s in %.1f ms", name, (time.perf_counter() - start) * 1000)
+        return instance
+
+    def instances(self) -> List[Any]:
+        """All enabled tools, instantiated, in registration order."""
+        return [self.get(name) for name in self.names()]
+
+    async def load_all(self) -> List[Any]:
+        """Instantiates all enabled tools concurrently in worker threads, so slow constructors overlap."""
+        start = time.perf_counter()
+        names = self.names()
+        await asyncio.gather(*(asyncio.to_thread(self.get, name) for name in names))
+        self.load_seconds = time.perf_counter() - start
+        return [self._instances[name] for name in names]
+
+    async def warmup(self) -> Dict[str, str]:
+        """
+        Runs the `warmup()` hook of every loaded tool concurrently, each bounded by
+        `warmup_timeout`. A failing hook is logged and reported but doesn't stop startup;
+        the tool's own error handling (deadlines, circuit breaker) covers it afterwards.
+        """
+        start = time.perf_counter()
+        loaded = [(name, self._instances[name]) for name in self.names() if name in self._instances]
+        for name, _ in loaded:
+            self.warmup_status[name] = WARMUP_PENDING
+        await asyncio.gather(*(self._warm(name, tool) for name, tool in loaded))
+        self.warmup_seconds = time.perf_counter() - start
+        return dict(self.warmup_status)
+
+    async def _warm(self, name: str, tool: Any) -> None:
+        hook = getattr(tool, "warmup", None)
+        if not callable(hook):
+            self.warmup_status[name] = WARMUP_OK
+            return
+        try:
+            if inspect.iscoroutinefunction(hook):
+                await asyncio.wait_for(hook(), self.warmup_timeout)
+            else:
+                await asyncio.wait_for(asyncio.to_thread(hook), self.warmup_timeout)
+            self.warmup_status[name] = WARMUP_OK
+        except asyncio.TimeoutError:
+            logger.warning("Warmup of tool %s timed out after %.1fs", name, self.warmup_timeout)
+            self.warmup_status[name] = WARMUP_TIMEOUT
+        except Exception as e:
+            logger.warning("Warmup of tool %s failed: %s", name, e)
+            self.warmup_status[name] = WARMUP_FAILED
+
+    def status(self) -> Dict[str, Any]:
+        return {
+            "tools": self.names(),
+            "loaded": [name for name in self.names() if name in self._instances],
+            "warmup": dict(self.warmup_status),
+            "load_ms": None if self.load_seconds is None else round(self.load_seconds * 1000, 2),
+            "warmup_ms": None if self.warmup_seconds is None else round(self.warmup_seconds * 1000, 2),
+        }
+
+
+# The registry used by the app and the default agent.
+default_registry = ToolRegistry()
@@ -0,0 +1,151 @@
+# part1/tools/resilience.py
+import asyncio
+import os
+import time
+from typing import Any, Awaitable, Callable, Dict, Optional
+
+# Outcome of a tool call, reported in ToolUsage.status.
+STATUS_OK = "ok"
+STATUS_ERROR = "error"
+STATUS_TIMEOUT = "timeout"
+STATUS_CIRCUIT_OPEN = "circuit_open"
+STATUS_SATURATED = "saturated"
+
+# Circuit breaker states.
+CLOSED = "closed"
+OPEN = "open"
+HALF_OPEN = "half_open"
+
+
+class ToolUnavailable(Exception):
+    """A tool could not be used for this request; the agent answers without it."""
+    status = STATUS_ERROR
+
+    def __init__(self, tool_name: str, reason: str):
+        super().__init__(f"{tool_name} {reason}")
+        self.tool_name = tool_name
+        self.reason = reason
+
+
+class NotAToolFailure(Exception):
+    """
+    Raised from a tool call for a reason that says nothing about the tool's health, e.g.
+    a record/replay cassette with no recording for the call. The breaker ignores it.
+    """
+
+
+class ToolTimeout(ToolUnavailable):
+    status = STATUS_TIMEOUT
+
+
+class CircuitOpen(ToolUnavailable):
+    status = STATUS_CIRCUIT_OPEN
+
+
+class CircuitBreaker:
+    """
+    Classic three-state breaker for one tool. After `failure_threshold` consecutive
+    failures it opens and calls are refused for `reset_timeout` seconds; then a single
+    half-open probe is let through, which closes the breaker on success or re-opens it.
+    """
+    def __init__(self, failure_threshold: int = 5, reset_timeout: float = 30.0,
+                 clock: Callable[[], float] = time.monotonic):
+        self.failure_threshold = max(1, failure_threshold)
+        self.reset_timeout = reset_timeout
+        self.clock = clock
+        self.state = CLOSED
+        self.failures = 0
+        self._opened_at = 0.0
+        self._probe_in_flight = False
+
+    def allow(self) -> bool:
+        """Whether a call may go ahead now. In half-open state only one probe is allowed."""
+        if self.state == OPEN and self.clock() - self._opened_at >= self.reset_timeout:
+            self.state = HALF_OPEN
+        if self.state == CLOSED:
+            return True
+        if self.state == HALF_OPEN and not self._probe_in_flight:
+            self._probe_in_flight = True
+            return True
+        return False
+
+    def record_success(self) -> None:
+        self.state = CLOSED
+        self.failures = 0
+        self._probe_in_flight = False
+
+    def record_failure(self) -> None:
+        self.failures += 1
+        self._probe_in_flight = False
+        if self.state == HALF_OPEN or self.failures >= self.failure_threshold:
+            self.state = OPEN
+            self._opened_at = self.clock()
+
+    def release_probe(self) -> None:
+        """Lets another probe through after one ended without a verdict (e.g. cancelled)."""
+        self._probe_in_flight = False
+
+    def retry_in(self) -> float:
+        """Seconds until the next probe is allowed (0 unless open)."""
+        if self.state != OPEN:
+            return 0.0
+        return max(0.0, self.reset_timeout - (self.clock() - self._opened_at))
+
+
+class ToolGuard:
+    """
+    Runs tool calls under a deadline and a per-tool circuit breaker.
+
+    A tool sets its deadline with `timeout_seconds` on the class (TOOL_TIMEOUT_SECONDS is
+    the default, 0 = none). On timeout the call is cancelled; sync tools running in the
+    thread pool can't be interrupted, but the request no longer waits for them.
+    Breakers use TOOL_BREAKER_FAILURES and TOOL_BREAKER_RESET_SECONDS.
+    """
+    def __init__(self, default_timeout: Optional[float] = None, failure_threshold: Optional[int] = None,
+                 reset_timeout: Optional[float] = None, clock: Callable[[], float] = time.monotonic):
+        self.default_timeout = float(os.getenv("TOOL_TIMEOUT_SECONDS", "10")) if default_timeout is None else default_timeout
+        self.failure_threshold = int(os.getenv("TOOL_BREAKER_FAILURES", "5")) if failure_threshold is None else failure_threshold
+        self.reset_timeout = float(os.getenv("TOOL_BREAKER_RESET_SECONDS", "30")) if reset_timeout is None else reset_timeout
+        self.clock = clock
+        self.breakers: Dict[str, CircuitBreaker] = {}
+
+    def timeout_for(self, tool: Any) -> float:
+        # Read from the class so mocks without real metadata get the default.
+        timeout = getattr(type(tool), "timeout_seconds", None)
+        return float(timeout) if isinstance(timeout, (int, float)) and not isinstance(timeout, bool) else self.default_timeout
+
+    def breaker(self, tool_name: str) -> CircuitBreaker:
+        breaker = self.breakers.get(tool_name)
+        if breaker is None:
+            breaker = self.breakers[tool_name] = CircuitBreaker(self.failure_threshold, self.reset_timeout, self.clock)
+        return breaker
+
+    async def call(self, tool_name: str, tool: Any, run: Callable[[], Awaitable[Any]]) -> Any:
+        """
+        Awaits `run()` for `tool_name`. Raises CircuitOpen without calling it while the
+        breaker is open, ToolTimeout when the deadline passes, or the tool's own exception.
+        """
+        breaker = self.breaker(tool_name)
+        if not breaker.allow():
+            raise CircuitOpen(tool_name, f"is temporarily disabled after repeated failures (retry in {breaker.retry_in():.0f}s)")
+        timeout = self.timeout_for(tool)
+        try:
+            if timeout > 0:
+                result = await asyncio.wait_for(run(), timeout)
+            else:
+                result = await run()
+        except asyncio.TimeoutError:
+            breaker.record_failure()
+            raise ToolTimeout(tool_name, f"timed out after {timeout:g}s") from None
+        except (asyncio.CancelledError, ToolUnavailable, NotAToolFailure):
+            # Cancelled requests, saturation and replayed outcomes say nothing about the tool's health.
+            breaker.release_probe()
+            raise
+        except Exception:
+            breaker.record_failure()
+            raise
+        breaker.record_success()
+        return result
+
+    def states(self) -> Dict[str, str]:
+        return {name: breaker.state for name, breaker in self.breakers.items()}
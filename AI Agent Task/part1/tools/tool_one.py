@@ -1,17 +1,39 @@
 # part1/tools/tool_one.py
 # Use absolute import for BaseTool if you are inheriting from it
+import re
+from part1.structured_logging import get_logger
 from part1.tools.base import BaseTool # <-- CHANGED
 
+logger = get_logger(__name__)
+
+# Quoted text, e.g. "process 'sample data'"; quotes inside words (don't) are ignored.
+QUOTED_TEXT = re.compile(r"""(?<!\w)(['"])(.+?)\1(?!\w)""")
+
 class PlaceholderToolOne(BaseTool): # If inheriting from BaseTool
 # class PlaceholderToolOne: # If not inheriting
     name = "PlaceholderToolOne" # Use a descriptive name for the LLM
     description = "This is Placeholder Tool One. It takes a string input and returns a modified string." # Describe its function
+    cacheable = True # Output depends only on the input, so repeated calls can be served from the cache
+    triggers = ("tool one", "placeholder tool one") # Phrases that route a prompt to this tool
+
+    def build_input(self, prompt: str, trigger_start: int, trigger_end: int) -> str:
+        """
+        Picks the text to process: whatever follows "tool one:", else the first quoted
+        text, else the prompt with the trigger phrase removed.
+        """
+        after = prompt[trigger_end:].lstrip()
+        if after.startswith(":"):
+            return after[1:].strip()
+        quoted = QUOTED_TEXT.search(prompt)
+        if quoted:
+            return quoted.group(2)
+        return (prompt[:trigger_start] + prompt[trigger_end:]).strip()
 
-    # Implement the run method based on your tool's logic (can be sync or async)
-    # async def run(self, tool_input: str) -> str: # Example for async
+    # Implement run (sync) or arun (async) based on your tool's logic; sync tools run in a thread pool
+    # async def arun(self, tool_input: str) -> str: # Example for async
     def run(self, tool_input: str) -> str: # Example for sync
         """Runs the placeholder tool. Echoes input with prefix."""
-        print(f"DEBUG: PlaceholderToolOne called with input: {tool_input}") # For debugging
+        logger.debug("PlaceholderToolOne called with input: %s", tool_input) # For debugging
         # TODO: Implement actual logic for Tool 1 here.
         # This could be an external API call, a database lookup, a complex calculation, etc.
         # Add error handling (e.g., try...except)
@@ -1,19 +1,24 @@
 # part1/tools/tool_two.py
 # Use absolute import for BaseTool if you are inheriting from it
 from typing import Any
+from part1.structured_logging import get_logger
 from part1.tools.base import BaseTool # <-- CHANGED
 # You might need other imports here for your specific tool logic (e.g., requests, pandas)
 
+logger = get_logger(__name__)
+
 class PlaceholderToolTwo(BaseTool): # If inheriting from BaseTool
 # class PlaceholderToolTwo: # If not inheriting
     name = "PlaceholderToolTwo" # Use a descriptive name for the LLM
     description = "This is Placeholder Tool Two. It takes any input and returns a fixed response." # Describe its function
+    cacheable = True # Output depends only on the input, so repeated calls can be served from the cache
+    triggers = ("tool two", "placeholder tool two") # Phrases that route a prompt to this tool; input is {"query": prompt}
 
-    # Implement the run method based on your tool's logic (can be sync or async)
-    # async def run(self, tool_input: Any) -> str: # Example for async
+    # Implement run (sync) or arun (async) based on your tool's logic; sync tools run in a thread pool
+    # async def arun(self, tool_input: Any) -> str: # Example for async
     def run(self, tool_input: Any) -> str: # Example for sync
         """Runs the second placeholder tool. Returns a fixed string."""
-        print(f"DEBUG: PlaceholderToolTwo called with input: {tool_input}") # For debugging
+        logger.debug("PlaceholderToolTwo called with input: %s", tool_input) # For debugging
         # TODO: Implement actual logic for Tool 2 here.
         # This must be distinct from Tool 1. E.g., weather lookup, simple math, data processing.
         # Add error handling (e.g., try...except)
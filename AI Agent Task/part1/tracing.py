@@ -0,0 +1,287 @@
+
+import contextvars
+import json
+import os
+import queue
+import random
+import threading
+import time
+import uuid
+from collections import deque
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator, List, Optional
+
+from part1.structured_logging import get_logger, request_id_var
+
+logger = get_logger(__name__)
+
+TRACE_ID_HEADER = "X-Trace-ID"
+
+# Span currently open in this task/thread. asyncio tasks inherit it automatically;
+# ToolExecutor copies the context into its thread pool so tool code sees it too.
+current_span_var: contextvars.ContextVar[Optional["Span"]] = contextvars.ContextVar("current_span", default=None)
+
+
+def _env_flag(name: str, default: str) -> bool:
+    return os.getenv(name, default).strip().lower() in ("1", "true", "yes", "on")
+
+
+class Trace:
+    """All spans recorded for one request."""
+    __slots__ = ("trace_id", "spans", "error")
+
+    def __init__(self, trace_id: str):
+        self.trace_id = trace_id
+        self.spans: List["Span"] = []
+        self.error = False
+
+
+class Span:
+    __slots__ = ("trace", "span_id", "parent_id", "name", "start_time", "_start_perf", "duration", "attributes", "error")
+
+    def __init__(self, trace: Trace, name: str, parent_id: Optional[str], attributes: Dict[str, Any]):
+        self.trace = trace
+        self.span_id = uuid.uuid4().hex[:16]
+        self.parent_id = parent_id
+        self.name = name
+        self.start_time = time.time()
+        self._start_perf = time.perf_counter()
+        self.duration: Optional[float] = None
+        self.attributes = attributes
+        self.error: Optional[str] = None
+
+    @property
+    def trace_id(self) -> str:
+        return self.trace.trace_id
+
+    def set_attribute(self, key: str, value: Any) -> None:
+        self.attributes[key] = value
+
+    def set_error(self, error: Any) -> None:
+        """Marks the span (and so its trace) as failed; failed traces are always kept."""
+        self.error = repr(error) if isinstance(error, BaseException) else str(error)
+        self.trace.error = True
+
+    def finish(self) -> None:
+        self.duration = time.perf_counter() - self._start_perf
+
+    def to_dict(self) -> Dict[str, Any]:
+        return {
+            "span_id": self.span_id,
+            "parent_id": self.parent_id,
+            "name": self.name,
+            "start_time": self.start_time,
+            "duration_ms": None if self.duration is None else self.duration * 1000,
+            "attributes": self.attributes,
+            "error": self.error,
+        }
+
+
+class TailSampler:
+    """
+    Decides once a trace is finished whether to keep it: traces with an error or slower
+    than `slow_threshold_ms` are always kept, the rest with probability `sample_rate`.
+    """
+    def __init__(self, slow_threshold_ms: float, sample_rate: float):
+        self.slow_threshold_ms = slow_threshold_ms
+        self.sample_rate = sample_rate
+
+    def keep(self, trace: Trace, duration_ms: float) -> bool:
+        if trace.error or duration_ms >= self.slow_threshold_ms:
+            return True
+        return self.sample_rate > 0 and random.random() < self.sample_rate
+
+
+class TraceExporter:
+    """
+    Keeps the last `buffer_size` sampled traces in memory and, when `jsonl_path` is set,
+    appends each one as a JSON line. File writes happen on a background thread.
+    """
+    def __init__(self, buffer_size: int = 1000, jsonl_path: Optional[str] = None):
+        self._buffer: "deque[Dict[str, Any]]" = deque(maxlen=buffer_size)
+        self._index: Dict[str, Dict[str, Any]] = {}
+        self._lock = threading.Lock()
+        self.jsonl_path = jsonl_path
+        self._queue: "queue.SimpleQueue[Optional[str]]" = queue.SimpleQueue()
+        self._writer: Optional[threading.Thread] = None
+
+    def export(self, record: Dict[str, Any]) -> None:
+        with self._lock:
+            if len(self._buffer) == self._buffer.maxlen:
+                evicted = self._buffer[0]
+                self._index.pop(evicted["trace_id"], None)
+            self._buffer.append(record)
+            self._index[record["trace_id"]] = record
+        if self.jsonl_path:
+            if self._writer is None:
+                self._writer = threading.Thread(target=self._write_loop, name="trace-writer", daemon=True)
+                self._writer.start()
+            self._queue.put(json.dumps(record, default=str))
+
+    def _write_loop(self) -> None:
+        while True:
+            line = self._queue.get()
+            if line is None:
+                return
+            try:
+                with open(self.jsonl_path, "a", encoding="utf-8") as f:
+                    f.write(line + "\n")
+                    # Drain whatever else is queued while the file is open.
+                    while True:
+                        try:
+                            line = self._queue.get_nowait()
+                        except queue.Empty:
+                            break
+                        if line is None:
+                            return
+                        f.write(line + "\n")
+            except OSError:
+                logger.exception("Could not write trace to %s", self.jsonl_path)
+
+    def close(self) -> None:
+        if self._writer is not None:
+            self._queue.put(None)
+            self._writer.join(timeout=5)
+            self._writer = None
+
+    def get(self, trace_id: str) -> Optional[Dict[str, Any]]:
+        with self._lock:
+            return self._index.get(trace_id)
+
+    def recent(self, limit: int = 50, min_duration_ms: float = 0.0, errors_only: bool = False) -> List[Dict[str, Any]]:
+        """Most recent traces first, without their spans."""
+        with self._lock:
+            records = list(self._buffer)
+        summaries = []
+        for record in reversed(records):
+            if record["duration_ms"] < min_duration_ms or (errors_only and not record["error"]):
+                continue
+            summaries.append({k: v for k, v in record.items() if k != "spans"})
+            if len(summaries) >= limit:
+                break
+        return summaries
+
+
+class Tracer:
+    def __init__(self, enabled: bool = True, sampler: Optional[TailSampler] = None,
+                 exporter: Optional[TraceExporter] = None):
+        self.enabled = enabled
+        self.sampler = sampler or TailSampler(slow_threshold_ms=500, sample_rate=0.01)
+        self.exporter = exporter or TraceExporter()
+        self.dropped = 0
+
+    @contextmanager
+    def span(self, name: str, **attributes: Any) -> Iterator[Optional[Span]]:
+        """
+        Opens a span as a child of the current one. With no span open a new trace is
+        started, and the trace is sampled and exported when that root span closes.
+        Yields None when tracing is disabled.
+        """
+        if not self.enabled:
+            yield None
+            return
+        parent = current_span_var.get()
+        if parent is None:
+            trace = Trace(uuid.uuid4().hex)
+            request_id = request_id_var.get()
+            if request_id:
+                attributes["request_id"] = request_id
+        else:
+            trace = parent.trace
+        span = Span(trace, name, parent.span_id if parent else None, attributes)
+        token = current_span_var.set(span)
+        try:
+            yield span
+        except Exception as e:
+            span.set_error(e)
+            raise
+        finally:
+            span.finish()
+            current_span_var.reset(token)
+            trace.spans.append(span)
+            if parent is None:
+                self._finish_trace(trace, span)
+
+    def _finish_trace(self, trace: Trace, root: Span) -> None:
+        duration_ms = root.duration * 1000
+        if not self.sampler.keep(trace, duration_ms):
+            self.dropped += 1
+            return
+        self.exporter.export({
+            "trace_id": trace.trace_id,
+            "name": root.name,
+            "start_time": root.start_time,
+            "duration_ms": duration_ms,
+            "error": trace.error,
+            "span_count": len(trace.spans),
+            "spans": [s.to_dict() for s in sorted(trace.spans, key=lambda s: s.start_time)],
+        })
+
+
+tracer: Optional[Tracer] = None
+
+
+def current_span() -> Optional[Span]:
+    return current_span_var.get()
+
+
+def configure_tracing(enabled: Optional[bool] = None, slow_threshold_ms: Optional[float] = None,
+                      sample_rate: Optional[float] = None, buffer_size: Optional[int] = None,
+                      jsonl_path: Optional[str] = None) -> Tracer:
+    """
+    Builds the app tracer from arguments or TRACING_ENABLED, TRACE_SLOW_MS,
+    TRACE_SAMPLE_RATE, TRACE_BUFFER_SIZE and TRACE_JSONL_PATH.
+    """
+    global tracer
+    if tracer is not None:
+        tracer.exporter.close()
+    tracer = Tracer(
+        enabled=_env_flag("TRACING_ENABLED", "true") if enabled is None else enabled,
+        sampler=TailSampler(
+            slow_threshold_ms=float(os.getenv("TRACE_SLOW_MS", "500")) if slow_threshold_ms is None else slow_threshold_ms,
+            sample_rate=float(os.getenv("TRACE_SAMPLE_RATE", "0.01")) if sample_rate is None else sample_rate,
+        ),
+        exporter=TraceExporter(
+            buffer_size=buffer_size or int(os.getenv("TRACE_BUFFER_SIZE", "1000")),
+            jsonl_path=jsonl_path or os.getenv("TRACE_JSONL_PATH") or None,
+        ),
+    )
+    return tracer
+
+
+tracer = configure_tracing()
+
+
+def span(name: str, **attributes: Any):
+    """Opens a span on the app tracer (see Tracer.span)."""
+    return tracer.span(name, **attributes)
+
+
+class TracingMiddleware:
+    """
+    ASGI middleware that opens the root span of each HTTP request, names it after the
+    matched route template and returns the trace ID in X-Trace-ID.
+    """
+    def __init__(self, app):
+        self.app = app
+
+    async def __call__(self, scope, receive, send):
+        if scope["type"] != "http" or not tracer.enabled:
+            await self.app(scope, receive, send)
+            return
+
+        header = TRACE_ID_HEADER.lower().encode("latin-1")
+        with span("http.request", method=scope["method"], path=scope.get("path", "")) as root:
+            async def send_with_trace_id(message):
+                if message["type"] == "http.response.start":
+                    root.set_attribute("status", message["status"])
+                    if message["status"] >= 500:
+                        root.set_error(f"HTTP {message['status']}")
+                    message["headers"] = list(message.get("headers", [])) + [(header, root.trace_id.encode("latin-1"))]
+                await send(message)
+
+            try:
+                await self.app(scope, receive, send_with_trace_id)
+            finally:
+                route = scope.get("route")
+                root.name = f"{scope['method']} {getattr(route, 'path', None) or 'unmatched'}"